@@ -11,6 +11,7 @@ from app.models.courses import Course, CourseParticipation
 from app.models.topics import Topic, Syllabus
 from app.models.trainings import Training, TrainingParticipation
 from app.models.schedulers import Scheduler
+from app.models.search import SEARCH_INDEXES, SEARCH_VECTOR_COLUMN
 
 
 # Load environment variables from .env file
@@ -32,8 +33,8 @@ config.set_main_option("sqlalchemy.url", database_url)
 
 
 # Interpret the config file for Python logging.
-# This line sets up loggers basically.
-if config.config_file_name is not None:
+# This line sets up loggers basically. Skipped when the app migrates at startup, it would disable the server's loggers.
+if config.config_file_name is not None and "connection" not in config.attributes:
     fileConfig(config.config_file_name)
 
 # add your model's MetaData object here
@@ -48,6 +49,13 @@ target_metadata = SQLModel.metadata
 # ... etc.
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    # Full-text search columns and indexes exist in migrations only, keep autogenerate from dropping them
+    if reflected and compare_to is None and name in (SEARCH_VECTOR_COLUMN, *SEARCH_INDEXES):
+        return False
+    return True
+
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
 
@@ -66,6 +74,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -79,6 +88,12 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        # Connection provided by the app's startup check (app/utils/migrations.py), committed by the caller
+        run_migrations_on(connection)
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
@@ -86,10 +101,14 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        run_migrations_on(connection)
+
 
-        with context.begin_transaction():
-            context.run_migrations()
+def run_migrations_on(connection) -> None:
+    context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object)
+
+    with context.begin_transaction():
+        context.run_migrations()
 
 
 if context.is_offline_mode():
@@ -0,0 +1,41 @@
+"""Sparse syllabus sequence keys
+
+Revision ID: 5c0d7a91b3e4
+Revises: ae7e3c1f2fe9
+Create Date: 2026-10-18 11:20:07.415238
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c0d7a91b3e4'
+down_revision: Union[str, None] = 'ae7e3c1f2fe9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Same as app.models.topics.SEQUENCE_GAP at the time of this revision
+SEQUENCE_GAP = 1 << 16
+
+
+def upgrade() -> None:
+    op.alter_column('syllabus', 'sequence', existing_type=sa.Integer(), type_=sa.BigInteger(), existing_nullable=False)
+    # Dense positions 1..N become keys SEQUENCE_GAP apart, in the same order
+    op.execute(f'UPDATE syllabus SET sequence = sequence * {SEQUENCE_GAP}')
+    op.create_index('ix_syllabus_course_id_sequence', 'syllabus', ['course_id', 'sequence'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_syllabus_course_id_sequence', table_name='syllabus')
+    # Back to dense positions, ranked by key within each course
+    op.execute(
+        'UPDATE syllabus SET sequence = ranked.position '
+        'FROM (SELECT course_id, topic_id, row_number() OVER (PARTITION BY course_id ORDER BY sequence) AS position '
+        'FROM syllabus) AS ranked '
+        'WHERE syllabus.course_id = ranked.course_id AND syllabus.topic_id = ranked.topic_id'
+    )
+    op.alter_column('syllabus', 'sequence', existing_type=sa.BigInteger(), type_=sa.Integer(), existing_nullable=False)
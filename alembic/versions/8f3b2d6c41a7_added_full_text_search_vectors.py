@@ -0,0 +1,40 @@
+"""Added full-text search vectors
+
+Revision ID: 8f3b2d6c41a7
+Revises: 5c0d7a91b3e4
+Create Date: 2026-10-18 12:04:51.902316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f3b2d6c41a7'
+down_revision: Union[str, None] = '5c0d7a91b3e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, title column, body column), titles weigh more than bodies in the ranking
+SEARCHABLE = [('topic', 'title', 'content'), ('course', 'name', 'description')]
+
+
+def upgrade() -> None:
+    for table, title, body in SEARCHABLE:
+        # Generated columns stay in sync with every write, no triggers needed
+        op.execute(
+            f"ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+            f"setweight(to_tsvector('simple', coalesce({title}, '')), 'A') || "
+            f"setweight(to_tsvector('simple', coalesce({body}, '')), 'B')"
+            f") STORED"
+        )
+        op.create_index(f'ix_{table}_search_vector', table, ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    for table, _, _ in reversed(SEARCHABLE):
+        op.drop_index(f'ix_{table}_search_vector', table_name=table, postgresql_using='gin')
+        op.drop_column(table, 'search_vector')
@@ -1,3 +1,4 @@
+from typing import Literal
 from pydantic_settings import BaseSettings
 
 
@@ -12,6 +13,66 @@ class Settings(BaseSettings):
     postgres_db: str
 
     auth_base_url: str
+    # Verified tokens are cached in-process, keyed by their SHA-256 digest (TTL 0 disables it)
+    auth_cache_size: int = 10_000
+    auth_cache_ttl: float = 60.0
+    auth_cache_negative_ttl: float = 5.0
+    # Shared HTTP client for the auth service
+    auth_connect_timeout: float = 1.0
+    auth_read_timeout: float = 3.0
+    auth_max_connections: int = 100
+    auth_max_keepalive_connections: int = 20
+    auth_breaker_threshold: int = 5
+    auth_breaker_reset_timeout: float = 15.0
+    # "jwt" checks tokens locally against a public key / JWKS, the verify call is only a fallback
+    auth_mode: Literal["remote", "jwt"] = "remote"
+    auth_jwks_url: str | None = None
+    auth_jwt_public_key: str | None = None
+    auth_jwt_algorithms: list[str] = ["RS256"]
+    auth_jwt_audience: str | None = None
+    auth_jwt_issuer: str | None = None
+    auth_jwks_refresh_interval: float = 300.0
+    # Read-through cache of course/topic/training reads, shared between workers through Redis when
+    # configured, in-process otherwise (TTL 0 disables it). Several workers without Redis cannot see each
+    # other's invalidations, their TTL is capped at the L1 TTL
+    redis_url: str | None = None
+    response_cache_ttl: float = 300.0
+    response_cache_l1_size: int = 1_000
+    response_cache_l1_ttl: float = 5.0
+    # Seconds between recounts of course/training participations (0 disables)
+    student_count_reconcile_interval: float = 3600.0
+    # Startup schema check: "auto" upgrades an outdated database, "check" refuses to start, "skip" trusts the deploy
+    migrations_mode: Literal["auto", "check", "skip"] = "auto"
+    # One JSON line per request: share of successful requests logged (errors always are, 0 disables the middleware),
+    # request body bytes kept in sampled records, and headers (credentials redacted)
+    request_log_sample_rate: float = 1.0
+    request_log_body_limit: int = 0
+    request_log_headers: bool = False
+    # Statements slower than this are logged with their route and parameter types (0 disables)
+    slow_query_ms: float = 200.0
+    # Encoder of JSON responses FastAPI validates itself, list and detail reads always use orjson
+    json_encoder: Literal["orjson", "stdlib"] = "orjson"
+    # Prometheus metrics on /metrics
+    metrics_enabled: bool = True
+    # Production server (python -m app.serve), 0 workers means one per CPU
+    server_host: str = "0.0.0.0"
+    server_port: int = 8000
+    server_workers: int = 0
+    server_backlog: int = 2048
+    # Longer than the idle timeout of the clients' pools, so the server is not the side closing a reused connection
+    server_keepalive_timeout: int = 75
+    server_graceful_timeout: int = 30
+    # Workers are recycled after this many requests, plus a random share of the jitter (0 disables)
+    server_max_requests: int = 10_000
+    server_max_requests_jitter: int = 1_000
+    # Postgres connections of the whole server, split evenly between the workers' pools
+    database_max_connections: int = 40
+    # Read replicas (postgresql:// URLs, JSON list) for GET requests. A client that wrote within the sticky window
+    # keeps reading from the primary, an unreachable replica is skipped for the retry interval
+    database_replica_urls: list[str] = []
+    database_replica_balancing: Literal["round_robin", "least_connections"] = "round_robin"
+    database_replica_sticky_window: float = 5.0
+    database_replica_retry_interval: float = 30.0
 
     @property
     def database_url(self) -> str:
@@ -20,6 +81,10 @@ class Settings(BaseSettings):
             f"@{self.postgres_host}:{self.postgres_port}/{self.postgres_db}"
         )
 
+    @property
+    def async_database_url(self) -> str:
+        return self.database_url.replace("postgresql://", "postgresql+asyncpg://", 1)
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -1,19 +1,65 @@
-from fastapi import Depends
+from fastapi import Depends, Request, Response
 from typing import Annotated
 
-from sqlmodel import Session, create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.config import settings
+from app.db.profiling import instrument_engine
+from app.db.replicas import ReplicaSet, SessionRouter
+from app.utils.metrics import MeteredQueuePool
 
 
-# Create database engine
-engine = create_engine(settings.database_url)
+def pool_options(workers: int) -> dict:
+    """Share of the connection budget of one worker, without overflow so the total stays bounded."""
+    return {"pool_size": max(1, settings.database_max_connections // max(1, workers)), "max_overflow": 0}
 
 
-# Dependency to get a database session
-def get_session():
-    with Session(engine) as session:
+# Create async database engine (asyncpg driver), `python -m app.serve` exports the worker count
+engine = create_async_engine(
+    settings.async_database_url, poolclass=MeteredQueuePool, **pool_options(settings.server_workers)
+)
+instrument_engine(engine)
+
+
+def replica_engine(url: str):
+    # Each replica server gets the same per-worker share as the primary, its pool is not in the pool metrics
+    replica = create_async_engine(
+        url.replace("postgresql://", "postgresql+asyncpg://", 1), **pool_options(settings.server_workers)
+    )
+    instrument_engine(replica)
+    return replica
+
+
+replicas = (
+    ReplicaSet(
+        [replica_engine(url) for url in settings.database_replica_urls],
+        settings.database_replica_balancing,
+        settings.database_replica_retry_interval,
+    )
+    if settings.database_replica_urls
+    else None
+)
+session_router = SessionRouter(engine, replicas, settings.database_replica_sticky_window)
+
+
+# Dependency to get a database session, on a replica for safe requests when replicas are configured
+async def get_session(request: Request, response: Response):
+    async with session_router.session(request, response) as session:
+        yield session
+
+
+DBSession = Annotated[AsyncSession, Depends(get_session)]
+
+
+# Dependency for loads that fill the shared response cache, which must not store a lagging replica's rows.
+# The request's own session when that is on the primary already, else a second one, connecting on first use
+async def get_primary_session(request: Request, response: Response, session: DBSession):
+    if session.bind is session_router.primary:
         yield session
+        return
+    async with session_router.session(request, response, primary=True) as primary:
+        yield primary
 
 
-DBSession = Annotated[Session, Depends(get_session)]
+PrimarySession = Annotated[AsyncSession, Depends(get_primary_session)]
@@ -0,0 +1,151 @@
+import time
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.utils.metrics import REQUEST_DB_QUERIES, REQUEST_DB_SECONDS, UNMATCHED_ROUTE
+
+logger = logging.getLogger("uvicorn")
+
+DB_QUERIES_HEADER = "X-DB-Queries"
+DB_TIME_HEADER = "X-DB-Time"
+# Parameters listed in slow query logs, the rest are only counted
+SHAPE_MAX_PARAMETERS = 20
+
+
+class QueryStats:
+    """SQL statements executed within one request (or one `count_queries` block).
+
+    Blocks can nest, statements are counted in the innermost block and all enclosing ones.
+    `scope` is the ASGI scope of the request, which names the route the statements belong to.
+    `statements` keeps the SQL text, None for the per-request stats, which only need the totals.
+    """
+
+    __slots__ = ("count", "seconds", "statements", "parent", "scope")
+
+    def __init__(self, parent: "QueryStats | None" = None, scope: Scope | None = None, record: bool = True):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: list[str] | None = [] if record else None
+        self.parent = parent
+        self.scope = scope
+
+    @property
+    def route(self) -> str | None:
+        """`GET /courses/{course_id}` of the enclosing request, None outside requests."""
+        stats = self
+        while stats is not None and stats.scope is None:
+            stats = stats.parent
+        if stats is None:
+            return None
+        return f"{stats.scope['method']} {getattr(stats.scope.get('route'), 'path', UNMATCHED_ROUTE)}"
+
+
+_current_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def parameter_shape(parameters, executemany: bool) -> str:
+    """Types of the bound parameters, never their values: `{id_1: UUID, param_1: int}`, `1000 x (str, int)`."""
+    if executemany:
+        rows = list(parameters)
+        return f"{len(rows)} x {parameter_shape(rows[0], False)}" if rows else "0 rows"
+    if isinstance(parameters, dict):
+        shapes = [f"{name}: {type(value).__name__}" for name, value in parameters.items()]
+        opening, closing = "{", "}"
+    else:
+        shapes = [type(value).__name__ for value in parameters or ()]
+        opening, closing = "(", ")"
+    if len(shapes) > SHAPE_MAX_PARAMETERS:
+        # Multi-row INSERT ... VALUES binds every value of every row
+        shapes = [*shapes[:SHAPE_MAX_PARAMETERS], f"... {len(shapes) - SHAPE_MAX_PARAMETERS} more"]
+    return opening + ", ".join(shapes) + closing
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    while stats is not None:
+        stats.count += 1
+        if stats.statements is not None:
+            stats.statements.append(statement)
+        stats = stats.parent
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    current = stats = _current_stats.get()
+    while stats is not None:
+        stats.seconds += elapsed
+        stats = stats.parent
+    if settings.slow_query_ms and elapsed * 1000 >= settings.slow_query_ms:
+        route = current.route if current is not None else None
+        logger.warning(
+            f"Slow query ({elapsed * 1000:.1f}ms) in {route or 'background task'}: "
+            f"{' '.join(statement.split())} params={parameter_shape(parameters, executemany)}"
+        )
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def instrument_engine(engine: AsyncEngine):
+    for name, listener in (
+        ("before_cursor_execute", _before_cursor_execute),
+        ("after_cursor_execute", _after_cursor_execute),
+        ("handle_error", _handle_error),
+    ):
+        if not event.contains(engine.sync_engine, name, listener):
+            event.listen(engine.sync_engine, name, listener)
+
+
+@contextmanager
+def count_queries(scope: Scope | None = None, record: bool = True):
+    """Count the statements executed inside the block, e.g. around a test request, keeping their SQL if `record`."""
+    stats = QueryStats(parent=_current_stats.get(), scope=scope, record=record)
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+class QueryCountMiddleware:
+    """Counts SQL statements and their time per request, recorded per route in the Prometheus metrics.
+
+    With `add_headers` (debug) responses carry the totals so far in `X-DB-Queries` and `X-DB-Time` (ms).
+    """
+
+    def __init__(self, app: ASGIApp, add_headers: bool = False):
+        self.app = app
+        self.add_headers = add_headers
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        # Runs on every request, only the totals feed the metrics
+        with count_queries(scope, record=False) as stats:
+
+            async def send_wrapper(message: Message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (DB_QUERIES_HEADER.encode(), str(stats.count).encode()),
+                        (DB_TIME_HEADER.encode(), f"{stats.seconds * 1000:.2f}".encode()),
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper if self.add_headers else send)
+
+        route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+        REQUEST_DB_QUERIES.labels(route).observe(stats.count)
+        REQUEST_DB_SECONDS.labels(route).observe(stats.seconds)
+        logger.debug(f"{stats.route} ran {stats.count} SQL statement(s) in {stats.seconds * 1000:.1f}ms")
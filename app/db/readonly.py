@@ -0,0 +1,47 @@
+"""Column-only queries for list endpoints.
+
+Lists are loaded only to be encoded, so they select just the columns of their `*ReadList` model. The result
+rows are plain named tuples: no identity map entry, attribute instrumentation or change tracking per row.
+They support attribute access, so `dump_json` and the pagination cursors read them like entities.
+"""
+
+from functools import cache
+from typing import Annotated, Sequence
+
+from fastapi import Depends
+from pydantic import BaseModel
+from sqlalchemy.orm import ColumnProperty, InstrumentedAttribute
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db.database import DBSession
+from app.utils.pagination import SortKey
+
+
+@cache
+def read_columns(table: type[SQLModel], model: type[BaseModel]) -> tuple[InstrumentedAttribute, ...]:
+    """Columns of `table` behind the fields of the read model `model`."""
+    columns = []
+    for name in model.model_fields:
+        column = getattr(table, name, None)
+        if not isinstance(column, InstrumentedAttribute) or not isinstance(column.property, ColumnProperty):
+            raise TypeError(f"{model.__name__}.{name} is not a column of {table.__name__}")
+        columns.append(column)
+    return tuple(columns)
+
+
+def select_rows(table: type[SQLModel], model: type[BaseModel], keys: Sequence[SortKey] = ()):
+    """SELECT of the columns `model` needs, plus the sort keys the pagination cursors are built from."""
+    columns = read_columns(table, model)
+    extra = [column for column, _ in keys if column.key not in model.model_fields]
+    return select(*columns, *extra)
+
+
+async def get_read_session(session: DBSession) -> AsyncSession:
+    # Nothing is written, so there is nothing to flush before queries or to expire
+    session.autoflush = False
+    session.expire_on_commit = False
+    return session
+
+
+ReadSession = Annotated[AsyncSession, Depends(get_read_session)]
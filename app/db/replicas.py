@@ -0,0 +1,158 @@
+"""Routing of request sessions between the primary database and read replicas.
+
+Safe requests (GET, HEAD, OPTIONS) read from a replica, everything else uses the primary. A client that
+wrote recently keeps reading from the primary for `sticky_window` seconds, so it sees its own writes despite
+replication lag. Clients are recognized by a cookie on any worker, and by their credentials only on the
+worker that handled the write: a client that drops cookies can read its writes late on another worker.
+
+Loads that fill the shared response cache always use the primary (`primary=True`), so a lagging replica
+cannot put a stale representation in it.
+
+A replica that refuses connections, or loses them mid-request, is skipped for `retry_interval` seconds;
+the request that hit the error fails, and with no replica left reads fall back to the primary.
+"""
+
+import time
+import math
+import hashlib
+import logging
+from itertools import count
+from typing import AsyncIterator, Callable, Literal
+from contextlib import asynccontextmanager
+
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.utils.metrics import DB_SESSIONS
+from app.utils.ttl_cache import MISSING, TTLCache
+
+logger = logging.getLogger("uvicorn")
+
+Balancing = Literal["round_robin", "least_connections"]
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+# Unix time until which the client reads from the primary
+PRIMARY_COOKIE = "db_primary_until"
+
+
+class Replica:
+    __slots__ = ("engine", "name", "down_until")
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.name = engine.url.render_as_string(hide_password=True)
+        self.down_until = 0.0
+
+
+class ReplicaSet:
+    """Read replicas with their health, picked round-robin or by fewest connections in use."""
+
+    def __init__(
+        self,
+        engines: list[AsyncEngine],
+        balancing: Balancing = "round_robin",
+        retry_interval: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.replicas = [Replica(engine) for engine in engines]
+        self.balancing = balancing
+        self.retry_interval = retry_interval
+        self._clock = clock
+        self._turn = count()
+        for replica in self.replicas:
+            event.listen(replica.engine.sync_engine, "handle_error", self._on_error(replica))
+
+    def _on_error(self, replica: Replica):
+        def handle_error(exception_context):
+            # Failed connects have no connection, lost ones invalidate the pool: either way the server is gone
+            if exception_context.is_disconnect or exception_context.connection is None:
+                self.mark_down(replica, exception_context.original_exception)
+
+        return handle_error
+
+    def mark_down(self, replica: Replica, error: BaseException):
+        if replica.down_until <= self._clock():
+            logger.warning(f"Replica {replica.name} unavailable, retrying in {self.retry_interval:.0f}s: {error!r}")
+        replica.down_until = self._clock() + self.retry_interval
+
+    def candidates(self) -> list[Replica]:
+        """Healthy replicas, in the order to try them."""
+        now = self._clock()
+        healthy = [replica for replica in self.replicas if replica.down_until <= now]
+        if not healthy:
+            return []
+        if self.balancing == "least_connections":
+            return sorted(healthy, key=lambda replica: replica.engine.pool.checkedout())
+        start = next(self._turn) % len(healthy)
+        return healthy[start:] + healthy[:start]
+
+    def pick(self) -> AsyncEngine | None:
+        """Engine of the next healthy replica, None when all are down."""
+        candidates = self.candidates()
+        return candidates[0].engine if candidates else None
+
+    async def dispose(self):
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+class SessionRouter:
+    """Opens each request's session on the primary or on a replica."""
+
+    def __init__(
+        self, primary: AsyncEngine, replicas: ReplicaSet | None = None, sticky_window: float = 5.0, maxsize=10_000
+    ):
+        self.primary = primary
+        self.replicas = replicas
+        self.sticky_window = sticky_window
+        # Digests of the credentials of recent writers
+        self.writers = TTLCache(maxsize=maxsize, ttl=sticky_window)
+
+    def _client_key(self, request: Request) -> str | None:
+        authorization = request.headers.get("authorization")
+        return hashlib.sha256(authorization.encode()).hexdigest() if authorization else None
+
+    def _recently_wrote(self, request: Request) -> bool:
+        key = self._client_key(request)
+        if key is not None and self.writers.get(key) is not MISSING:
+            return True
+        try:
+            return float(request.cookies.get(PRIMARY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def _remember_write(self, request: Request, response: Response):
+        key = self._client_key(request)
+        if key is not None:
+            self.writers.set(key, True)
+        until = time.time() + self.sticky_window
+        response.set_cookie(
+            PRIMARY_COOKIE, f"{until:.0f}", max_age=math.ceil(self.sticky_window), httponly=True, samesite="lax"
+        )
+
+    def route(self, request: Request, response: Response, primary: bool = False) -> AsyncEngine:
+        if self.replicas is None:
+            return self.primary
+        if primary and request.method in SAFE_METHODS:
+            # Not counted: opened next to the request's session for cache fills, most never connect
+            return self.primary
+        if request.method not in SAFE_METHODS:
+            self._remember_write(request, response)
+            DB_SESSIONS.labels("primary").inc()
+            return self.primary
+        if self._recently_wrote(request):
+            DB_SESSIONS.labels("primary_sticky").inc()
+            return self.primary
+        replica = self.replicas.pick()
+        if replica is None:
+            DB_SESSIONS.labels("primary_fallback").inc()
+            return self.primary
+        DB_SESSIONS.labels("replica").inc()
+        return replica
+
+    @asynccontextmanager
+    async def session(self, request: Request, response: Response, primary: bool = False) -> AsyncIterator[AsyncSession]:
+        # Objects stay loaded after commit, so handlers can return them without an extra (lazy) refresh
+        async with AsyncSession(self.route(request, response, primary), expire_on_commit=False) as session:
+            yield session
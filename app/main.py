@@ -1,36 +1,89 @@
+import time
 import logging
-import multiprocessing
 from fastapi import FastAPI
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, contextmanager
 from app.utils.middleware import LoggingMiddleware
+from app.utils.metrics import MetricsMiddleware, metrics_endpoint, stop_metrics
+from app.utils.auth_client import start_auth_client, close_auth_client
+from app.utils.jwks import start_key_set, stop_key_set
+from app.utils.response_cache import response_cache
+from app.utils.serialization import DefaultJSONResponse
+from app.utils.counters import start_reconciler, stop_reconciler
 
-from app.utils.migrations import apply_migrations
-from app.routers import courses, topics, trainings
+from app.utils.migrations import ensure_migrations
+from app.routers import courses, search, topics, trainings
 from app.core.config import settings
+from app.db.database import engine, replicas
+from app.db.profiling import QueryCountMiddleware
 
 log = logging.getLogger("uvicorn")
 log.setLevel(logging.DEBUG if settings.debug else logging.INFO)
 
 
+@contextmanager
+def startup_phase(timings: dict[str, float], name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = time.perf_counter() - started
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Perform any startup logic here
     log.info("Starting up...")
-    log.info("Run alembic upgrade head...")
-    process = multiprocessing.Process(target=apply_migrations)
-    process.start()
-    process.join()  # Wait for the process to finish
-    log.info("Finished alembic upgrade.")
+    timings: dict[str, float] = {}
+    with startup_phase(timings, "migrations"):
+        steps = await ensure_migrations(engine, settings.migrations_mode)
+    timings |= {f"migrations.{step}": seconds for step, seconds in steps.items()}
+    with startup_phase(timings, "auth client"):
+        await start_auth_client()
+    with startup_phase(timings, "key set"):
+        await start_key_set()
+    with startup_phase(timings, "response cache"):
+        await response_cache.start()
+    await start_reconciler()
+    log.info(
+        f"Startup ({settings.migrations_mode} migrations): "
+        + ", ".join(f"{name} {seconds * 1000:.1f}ms" for name, seconds in timings.items())
+    )
     yield  # Control returns to the application during runtime
     log.info("Shutting down...")
+    log.info(f"Response cache (L1): {response_cache.l1.stats()}")
     # Perform any shutdown logic here if needed
+    await stop_reconciler()
+    await response_cache.stop()
+    await stop_key_set()
+    await close_auth_client()
+    await engine.dispose()
+    if replicas is not None:
+        await replicas.dispose()
+    stop_metrics()
 
 
-app = FastAPI(lifespan=lifespan, debug=settings.debug, docs_url=None, redoc_url=None)
+app = FastAPI(
+    lifespan=lifespan,
+    debug=settings.debug,
+    docs_url=None,
+    redoc_url=None,
+    default_response_class=DefaultJSONResponse,
+)
 
 app.include_router(topics.router, tags=["Topics"])
 app.include_router(courses.router, tags=["Courses"])
 app.include_router(trainings.router, tags=["Trainings"])
+app.include_router(search.router, tags=["Search"])
 
-if settings.debug:
-    app.add_middleware(LoggingMiddleware)
+if settings.request_log_sample_rate > 0:
+    app.add_middleware(
+        LoggingMiddleware,
+        sample_rate=settings.request_log_sample_rate,
+        body_limit=settings.request_log_body_limit,
+        log_headers=settings.request_log_headers,
+    )
+# Attributes statements to requests; in debug, responses also report them in X-DB-Queries / X-DB-Time
+app.add_middleware(QueryCountMiddleware, add_headers=settings.debug)
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+    app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
@@ -2,9 +2,9 @@ from uuid import UUID, uuid4
 from pydantic import ConfigDict
 from datetime import datetime, UTC
 from typing import Annotated, TYPE_CHECKING
-from sqlmodel import SQLModel, Field, Relationship, func, select
+from sqlmodel import SQLModel, Field, Index, Relationship, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.db.database import Session
 from app.models.topics import Syllabus
 
 
@@ -41,8 +41,15 @@ class CourseBase(SQLModel):
 class Course(CourseBase, table=True):
     """Database model for Courses."""
 
+    __table_args__ = (
+        Index("ix_course_created_at_id", "created_at", "id"),
+        Index("ix_course_student_count_created_at_id", "student_count", "created_at", "id"),
+    )
+
     id: UUID = Field(default_factory=uuid4, primary_key=True, index=True, nullable=False)
     creator_id: UUID = Field()  # foreign_key="user.id"
+    # Number of participations, kept in step by join/leave and reconciled periodically
+    student_count: int = Field(default=0, nullable=False, sa_column_kwargs={"server_default": "0"})
     tg_group_id: str | None = None
     created_at: datetime = Field(
         default_factory=lambda: datetime.now(UTC).replace(tzinfo=None),
@@ -64,9 +71,9 @@ class Course(CourseBase, table=True):
     #     back_populates="courses", link_model=CourseParticipation, sa_relationship_kwargs={"cascade": "all, delete-orphan"}
     # )
 
-    def get_students_ids(self, session: Session) -> list[UUID]:
+    async def get_students_ids(self, session: AsyncSession) -> list[UUID]:
         statement = select(CourseParticipation.student_id).where(CourseParticipation.course_id == self.id)
-        results = session.exec(statement)
+        results = await session.exec(statement)
         return results.all()
 
 
@@ -81,6 +88,7 @@ class CourseReadList(CourseBase):
 
     id: UUID
     creator_id: UUID
+    student_count: int
 
 
 class CourseReadSingle(CourseReadList):
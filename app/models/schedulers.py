@@ -1,8 +1,10 @@
+import heapq
 from datetime import time
 from uuid import UUID, uuid4
-from typing import TYPE_CHECKING
+from typing import Literal, TYPE_CHECKING
 from sqlalchemy import JSON, Column
-from sqlmodel import SQLModel, Field, Relationship
+from sqlmodel import SQLModel, Field, Index, Relationship, delete, insert
+from sqlmodel.ext.asyncio.session import AsyncSession
 from pydantic import field_validator, model_validator
 
 
@@ -12,6 +14,16 @@ if TYPE_CHECKING:
     from app.models.trainings import Training
 
 
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+MINUTES_PER_DAY = 24 * 60
+Weekday = Literal["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+
+def minute_of_day(value: str | time) -> int:
+    value = time.fromisoformat(value) if isinstance(value, str) else value
+    return value.hour * 60 + value.minute
+
+
 class TimeRange(SQLModel):
     start_time: str
     end_time: str
@@ -63,3 +75,85 @@ class Scheduler(SQLModel, table=True):
     sunday: dict | None = Field(default=None, sa_column=Column(JSON))
 
     training: "Training" = Relationship(back_populates="scheduler")
+
+
+class ScheduleSlot(SQLModel, table=True):
+    """One weekday of a training schedule as a minute-of-week interval, so schedules can be queried in SQL.
+
+    Derived from the `Scheduler` JSON columns, which stay the source of the API representation.
+    Ranges never cross midnight, so a slot always lies within its weekday.
+    """
+
+    __tablename__ = "schedule_slot"
+    __table_args__ = (Index("ix_schedule_slot_start_minute_end_minute", "start_minute", "end_minute", "training_id"),)
+
+    training_id: UUID = Field(foreign_key="training.id", primary_key=True)
+    # 0 is Monday
+    weekday: int = Field(primary_key=True)
+    # Minutes since Monday 00:00, end exclusive
+    start_minute: int
+    end_minute: int
+
+    @classmethod
+    def from_scheduler(cls, training_id: UUID, scheduler: SchedulerCreate) -> list[dict]:
+        slots = []
+        for weekday, name in enumerate(WEEKDAYS):
+            time_range: TimeRange | None = getattr(scheduler, name)
+            if time_range is not None:
+                day_start = weekday * MINUTES_PER_DAY
+                slots.append(
+                    {
+                        "training_id": training_id,
+                        "weekday": weekday,
+                        "start_minute": day_start + minute_of_day(time_range.start_time),
+                        "end_minute": day_start + minute_of_day(time_range.end_time),
+                    }
+                )
+        return slots
+
+    @classmethod
+    async def replace(cls, training_id: UUID, scheduler: SchedulerCreate | None, session: AsyncSession):
+        """Make the slots of a training match `scheduler` (none when it is None). The caller commits."""
+        await session.exec(delete(cls).where(cls.training_id == training_id))
+        slots = cls.from_scheduler(training_id, scheduler) if scheduler is not None else []
+        if slots:
+            await session.exec(insert(cls).values(slots))
+
+
+def format_minute(minute: int) -> str:
+    return f"{minute % MINUTES_PER_DAY // 60:02d}:{minute % 60:02d}"
+
+
+class ScheduleConflict(SQLModel):
+    """Two trainings whose sessions overlap, with the overlapping part of the week."""
+
+    training_id: UUID
+    other_training_id: UUID
+    weekday: str
+    start_time: str
+    end_time: str
+
+
+def find_conflicts(slots: list[tuple[int, int, UUID]]) -> list[ScheduleConflict]:
+    """Overlapping pairs among `(start_minute, end_minute, training_id)` slots, by sweeping them in start order.
+
+    O(n log n + k) for n slots and k conflicts: only slots still running when another one starts are compared.
+    """
+    conflicts = []
+    running: list[tuple[int, int, UUID]] = []  # heap of (end, start, training_id)
+    for start, end, training_id in sorted(slots, key=lambda slot: (slot[0], slot[1])):
+        while running and running[0][0] <= start:
+            heapq.heappop(running)
+        for other_end, _, other_id in running:
+            if other_id != training_id:
+                conflicts.append(
+                    ScheduleConflict(
+                        training_id=other_id,
+                        other_training_id=training_id,
+                        weekday=WEEKDAYS[start // MINUTES_PER_DAY],
+                        start_time=format_minute(start),
+                        end_time=format_minute(min(end, other_end)),
+                    )
+                )
+        heapq.heappush(running, (end, start, training_id))
+    return conflicts
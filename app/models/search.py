@@ -0,0 +1,24 @@
+from typing import Literal
+from uuid import UUID
+from sqlmodel import SQLModel
+
+# `topic` and `course` carry a generated `search_vector` tsvector column with a GIN index on Postgres.
+# Both are created by migrations only and are not mapped on the models, so SQLite (tests) never sees them.
+SEARCH_VECTOR_COLUMN = "search_vector"
+SEARCH_INDEXES = ("ix_topic_search_vector", "ix_course_search_vector")
+# Text search configuration of the vectors, `simple` does not stem, which suits mixed-language content
+SEARCH_CONFIG = "simple"
+
+SearchKind = Literal["topic", "course"]
+
+
+class SearchHit(SQLModel):
+    """Model for one search result, a topic or a course."""
+
+    kind: SearchKind
+    id: UUID
+    # Topic title or course name
+    title: str
+    # Matching fragment of the topic content / course description, matches wrapped in <b></b>
+    headline: str
+    rank: float
@@ -1,11 +1,9 @@
-from typing import Annotated, TYPE_CHECKING
+from typing import Annotated, Literal, TYPE_CHECKING
 from uuid import UUID, uuid4
 from datetime import datetime, UTC
-from operator import add, sub
-from pydantic import ConfigDict
-from sqlmodel import SQLModel, Field, Relationship, func, select, update
-
-from app.db.database import Session
+from pydantic import ConfigDict, model_validator
+from sqlmodel import BigInteger, SQLModel, Field, Index, Relationship, case, delete, func, insert, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 # Import only for type checking
 # Avoids forward references
@@ -15,38 +13,104 @@ if TYPE_CHECKING:
 PositiveInt = Annotated[int, Field(gt=-1)]
 
 
+# Syllabus order keys are sparse: fresh keys are SEQUENCE_GAP apart, so a topic can be moved by
+# giving it a key between its new neighbours, without renumbering the rest of the course.
+SEQUENCE_GAP = 1 << 16
+# Once a move leaves neighbouring keys closer than this, the course is renumbered in the background
+SEQUENCE_MIN_GAP = 1 << 4
+
+
 class Syllabus(SQLModel, table=True):
+    __table_args__ = (Index("ix_syllabus_course_id_sequence", "course_id", "sequence"),)
+
     course_id: UUID = Field(foreign_key="course.id", primary_key=True)
     topic_id: UUID = Field(foreign_key="topic.id", primary_key=True)
-    sequence: PositiveInt
+    # Order key only, positions exposed by the API are ranks (1..N) in this order
+    sequence: PositiveInt = Field(sa_type=BigInteger)
 
     @classmethod
-    def change_topic_position(cls, course_id: UUID, topic_id: UUID, new_pos: int, session: Session):
-        syllabus = session.exec(
-            select(cls).where((cls.topic_id == topic_id) & (cls.course_id == course_id))
-        ).one_or_none()
-        curr_pos = syllabus.sequence
-        if new_pos > curr_pos:
-            op = sub
-            lower_pos, upper_pos = curr_pos + 1, new_pos
-        elif new_pos < curr_pos:
-            op = add
-            lower_pos, upper_pos = new_pos, curr_pos - 1
-        else:
-            return
+    def next_sequence(cls, course_id: UUID):
+        """SQL expression for the key after the last topic of the course, usable as an INSERT value.
+
+        Concurrent appends would compute the same key, callers hold the course row lock (FOR UPDATE).
+        """
+        last = select(func.coalesce(func.max(cls.sequence), 0)).where(cls.course_id == course_id)
+        return last.scalar_subquery() + SEQUENCE_GAP
+
+    @classmethod
+    async def change_topic_position(cls, course_id: UUID, topic_id: UUID, new_pos: int, session: AsyncSession) -> bool:
+        """Move a topic to the 1-based position `new_pos` (at most the syllabus length) by rewriting its key only.
+
+        Reads the keys of its two new neighbours, not the whole syllabus. The caller commits.
+        Returns whether the keys around it got crowded, i.e. the course is due a `rebalance`.
+        """
+        lower, upper = await cls._neighbour_keys(course_id, topic_id, new_pos, session)
+        if upper - lower < 2:
+            # No key left in between, renumber now (rare, the background rebalance usually gets there first)
+            await cls._renumber_course(course_id, session)
+            lower, upper = await cls._neighbour_keys(course_id, topic_id, new_pos, session)
+
+        sequence = (lower + upper) // 2
+        await session.exec(
+            update(cls).where((cls.course_id == course_id) & (cls.topic_id == topic_id)).values(sequence=sequence)
+        )
+        return min(sequence - lower, upper - sequence) < SEQUENCE_MIN_GAP
 
-        stmt = (
-            update(cls)
-            .where((cls.course_id == course_id) & (cls.sequence.between(lower_pos, upper_pos)))
-            .values(sequence=op(cls.sequence, 1))
+    @classmethod
+    async def _neighbour_keys(cls, course_id: UUID, topic_id: UUID, new_pos: int, session: AsyncSession):
+        """Keys a topic must fall between to rank `new_pos`, the upper one made up past the last topic."""
+        others = (
+            select(cls.sequence).where((cls.course_id == course_id) & (cls.topic_id != topic_id)).order_by(cls.sequence)
         )
-        session.exec(stmt)
-        syllabus.sequence = new_pos
-        session.commit()
+        if new_pos > 1:
+            keys = list((await session.exec(others.offset(new_pos - 2).limit(2))).all())
+        else:
+            keys = [0, *(await session.exec(others.limit(1))).all()]
+        lower = keys[0]
+        return lower, keys[1] if len(keys) > 1 else lower + 2 * SEQUENCE_GAP
+
+    @classmethod
+    async def rebalance(cls, course_id: UUID, session: AsyncSession):
+        """Spread the keys of a course SEQUENCE_GAP apart again, keeping their order."""
+        await cls._renumber_course(course_id, session)
+        await session.commit()
+
+    @classmethod
+    async def _renumber_course(cls, course_id: UUID, session: AsyncSession):
+        statement = select(cls).where(cls.course_id == course_id).order_by(cls.sequence).with_for_update()
+        cls._renumber(list((await session.exec(statement)).all()))
 
     @classmethod
-    def get_topic_count(cls, course_id: UUID, session: Session) -> int:
-        return session.exec(select(func.count()).where(cls.course_id == course_id)).one_or_none()
+    async def set_order(cls, course_id: UUID, current: dict[UUID, int], topic_ids: list[UUID], session: AsyncSession):
+        """Make `topic_ids` the syllabus of the course, given its `current` keys by topic id.
+
+        At most one DELETE, one UPDATE and one INSERT, however many topics change. The caller commits.
+        """
+        wanted = {topic_id: position * SEQUENCE_GAP for position, topic_id in enumerate(topic_ids, start=1)}
+        removed = [topic_id for topic_id in current if topic_id not in wanted]
+        moved = {topic_id: key for topic_id, key in wanted.items() if topic_id in current and current[topic_id] != key}
+        added = [
+            {"course_id": course_id, "topic_id": topic_id, "sequence": key}
+            for topic_id, key in wanted.items()
+            if topic_id not in current
+        ]
+
+        if removed:
+            await session.exec(delete(cls).where((cls.course_id == course_id) & cls.topic_id.in_(removed)))
+        if moved:
+            await session.exec(
+                update(cls)
+                .where((cls.course_id == course_id) & cls.topic_id.in_(moved))
+                .values(sequence=case(moved, value=cls.topic_id))
+            )
+        if added:
+            await session.exec(insert(cls).values(added))
+
+    @staticmethod
+    def _renumber(rows: list["Syllabus"]):
+        for position, row in enumerate(rows, start=1):
+            if row.sequence != position * SEQUENCE_GAP:
+                row.sequence = position * SEQUENCE_GAP
 
 
 class TopicBase(SQLModel):
@@ -61,6 +125,8 @@ class TopicBase(SQLModel):
 class Topic(TopicBase, table=True):
     """Database model for Topics."""
 
+    __table_args__ = (Index("ix_topic_created_at_id", "created_at", "id"),)
+
     id: UUID = Field(default_factory=uuid4, primary_key=True, index=True, nullable=False)
     creator_id: UUID = Field()  # foreign_key="user.id"
     created_at: datetime = Field(
@@ -104,3 +170,36 @@ class TopicUpdate(SQLModel):
 
     title: str | None = None
     content: str | None = None
+
+
+class SyllabusReplace(SQLModel):
+    """Model for replacing a whole course syllabus, topics in their new order."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    topic_ids: list[UUID]
+
+
+class SyllabusOperation(SQLModel):
+    """One step of a syllabus patch, positions are 1-based."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    op: Literal["add", "remove", "move"]
+    topic_id: UUID
+    # Where to add (default: at the end) or move the topic
+    position: int | None = Field(default=None, ge=1)
+
+    @model_validator(mode="after")
+    def check_position(self) -> "SyllabusOperation":
+        if self.op == "move" and self.position is None:
+            raise ValueError("position is required to move a topic")
+        return self
+
+
+class SyllabusPatch(SQLModel):
+    """Model for editing a course syllabus with several operations, applied in order."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    operations: list[SyllabusOperation]
@@ -2,9 +2,9 @@ from uuid import UUID, uuid4
 from pydantic import ConfigDict
 from datetime import datetime, UTC
 from typing import Annotated
-from sqlmodel import SQLModel, Field, Relationship, func, select
+from sqlmodel import SQLModel, Field, Index, Relationship, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.db.database import Session
 from app.models.schedulers import Scheduler, SchedulerCreate
 
 
@@ -38,8 +38,15 @@ class TrainingBase(SQLModel):
 class Training(TrainingBase, table=True):
     """Database model for Trainings."""
 
+    __table_args__ = (
+        Index("ix_training_created_at_id", "created_at", "id"),
+        Index("ix_training_student_count_created_at_id", "student_count", "created_at", "id"),
+    )
+
     id: UUID = Field(default_factory=uuid4, primary_key=True, index=True, nullable=False)
     creator_id: UUID = Field()  # foreign_key="user.id"
+    # Number of participations, kept in step by join/leave and reconciled periodically
+    student_count: int = Field(default=0, nullable=False, sa_column_kwargs={"server_default": "0"})
     # course_id: UUID | None = Field(default=None, foreign_key="course.id", unique=True, nullable=True)
     created_at: datetime = Field(
         default_factory=lambda: datetime.now(UTC).replace(tzinfo=None),
@@ -59,9 +66,9 @@ class Training(TrainingBase, table=True):
     #     back_populates="training", sa_relationship_kwargs={"cascade": "all, delete-orphan"}
     # )
 
-    def get_students_ids(self, session: Session) -> list[UUID]:
+    async def get_students_ids(self, session: AsyncSession) -> list[UUID]:
         statement = select(TrainingParticipation.student_id).where(TrainingParticipation.training_id == self.id)
-        results = session.exec(statement)
+        results = await session.exec(statement)
         return results.all()
 
 
@@ -76,6 +83,7 @@ class TrainingReadList(TrainingBase):
 
     id: UUID
     creator_id: UUID
+    student_count: int
     # course_id: UUID | None
 
 
@@ -1,9 +1,10 @@
 from uuid import UUID
-from sqlmodel import SQLModel, select
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.db.database import Session
-from app.models.courses import CourseParticipation, Course
-from app.models.trainings import TrainingParticipation, Training
+from app.db.readonly import select_rows
+from app.models.courses import CourseParticipation, Course, CourseReadList
+from app.models.trainings import TrainingParticipation, Training, TrainingReadList
 
 
 class User(SQLModel):
@@ -12,20 +13,22 @@ class User(SQLModel):
     email: str
     full_name: str | None
 
-    def get_joined_courses(self, session: Session) -> list["Course"]:
+    async def get_joined_courses(self, session: AsyncSession) -> list:
+        """Rows of the `CourseReadList` columns."""
         statement = (
-            select(Course)
+            select_rows(Course, CourseReadList)
             .join(CourseParticipation, CourseParticipation.course_id == Course.id)
             .where(CourseParticipation.student_id == self.id)
         )
-        results = session.exec(statement)
+        results = await session.exec(statement)
         return results.all()
 
-    def get_joined_trainings(self, session: Session) -> list["Training"]:
+    async def get_joined_trainings(self, session: AsyncSession) -> list:
+        """Rows of the `TrainingReadList` columns."""
         statement = (
-            select(Training)
+            select_rows(Training, TrainingReadList)
             .join(TrainingParticipation, TrainingParticipation.training_id == Training.id)
             .where(TrainingParticipation.student_id == self.id)
         )
-        results = session.exec(statement)
+        results = await session.exec(statement)
         return results.all()
@@ -1,171 +1,404 @@
 from uuid import UUID
+from typing import Any
 from datetime import datetime, UTC
 
-from fastapi import APIRouter, HTTPException, status
-from sqlmodel import select
-from app.db.database import DBSession
-from app.models.topics import TopicReadList, Topic, Syllabus
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlmodel import delete, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from app.db.database import DBSession, PrimarySession
+from app.db.readonly import ReadSession, select_rows
+from app.models.topics import TopicReadList, Topic, Syllabus, SyllabusPatch, SyllabusReplace
 from app.models.courses import CourseCreate, Course, CourseReadSingle, CourseUpdate, CourseReadList, CourseParticipation
 
 from app.utils.auth import CurrentUser
+from app.utils.counters import add_students
+from app.utils.batch import BatchItem, BatchPayload, create_batch
+from app.utils.export import ExportFormat, export_response
+from app.utils.pagination import MAX_PAGE_SIZE, ListOrder, creation_order, order_by_keys, paginate, popularity_order
+from app.utils.http_cache import (
+    COURSE_CACHE_CONTROL,
+    COURSE_TOPICS_CACHE_CONTROL,
+    make_etag,
+)
+from app.utils.response_cache import (
+    CacheEntry,
+    course_key,
+    course_topics_key,
+    response_cache,
+    serve_cached,
+)
+from app.utils.serialization import dump_json, json_response
 
 router = APIRouter(prefix="/courses")
 
 
 @router.get("/", response_model=list[CourseReadList])
-def list_courses(session: DBSession, page: int = 1, page_size: int = 10) -> list[CourseReadList]:
-    courses = session.exec(select(Course).offset((page - 1) * page_size).limit(page_size)).all()
-    return courses
+async def list_courses(
+    session: ReadSession,
+    response: Response,
+    cursor: str | None = None,
+    page: int | None = Query(None, ge=1, description="Deprecated, use `cursor`"),
+    page_size: int = Query(10, description=f"At most {MAX_PAGE_SIZE} with `cursor`"),
+    sort: ListOrder = Query("created_at", description="`student_count` lists the most joined first"),
+) -> Response:
+    keys = popularity_order(Course) if sort == "student_count" else creation_order(Course)
+    if page is not None:
+        # Offset pagination kept for older clients
+        statement = order_by_keys(select_rows(Course, CourseReadList), keys)
+        statement = statement.offset((page - 1) * page_size).limit(page_size)
+        return json_response(list[CourseReadList], (await session.exec(statement)).all())
+    courses = await paginate(session, select_rows(Course, CourseReadList, keys), keys, cursor, page_size, response)
+    return json_response(list[CourseReadList], courses, response)
 
 
 @router.post("/", response_model=CourseReadSingle, status_code=status.HTTP_201_CREATED)
-def create_course(user: CurrentUser, course: CourseCreate, session: DBSession) -> CourseReadSingle:
+async def create_course(user: CurrentUser, course: CourseCreate, session: DBSession) -> CourseReadSingle:
     db_course = Course.model_validate(course, update={"creator_id": user.id})
     session.add(db_course)
-    session.commit()
-    session.refresh(db_course)
+    await session.commit()
+    await session.refresh(db_course)
     return db_course
 
 
+@router.post("/batch", response_model=list[BatchItem[CourseReadSingle]], status_code=status.HTTP_201_CREATED)
+async def create_courses(
+    user: CurrentUser, response: Response, session: DBSession, courses: list[Any] = BatchPayload
+) -> list[BatchItem[CourseReadSingle]]:
+    return await create_batch(session, response, courses, CourseCreate, Course, user.id)
+
+
 @router.get("/joined", response_model=list[CourseReadList])
-def read_courses_user_joined(user: CurrentUser, session: DBSession) -> list[CourseReadList]:
-    return user.get_joined_courses(session)
+async def read_courses_user_joined(user: CurrentUser, session: ReadSession) -> Response:
+    return json_response(list[CourseReadList], await user.get_joined_courses(session))
 
 
 @router.get("/by/me", response_model=list[CourseReadList])
-def read_courses_current_user_created(user: CurrentUser, session: DBSession) -> list[CourseReadList]:
-    my_courses = session.exec(select(Course).where(Course.creator_id == user.id)).all()
-    return my_courses
+async def read_courses_current_user_created(user: CurrentUser, session: ReadSession) -> Response:
+    my_courses = (await session.exec(select_rows(Course, CourseReadList).where(Course.creator_id == user.id))).all()
+    return json_response(list[CourseReadList], my_courses)
 
 
 @router.get("/by/{user_id}", response_model=list[CourseReadList])
-def read_courses_given_user_created(user_id: UUID, session: DBSession) -> list[CourseReadList]:
-    user_courses = session.exec(select(Course).where(Course.creator_id == user_id)).all()
-    return user_courses
+async def read_courses_given_user_created(user_id: UUID, session: ReadSession) -> Response:
+    user_courses = (await session.exec(select_rows(Course, CourseReadList).where(Course.creator_id == user_id))).all()
+    return json_response(list[CourseReadList], user_courses)
 
 
 @router.get("/{course_id}", response_model=CourseReadSingle)
-def read_course(course_id: UUID, session: DBSession) -> CourseReadSingle:
-    course = session.get(Course, course_id)
-    if course is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Course not found")
-    return course
+async def read_course(course_id: UUID, request: Request, session: ReadSession, primary: PrimarySession) -> Response:
+    async def revalidate() -> str | None:
+        # Answer revalidations from the timestamp alone, without loading the row
+        version = (
+            await session.exec(select(Course.updated_at, Course.student_count).where(Course.id == course_id))
+        ).one_or_none()
+        return None if version is None else make_etag(course_id, *version)
+
+    async def load(session: AsyncSession) -> CacheEntry:
+        course = await session.get(Course, course_id)
+        if course is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Course not found")
+        # Joins and leaves change the count without touching updated_at
+        return make_etag(course.id, course.updated_at, course.student_count), dump_json(CourseReadSingle, course)
+
+    return await serve_cached(request, course_key(course_id), COURSE_CACHE_CONTROL, session, primary, load, revalidate)
+
+
+def course_topics_etag(course_id: UUID, updated_at: datetime, topic_count: int, topics_updated_at: datetime | None):
+    # Syllabus edits touch the course, topic edits and deletions change the count or the latest topic update
+    return make_etag(course_id, updated_at, topic_count, topics_updated_at)
 
 
 @router.get("/{course_id}/topics", response_model=list[TopicReadList])
-def read_course_topics(course_id: UUID, session: DBSession) -> list[TopicReadList]:
-    course = session.get(Course, course_id)
-    if course is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Course not found")
-    return course.topics
+async def read_course_topics(
+    course_id: UUID, request: Request, session: ReadSession, primary: PrimarySession
+) -> Response:
+    async def revalidate() -> str | None:
+        version = (
+            await session.exec(
+                select(Course.updated_at, func.count(Topic.id), func.max(Topic.updated_at))
+                .select_from(Course)
+                .outerjoin(Syllabus, Syllabus.course_id == Course.id)
+                .outerjoin(Topic, Topic.id == Syllabus.topic_id)
+                .where(Course.id == course_id)
+                .group_by(Course.id, Course.updated_at)
+            )
+        ).one_or_none()
+        return None if version is None else course_topics_etag(course_id, *version)
+
+    async def load(session: AsyncSession) -> CacheEntry:
+        course = await session.get(Course, course_id, options=[selectinload(Course.topics)])
+        if course is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Course not found")
+        topics_updated_at = max((topic.updated_at for topic in course.topics), default=None)
+        etag = course_topics_etag(course.id, course.updated_at, len(course.topics), topics_updated_at)
+        return etag, dump_json(list[TopicReadList], course.topics)
+
+    return await serve_cached(
+        request, course_topics_key(course_id), COURSE_TOPICS_CACHE_CONTROL, session, primary, load, revalidate
+    )
 
 
 @router.post("/{course_id}/topics/{topic_id}", response_model=list[TopicReadList])
-def add_topic_to_course(user: CurrentUser, course_id: UUID, topic_id: UUID, session: DBSession) -> list[TopicReadList]:
-    course = session.exec(select(Course).where((Course.id == course_id) & (Course.creator_id == user.id))).one_or_none()
+async def add_topic_to_course(
+    user: CurrentUser, course_id: UUID, topic_id: UUID, session: DBSession
+) -> list[TopicReadList]:
+    course = (
+        await session.exec(
+            select(Course)
+            .where((Course.id == course_id) & (Course.creator_id == user.id))
+            .options(selectinload(Course.topics))
+            # Serializes appends to the course, they would compute the same next sequence key
+            .with_for_update()
+        )
+    ).one_or_none()
     if course is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Course not found")
 
-    topic = session.exec(select(Topic).where((Topic.id == topic_id) & (Topic.creator_id == user.id))).one_or_none()
+    topic = (
+        await session.exec(select(Topic).where((Topic.id == topic_id) & (Topic.creator_id == user.id)))
+    ).one_or_none()
     if topic is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Topic not found")
 
-    syllabus_record = session.exec(
-        select(Syllabus).where((Syllabus.topic_id == topic_id) & (Syllabus.course_id == course_id))
-    ).one_or_none()
-    if syllabus_record is not None:
+    if any(course_topic.id == topic_id for course_topic in course.topics):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Topic already exists in the course")
 
-    topic_count = Syllabus.get_topic_count(course_id, session)
-    syllabus = Syllabus(course_id=course_id, topic_id=topic_id, sequence=topic_count + 1)
+    syllabus = Syllabus(course_id=course_id, topic_id=topic_id, sequence=Syllabus.next_sequence(course_id))
     session.add(syllabus)
-    session.commit()
-    return course.topics
+    course.updated_at = datetime.now(UTC).replace(tzinfo=None)
+    await session.commit()
+    await response_cache.invalidate(course_key(course_id), course_topics_key(course_id))
+    # The new topic goes last, no need to reload the syllabus
+    return [*course.topics, topic]
 
 
 @router.delete("/{course_id}/topics/{topic_id}", response_model=list[TopicReadList])
-def delete_topic_from_course(
+async def delete_topic_from_course(
     user: CurrentUser, course_id: UUID, topic_id: UUID, session: DBSession
 ) -> list[TopicReadList]:
-    course = session.exec(select(Course).where((Course.id == course_id) & (Course.creator_id == user.id))).one_or_none()
+    course = (
+        await session.exec(
+            select(Course)
+            .where((Course.id == course_id) & (Course.creator_id == user.id))
+            .options(selectinload(Course.topics))
+        )
+    ).one_or_none()
     if course is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Course not found")
 
-    syllabus_record = session.exec(
-        select(Syllabus).where((Syllabus.topic_id == topic_id) & (Syllabus.course_id == course_id))
-    ).one_or_none()
-    if syllabus_record is None:
+    if not any(course_topic.id == topic_id for course_topic in course.topics):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Topic not found in the course")
-    topic_count = Syllabus.get_topic_count(course_id, session)
-    Syllabus.change_topic_position(course_id, topic_id, topic_count, session)
-    session.delete(syllabus_record)
-    session.commit()
-    return course.topics
+    # Sparse keys need no renumbering, removing the row keeps the order of the rest
+    await session.exec(delete(Syllabus).where((Syllabus.course_id == course_id) & (Syllabus.topic_id == topic_id)))
+    course.updated_at = datetime.now(UTC).replace(tzinfo=None)
+    await session.commit()
+    await response_cache.invalidate(course_key(course_id), course_topics_key(course_id))
+    return [course_topic for course_topic in course.topics if course_topic.id != topic_id]
 
 
 @router.post("/{course_id}/topics/{topic_id}/{position}", response_model=list[TopicReadList])
-def change_topic_position_in_course(
-    user: CurrentUser, course_id: UUID, topic_id: UUID, position: int, session: DBSession
+async def change_topic_position_in_course(
+    user: CurrentUser,
+    course_id: UUID,
+    topic_id: UUID,
+    position: int,
+    session: DBSession,
+    background_tasks: BackgroundTasks,
 ) -> list[TopicReadList]:
     if position < 1:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Non-positive position is not allowed")
-    course = session.exec(select(Course).where((Course.id == course_id) & (Course.creator_id == user.id))).one_or_none()
+    course = (
+        await session.exec(
+            select(Course)
+            .where((Course.id == course_id) & (Course.creator_id == user.id))
+            .options(selectinload(Course.topics))
+            # Serializes moves and appends, which pick keys from the same neighbours
+            .with_for_update()
+        )
+    ).one_or_none()
     if course is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Course not found")
 
-    syllabus_record = session.exec(
-        select(Syllabus).where((Syllabus.topic_id == topic_id) & (Syllabus.course_id == course_id))
-    ).one_or_none()
-    if syllabus_record is None:
+    topics = [course_topic for course_topic in course.topics if course_topic.id != topic_id]
+    if len(topics) == len(course.topics):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Topic not found in the course")
 
-    topic_count = Syllabus.get_topic_count(course_id, session)
-    if position > topic_count:
-        position = topic_count
-    Syllabus.change_topic_position(course_id, topic_id, position, session)
-    return course.topics
+    position = min(position, len(course.topics))
+    if course.topics[position - 1].id == topic_id:
+        return course.topics
+    # Flushed together with the move
+    course.updated_at = datetime.now(UTC).replace(tzinfo=None)
+    crowded = await Syllabus.change_topic_position(course_id, topic_id, position, session)
+    await session.commit()
+    if crowded:
+        background_tasks.add_task(rebalance_syllabus, course_id, session.bind)
+    await response_cache.invalidate(course_key(course_id), course_topics_key(course_id))
+    # Apply the same move to the already loaded syllabus instead of reloading it
+    moved = next(course_topic for course_topic in course.topics if course_topic.id == topic_id)
+    topics.insert(position - 1, moved)
+    return topics
+
+
+async def current_syllabus(course_id: UUID, session: DBSession) -> tuple[list[Topic], dict[UUID, int]]:
+    """Topics of the course in order, and their sequence keys by topic id, in one query."""
+    rows = (
+        await session.exec(
+            select(Topic, Syllabus.sequence)
+            .join(Syllabus, Syllabus.topic_id == Topic.id)
+            .where(Syllabus.course_id == course_id)
+            .order_by(Syllabus.sequence)
+        )
+    ).all()
+    return [topic for topic, _ in rows], {topic.id: key for topic, key in rows}
+
+
+async def save_syllabus(
+    user: CurrentUser,
+    course: Course,
+    topics: list[Topic],
+    keys: dict[UUID, int],
+    topic_ids: list[UUID],
+    session: DBSession,
+) -> list[Topic]:
+    known = {topic.id: topic for topic in topics}
+    new_ids = {topic_id for topic_id in topic_ids if topic_id not in known}
+    if new_ids:
+        new_topics = (
+            await session.exec(select(Topic).where(Topic.id.in_(new_ids) & (Topic.creator_id == user.id)))
+        ).all()
+        if len(new_topics) != len(new_ids):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Topic not found")
+        known.update((topic.id, topic) for topic in new_topics)
+
+    await Syllabus.set_order(course.id, keys, topic_ids, session)
+    course.updated_at = datetime.now(UTC).replace(tzinfo=None)
+    await session.commit()
+    await response_cache.invalidate(course_key(course.id), course_topics_key(course.id))
+    return [known[topic_id] for topic_id in topic_ids]
+
+
+@router.put("/{course_id}/topics", response_model=list[TopicReadList])
+async def replace_course_topics(
+    user: CurrentUser, course_id: UUID, syllabus: SyllabusReplace, session: DBSession
+) -> list[TopicReadList]:
+    if len(set(syllabus.topic_ids)) != len(syllabus.topic_ids):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Duplicate topics in the syllabus")
+    course = (
+        await session.exec(select(Course).where((Course.id == course_id) & (Course.creator_id == user.id)))
+    ).one_or_none()
+    if course is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Course not found")
+
+    topics, keys = await current_syllabus(course_id, session)
+    return await save_syllabus(user, course, topics, keys, syllabus.topic_ids, session)
+
+
+@router.patch("/{course_id}/topics", response_model=list[TopicReadList])
+async def patch_course_topics(
+    user: CurrentUser, course_id: UUID, syllabus_patch: SyllabusPatch, session: DBSession
+) -> list[TopicReadList]:
+    course = (
+        await session.exec(select(Course).where((Course.id == course_id) & (Course.creator_id == user.id)))
+    ).one_or_none()
+    if course is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Course not found")
+
+    topics, keys = await current_syllabus(course_id, session)
+    # Replay the operations on the ids, then write the outcome at once
+    topic_ids = [topic.id for topic in topics]
+    for operation in syllabus_patch.operations:
+        if operation.op == "add":
+            if operation.topic_id in topic_ids:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST, detail="Topic already exists in the course"
+                )
+        elif operation.topic_id in topic_ids:
+            topic_ids.remove(operation.topic_id)
+        else:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Topic not found in the course")
+        if operation.op != "remove":
+            position = min(operation.position or len(topic_ids) + 1, len(topic_ids) + 1)
+            topic_ids.insert(position - 1, operation.topic_id)
+
+    return await save_syllabus(user, course, topics, keys, topic_ids, session)
+
+
+async def rebalance_syllabus(course_id: UUID, bind: AsyncEngine):
+    # Runs after the response is sent, when the request's session is already closed
+    async with AsyncSession(bind, expire_on_commit=False) as session:
+        await Syllabus.rebalance(course_id, session)
 
 
 @router.get("/{course_id}/students", response_model=list[UUID])
-def read_course_students_ids(user: CurrentUser, course_id: UUID, session: DBSession) -> list[UUID]:
-    course = session.exec(select(Course).where((Course.id == course_id) & (Course.creator_id == user.id))).one_or_none()
+async def read_course_students_ids(user: CurrentUser, course_id: UUID, session: DBSession) -> list[UUID]:
+    course = (
+        await session.exec(select(Course).where((Course.id == course_id) & (Course.creator_id == user.id)))
+    ).one_or_none()
     if course is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Course not found")
-    return course.get_students_ids(session)
+    return await course.get_students_ids(session)
+
+
+@router.get("/{course_id}/students/export", response_class=StreamingResponse)
+async def export_course_students(
+    user: CurrentUser, course_id: UUID, session: DBSession, format: ExportFormat = "ndjson"
+) -> StreamingResponse:
+    """Stream the roster as NDJSON or CSV, without loading it in memory."""
+    owned = (
+        await session.exec(select(Course.id).where((Course.id == course_id) & (Course.creator_id == user.id)))
+    ).one_or_none()
+    if owned is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Course not found")
+    statement = select(CourseParticipation.student_id).where(CourseParticipation.course_id == course_id)
+    return export_response(session.bind, statement, format, f"course-{course_id}-students")
 
 
 @router.post("/{course_id}/join", response_model=CourseReadSingle)
-def join_the_course(user: CurrentUser, course_id: UUID, session: DBSession) -> CourseReadSingle:
-    course = session.exec(select(Course).where((Course.id == course_id) & (Course.creator_id != user.id))).one_or_none()
+async def join_the_course(user: CurrentUser, course_id: UUID, session: DBSession) -> CourseReadSingle:
+    course = (
+        await session.exec(select(Course).where((Course.id == course_id) & (Course.creator_id != user.id)))
+    ).one_or_none()
     if course is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Course not found")
 
     c_participation = CourseParticipation(course_id=course_id, student_id=user.id)
     session.add(c_participation)
-    session.commit()
+    set_committed_value(course, "student_count", await add_students(Course, course_id, 1, session))
+    await session.commit()
+    await response_cache.invalidate(course_key(course_id))
     return course
 
 
 @router.post("/{course_id}/leave", response_model=dict)
-def leave_the_course(user: CurrentUser, course_id: UUID, session: DBSession) -> dict:
-    c_participation = session.exec(
-        select(CourseParticipation).where(
-            (CourseParticipation.course_id == course_id) & (CourseParticipation.student_id == user.id)
+async def leave_the_course(user: CurrentUser, course_id: UUID, session: DBSession) -> dict:
+    c_participation = (
+        await session.exec(
+            select(CourseParticipation).where(
+                (CourseParticipation.course_id == course_id) & (CourseParticipation.student_id == user.id)
+            )
         )
     ).one_or_none()
     if c_participation is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Course not found")
 
-    session.delete(c_participation)
-    session.commit()
+    await session.delete(c_participation)
+    await add_students(Course, course_id, -1, session)
+    await session.commit()
+    await response_cache.invalidate(course_key(course_id))
     return {"messagge": "Successfully left the course"}
 
 
 @router.patch("/{course_id}", response_model=CourseReadSingle)
-def update_course(
+async def update_course(
     user: CurrentUser, course_id: UUID, course_update: CourseUpdate, session: DBSession
 ) -> CourseReadSingle:
-    course = session.exec(select(Course).where((Course.id == course_id) & (Course.creator_id == user.id))).one_or_none()
+    course = (
+        await session.exec(select(Course).where((Course.id == course_id) & (Course.creator_id == user.id)))
+    ).one_or_none()
     if course is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Course not found")
 
@@ -176,18 +409,26 @@ def update_course(
 
     course.updated_at = datetime.now(UTC).replace(tzinfo=None)
     session.add(course)
-    session.commit()
-    session.refresh(course)
+    await session.commit()
+    await response_cache.invalidate(course_key(course_id), course_topics_key(course_id))
+    await session.refresh(course)
     return course
 
 
 @router.delete("/{course_id}", response_model=dict)
-def delete_course(user: CurrentUser, course_id: UUID, session: DBSession) -> dict:
-    course = session.exec(select(Course).where((Course.id == course_id) & (Course.creator_id == user.id))).one_or_none()
+async def delete_course(user: CurrentUser, course_id: UUID, session: DBSession) -> dict:
+    course = (
+        await session.exec(
+            select(Course)
+            .where((Course.id == course_id) & (Course.creator_id == user.id))
+            .options(selectinload(Course.topics))
+        )
+    ).one_or_none()
     if course is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Course not found")
 
     # Delete the Course
-    session.delete(course)
-    session.commit()
+    await session.delete(course)
+    await session.commit()
+    await response_cache.invalidate(course_key(course_id), course_topics_key(course_id))
     return {"message": "Course has been deleted"}
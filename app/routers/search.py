@@ -0,0 +1,104 @@
+import re
+
+from fastapi import APIRouter, Query, Response
+from sqlalchemy import Float, String, case, func, literal, literal_column, or_, union_all
+from sqlmodel import select
+
+from app.db.database import DBSession
+from app.models.courses import Course
+from app.models.topics import Topic
+from app.models.search import SEARCH_CONFIG, SEARCH_VECTOR_COLUMN, SearchHit, SearchKind
+from app.utils.pagination import paginate
+
+router = APIRouter(prefix="/search")
+
+# (kind, model, title column, body column)
+SEARCHABLE = [("topic", Topic, Topic.title, Topic.content), ("course", Course, Course.name, Course.description)]
+HEADLINE_OPTIONS = "MaxWords=35, MinWords=15, MaxFragments=2"
+# Length of the fallback snippet, around the first match
+SNIPPET_LENGTH = 200
+
+
+def full_text_search(q: str, kinds: list[str]):
+    """Postgres: match against the GIN-indexed `search_vector` columns, ranked with `ts_rank`."""
+    # Inlined, asyncpg would send a bound config as varchar, which does not cast to regconfig implicitly
+    config = literal_column(f"'{SEARCH_CONFIG}'::regconfig")
+    query = func.websearch_to_tsquery(config, q)
+    branches = []
+    for kind, model, title, body in SEARCHABLE:
+        if kind in kinds:
+            vector = literal_column(f"{model.__tablename__}.{SEARCH_VECTOR_COLUMN}")
+            branches.append(
+                select(
+                    literal(kind, String).label("kind"),
+                    model.id.label("id"),
+                    title.label("title"),
+                    body.label("body"),
+                    func.ts_rank(vector, query, type_=Float).label("rank"),
+                ).where(vector.op("@@")(query))
+            )
+    hits = union_all(*branches).subquery("hits")
+    # Selected outside the union, so Postgres only builds headlines for the rows of the page
+    headline = func.ts_headline(config, hits.c.body, query, HEADLINE_OPTIONS, type_=String)
+    return hits, select(hits.c.kind, hits.c.id, hits.c.title, headline.label("headline"), hits.c.rank)
+
+
+def escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def like_search(terms: list[str], kinds: list[str]):
+    """Fallback for other databases (SQLite in tests): every term must occur, title matches rank higher."""
+    patterns = [f"%{escape_like(term)}%" for term in terms]
+    branches = []
+    for kind, model, title, body in SEARCHABLE:
+        if kind in kinds:
+            title_matches = [case((title.ilike(pattern, escape="\\"), 1.0), else_=0.0) for pattern in patterns]
+            branches.append(
+                select(
+                    literal(kind, String).label("kind"),
+                    model.id.label("id"),
+                    title.label("title"),
+                    body.label("headline"),
+                    (sum(title_matches) / len(patterns)).label("rank"),
+                ).where(
+                    *(or_(title.ilike(pattern, escape="\\"), body.ilike(pattern, escape="\\")) for pattern in patterns)
+                )
+            )
+    hits = union_all(*branches).subquery("hits")
+    return hits, select(hits.c.kind, hits.c.id, hits.c.title, hits.c.headline, hits.c.rank)
+
+
+def highlight(text: str, terms: list[str]) -> str:
+    """Snippet of `text` around the first match, matches wrapped in <b></b> like `ts_headline` does."""
+    pattern = re.compile("|".join(re.escape(term) for term in terms), re.IGNORECASE)
+    match = pattern.search(text)
+    start = max(0, match.start() - SNIPPET_LENGTH // 4) if match else 0
+    return pattern.sub(lambda found: f"<b>{found.group(0)}</b>", text[start : start + SNIPPET_LENGTH])
+
+
+@router.get("/", response_model=list[SearchHit])
+async def search(
+    session: DBSession,
+    response: Response,
+    q: str = Query(min_length=1, max_length=200),
+    kind: SearchKind | None = None,
+    cursor: str | None = None,
+    limit: int = Query(20, ge=1, le=100),
+) -> list[SearchHit]:
+    kinds = [kind] if kind else [searchable[0] for searchable in SEARCHABLE]
+    if session.bind.dialect.name == "postgresql":
+        hits, statement = full_text_search(q, kinds)
+        terms = None
+    else:
+        terms = re.findall(r"\w+", q)
+        if not terms:
+            return []
+        hits, statement = like_search(terms, kinds)
+
+    # Best matches first, the cursor carries the rank of the last hit
+    keys = [(hits.c.rank, True), (hits.c.kind, False), (hits.c.id, False)]
+    rows = await paginate(session, statement, keys, cursor, limit, response)
+    if terms is None:
+        return rows
+    return [{**row._mapping, "headline": highlight(row.headline, terms)} for row in rows]
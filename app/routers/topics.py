@@ -1,54 +1,93 @@
 from uuid import UUID
+from typing import Any
 from datetime import datetime, UTC
 
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
 from sqlmodel import select
-from app.db.database import DBSession
-from app.models.topics import TopicCreate, Topic, TopicReadSingle, TopicUpdate, TopicReadList
+from sqlalchemy.orm import selectinload
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.database import DBSession, PrimarySession
+from app.db.readonly import ReadSession, select_rows
+from app.models.topics import Syllabus, TopicCreate, Topic, TopicReadSingle, TopicUpdate, TopicReadList
 from app.utils.auth import CurrentUser
+from app.utils.batch import BatchItem, BatchPayload, create_batch
+from app.utils.pagination import MAX_PAGE_SIZE, creation_order, order_by_keys, paginate
+from app.utils.http_cache import TOPIC_CACHE_CONTROL, make_etag
+from app.utils.response_cache import CacheEntry, course_topics_key, response_cache, serve_cached, topic_key
+from app.utils.serialization import dump_json, json_response
 
 router = APIRouter(prefix="/topics")
 
 
 @router.get("/", response_model=list[TopicReadList])
-def list_topics(session: DBSession, offset: int = 0, limit: int = 100) -> list[TopicReadList]:
-    topics = session.exec(select(Topic).offset(offset).limit(limit)).all()
-    return topics
+async def list_topics(
+    session: ReadSession,
+    response: Response,
+    cursor: str | None = None,
+    offset: int | None = Query(None, ge=0, description="Deprecated, use `cursor`"),
+    limit: int = Query(100, description=f"At most {MAX_PAGE_SIZE} with `cursor`"),
+) -> Response:
+    keys = creation_order(Topic)
+    if offset is not None:
+        # Offset pagination kept for older clients
+        statement = order_by_keys(select_rows(Topic, TopicReadList), keys).offset(offset).limit(limit)
+        return json_response(list[TopicReadList], (await session.exec(statement)).all())
+    topics = await paginate(session, select_rows(Topic, TopicReadList, keys), keys, cursor, limit, response)
+    return json_response(list[TopicReadList], topics, response)
 
 
 @router.post("/", response_model=TopicReadSingle, status_code=status.HTTP_201_CREATED)
-def create_topic(user: CurrentUser, topic: TopicCreate, session: DBSession) -> TopicReadSingle:
+async def create_topic(user: CurrentUser, topic: TopicCreate, session: DBSession) -> TopicReadSingle:
     db_topic = Topic.model_validate(topic, update={"creator_id": user.id})
     session.add(db_topic)
-    session.commit()
-    session.refresh(db_topic)
+    await session.commit()
+    await session.refresh(db_topic)
     return db_topic
 
 
+@router.post("/batch", response_model=list[BatchItem[TopicReadSingle]], status_code=status.HTTP_201_CREATED)
+async def create_topics(
+    user: CurrentUser, response: Response, session: DBSession, topics: list[Any] = BatchPayload
+) -> list[BatchItem[TopicReadSingle]]:
+    return await create_batch(session, response, topics, TopicCreate, Topic, user.id)
+
+
 @router.get("/by/me", response_model=list[TopicReadList])
-def read_current_user_topics(user: CurrentUser, session: DBSession):
-    user_courses = session.exec(select(Topic).where(Topic.creator_id == user.id)).all()
-    return user_courses
+async def read_current_user_topics(user: CurrentUser, session: ReadSession) -> Response:
+    user_topics = (await session.exec(select_rows(Topic, TopicReadList).where(Topic.creator_id == user.id))).all()
+    return json_response(list[TopicReadList], user_topics)
 
 
 # @router.get("/by/{user_id}", response_model=list[TopicReadList])
-# def read_given_user_topics(user_id: UUID, session: DBSession):
-#     user_courses = session.exec(select(Topic).where(Topic.creator_id == user_id)).all()
+# async def read_given_user_topics(user_id: UUID, session: DBSession):
+#     user_courses = (await session.exec(select(Topic).where(Topic.creator_id == user_id))).all()
 #     return user_courses
 
 
 @router.get("/{topic_id}", response_model=TopicReadSingle)
-def read_topic(topic_id: UUID, session: DBSession) -> TopicReadSingle:
-    topic = session.get(Topic, topic_id)
-    if topic is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Topic not found")
-    return topic
+async def read_topic(topic_id: UUID, request: Request, session: ReadSession, primary: PrimarySession) -> Response:
+    async def revalidate() -> str | None:
+        # Answer revalidations from the timestamp alone, without loading the (large) content
+        updated_at = (await session.exec(select(Topic.updated_at).where(Topic.id == topic_id))).one_or_none()
+        return None if updated_at is None else make_etag(topic_id, updated_at)
+
+    async def load(session: AsyncSession) -> CacheEntry:
+        topic = await session.get(Topic, topic_id)
+        if topic is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Topic not found")
+        return make_etag(topic.id, topic.updated_at), dump_json(TopicReadSingle, topic)
+
+    return await serve_cached(request, topic_key(topic_id), TOPIC_CACHE_CONTROL, session, primary, load, revalidate)
 
 
 @router.patch("/{topic_id}", response_model=TopicReadSingle)
-def update_topic(user: CurrentUser, topic_id: UUID, topic_update: TopicUpdate, session: DBSession) -> TopicReadSingle:
-    topic = session.exec(select(Topic).where((Topic.id == topic_id) & (Topic.creator_id == user.id))).one_or_none()
+async def update_topic(
+    user: CurrentUser, topic_id: UUID, topic_update: TopicUpdate, session: DBSession
+) -> TopicReadSingle:
+    topic = (
+        await session.exec(select(Topic).where((Topic.id == topic_id) & (Topic.creator_id == user.id)))
+    ).one_or_none()
     if topic is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Topic not found")
 
@@ -59,18 +98,29 @@ def update_topic(user: CurrentUser, topic_id: UUID, topic_update: TopicUpdate, s
 
     topic.updated_at = datetime.now(UTC).replace(tzinfo=None)
     session.add(topic)
-    session.commit()
-    session.refresh(topic)
+    await session.commit()
+    # Course syllabi embed the topic as well
+    course_ids = (await session.exec(select(Syllabus.course_id).where(Syllabus.topic_id == topic_id))).all()
+    await response_cache.invalidate(topic_key(topic_id), *map(course_topics_key, course_ids))
+    await session.refresh(topic)
     return topic
 
 
 @router.delete("/{topic_id}", response_model=dict)
-def delete_topic(user: CurrentUser, topic_id: UUID, session: DBSession) -> dict:
-    topic = session.exec(select(Topic).where((Topic.id == topic_id) & (Topic.creator_id == user.id))).one_or_none()
+async def delete_topic(user: CurrentUser, topic_id: UUID, session: DBSession) -> dict:
+    topic = (
+        await session.exec(
+            select(Topic)
+            .where((Topic.id == topic_id) & (Topic.creator_id == user.id))
+            .options(selectinload(Topic.courses))
+        )
+    ).one_or_none()
     if topic is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Topic not found")
 
     # Delete the Topic
-    session.delete(topic)
-    session.commit()
+    course_ids = [course.id for course in topic.courses]
+    await session.delete(topic)
+    await session.commit()
+    await response_cache.invalidate(topic_key(topic_id), *map(course_topics_key, course_ids))
     return {"message": "Topic has been deleted"}
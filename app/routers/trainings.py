@@ -1,10 +1,26 @@
 from uuid import UUID
-from datetime import datetime, UTC
-
-from fastapi import APIRouter, HTTPException, status
-from sqlmodel import select
-from app.db.database import DBSession
-from app.models.schedulers import Scheduler, SchedulerCreate
+from typing import Any, Literal
+from datetime import datetime, time, UTC
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlmodel import or_, select
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.database import DBSession, PrimarySession
+from app.db.readonly import ReadSession, select_rows
+from app.models.schedulers import (
+    MINUTES_PER_DAY,
+    WEEKDAYS,
+    ScheduleConflict,
+    Scheduler,
+    SchedulerCreate,
+    ScheduleSlot,
+    Weekday,
+    find_conflicts,
+    minute_of_day,
+)
 from app.models.trainings import (
     TrainingCreate,
     Training,
@@ -15,115 +31,285 @@ from app.models.trainings import (
 )
 
 from app.utils.auth import CurrentUser
+from app.utils.counters import add_students
+from app.utils.batch import BatchItem, BatchPayload, create_batch
+from app.utils.export import ExportFormat, export_response
+from app.utils.pagination import MAX_PAGE_SIZE, ListOrder, creation_order, order_by_keys, paginate, popularity_order
+from app.utils.http_cache import TRAINING_CACHE_CONTROL, make_etag
+from app.utils.response_cache import CacheEntry, response_cache, serve_cached, training_key
+from app.utils.serialization import dump_json, json_response
 
 router = APIRouter(prefix="/trainings")
 
+# Set on joins that overlap already joined trainings, comma-separated ids of those trainings
+SCHEDULE_CONFLICTS_HEADER = "X-Schedule-Conflicts"
+
 
 @router.get("/", response_model=list[TrainingReadList])
-def list_trainings(session: DBSession, page: int = 1, page_size: int = 10) -> list[TrainingReadList]:
-    trainings = session.exec(select(Training).offset((page - 1) * page_size).limit(page_size)).all()
-    return trainings
+async def list_trainings(
+    session: ReadSession,
+    response: Response,
+    cursor: str | None = None,
+    page: int | None = Query(None, ge=1, description="Deprecated, use `cursor`"),
+    page_size: int = Query(10, description=f"At most {MAX_PAGE_SIZE} with `cursor`"),
+    sort: ListOrder = Query("created_at", description="`student_count` lists the most joined first"),
+) -> Response:
+    keys = popularity_order(Training) if sort == "student_count" else creation_order(Training)
+    if page is not None:
+        # Offset pagination kept for older clients
+        statement = order_by_keys(select_rows(Training, TrainingReadList), keys)
+        statement = statement.offset((page - 1) * page_size).limit(page_size)
+        return json_response(list[TrainingReadList], (await session.exec(statement)).all())
+    statement = select_rows(Training, TrainingReadList, keys)
+    trainings = await paginate(session, statement, keys, cursor, page_size, response)
+    return json_response(list[TrainingReadList], trainings, response)
 
 
 @router.post("/", response_model=TrainingReadSingle, status_code=status.HTTP_201_CREATED)
-def create_training(user: CurrentUser, training: TrainingCreate, session: DBSession) -> TrainingReadSingle:
+async def create_training(user: CurrentUser, training: TrainingCreate, session: DBSession) -> TrainingReadSingle:
     db_training = Training.model_validate(training, update={"creator_id": user.id})
     session.add(db_training)
-    session.commit()
-    session.refresh(db_training)
+    await session.commit()
+    await session.refresh(db_training)
+    # A new training has no scheduler yet, mark it loaded instead of querying for it
+    set_committed_value(db_training, "scheduler", None)
     return db_training
 
 
+@router.post("/batch", response_model=list[BatchItem[TrainingReadSingle]], status_code=status.HTTP_201_CREATED)
+async def create_trainings(
+    user: CurrentUser, response: Response, session: DBSession, trainings: list[Any] = BatchPayload
+) -> list[BatchItem[TrainingReadSingle]]:
+    return await create_batch(
+        session, response, trainings, TrainingCreate, Training, user.id, empty_relationships=("scheduler",)
+    )
+
+
+@router.get("/available", response_model=list[TrainingReadList])
+async def list_available_trainings(
+    session: ReadSession,
+    response: Response,
+    weekday: Weekday | None = Query(None, description="Any day when omitted"),
+    start: time = Query(time(0, 0), description="Start of the time window, HH:MM"),
+    end: time | None = Query(None, description="End of the time window, HH:MM (default: end of the day)"),
+    overlap: bool = Query(False, description="Also match sessions that only partly fall into the window"),
+    cursor: str | None = None,
+    page_size: int = Query(10, description=f"At most {MAX_PAGE_SIZE} with `cursor`"),
+) -> Response:
+    window_start = minute_of_day(start)
+    window_end = minute_of_day(end) if end is not None else MINUTES_PER_DAY
+    if window_start >= window_end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'start' must be earlier than 'end'")
+
+    days = [WEEKDAYS.index(weekday)] if weekday else range(len(WEEKDAYS))
+    windows = []
+    for day in days:
+        day_start = day * MINUTES_PER_DAY
+        lower, upper = day_start + window_start, day_start + window_end
+        if overlap:
+            # Slots never cross midnight, the lower bound on start_minute keeps this an index range scan
+            windows.append(
+                (ScheduleSlot.start_minute >= day_start)
+                & (ScheduleSlot.start_minute < upper)
+                & (ScheduleSlot.end_minute > lower)
+            )
+        else:
+            windows.append((ScheduleSlot.start_minute.between(lower, upper)) & (ScheduleSlot.end_minute <= upper))
+    matching = select(ScheduleSlot.training_id).where(or_(*windows))
+    keys = creation_order(Training)
+    statement = select_rows(Training, TrainingReadList, keys).where(Training.id.in_(matching))
+    trainings = await paginate(session, statement, keys, cursor, page_size, response)
+    return json_response(list[TrainingReadList], trainings, response)
+
+
 @router.get("/joined", response_model=list[TrainingReadList])
-def read_trainings_user_joined(user: CurrentUser, session: DBSession) -> list[TrainingReadList]:
-    return user.get_joined_trainings(session)
+async def read_trainings_user_joined(user: CurrentUser, session: ReadSession) -> Response:
+    return json_response(list[TrainingReadList], await user.get_joined_trainings(session))
+
+
+@router.get("/joined/conflicts", response_model=list[ScheduleConflict])
+async def read_joined_trainings_conflicts(user: CurrentUser, session: DBSession) -> list[ScheduleConflict]:
+    return find_conflicts(await student_slots(user.id, session))
 
 
 @router.get("/by/me", response_model=list[TrainingReadList])
-def read_trainings_current_user_created(user: CurrentUser, session: DBSession) -> list[TrainingReadList]:
-    my_trainings = session.exec(select(Training).where(Training.creator_id == user.id)).all()
-    return my_trainings
+async def read_trainings_current_user_created(user: CurrentUser, session: ReadSession) -> Response:
+    statement = select_rows(Training, TrainingReadList).where(Training.creator_id == user.id)
+    my_trainings = (await session.exec(statement)).all()
+    return json_response(list[TrainingReadList], my_trainings)
 
 
 @router.get("/by/{user_id}", response_model=list[TrainingReadList])
-def read_trainings_given_user_created(user_id: UUID, session: DBSession) -> list[TrainingReadList]:
-    user_trainings = session.exec(select(Training).where(Training.creator_id == user_id)).all()
-    return user_trainings
+async def read_trainings_given_user_created(user_id: UUID, session: ReadSession) -> Response:
+    statement = select_rows(Training, TrainingReadList).where(Training.creator_id == user_id)
+    user_trainings = (await session.exec(statement)).all()
+    return json_response(list[TrainingReadList], user_trainings)
 
 
 @router.get("/{training_id}", response_model=TrainingReadSingle)
-def read_training(training_id: UUID, session: DBSession) -> TrainingReadSingle:
-    training = session.get(Training, training_id)
-    if training is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Training not found")
-    return training
+async def read_training(training_id: UUID, request: Request, session: ReadSession, primary: PrimarySession) -> Response:
+    async def revalidate() -> str | None:
+        # Answer revalidations from the timestamp alone, without loading the row and its scheduler
+        version = (
+            await session.exec(select(Training.updated_at, Training.student_count).where(Training.id == training_id))
+        ).one_or_none()
+        return None if version is None else make_etag(training_id, *version)
+
+    async def load(session: AsyncSession) -> CacheEntry:
+        training = await session.get(Training, training_id, options=[joinedload(Training.scheduler)])
+        if training is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Training not found")
+        # Joins and leaves change the count without touching updated_at
+        etag = make_etag(training.id, training.updated_at, training.student_count)
+        return etag, dump_json(TrainingReadSingle, training)
+
+    return await serve_cached(
+        request, training_key(training_id), TRAINING_CACHE_CONTROL, session, primary, load, revalidate
+    )
 
 
 @router.get("/{training_id}/students", response_model=list[UUID])
-def read_training_students_ids(user: CurrentUser, training_id: UUID, session: DBSession) -> list[UUID]:
-    training = session.exec(
-        select(Training).where((Training.id == training_id) & (Training.creator_id == user.id))
+async def read_training_students_ids(user: CurrentUser, training_id: UUID, session: DBSession) -> list[UUID]:
+    training = (
+        await session.exec(select(Training).where((Training.id == training_id) & (Training.creator_id == user.id)))
     ).one_or_none()
     if training is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Training not found")
-    return training.get_students_ids(session)
+    return await training.get_students_ids(session)
+
+
+@router.get("/{training_id}/students/export", response_class=StreamingResponse)
+async def export_training_students(
+    user: CurrentUser, training_id: UUID, session: DBSession, format: ExportFormat = "ndjson"
+) -> StreamingResponse:
+    """Stream the roster as NDJSON or CSV, without loading it in memory."""
+    owned = (
+        await session.exec(select(Training.id).where((Training.id == training_id) & (Training.creator_id == user.id)))
+    ).one_or_none()
+    if owned is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Training not found")
+    statement = select(TrainingParticipation.student_id).where(TrainingParticipation.training_id == training_id)
+    return export_response(session.bind, statement, format, f"training-{training_id}-students")
+
+
+async def student_slots(
+    student_id: UUID, session: DBSession, including: UUID | None = None
+) -> list[tuple[int, int, UUID]]:
+    """Weekly slots of the trainings a student joined, plus those of `including`, in one query."""
+    joined = select(TrainingParticipation.training_id).where(TrainingParticipation.student_id == student_id)
+    condition = ScheduleSlot.training_id.in_(joined)
+    if including is not None:
+        condition = condition | (ScheduleSlot.training_id == including)
+    statement = select(ScheduleSlot.start_minute, ScheduleSlot.end_minute, ScheduleSlot.training_id).where(condition)
+    return [tuple(slot) for slot in (await session.exec(statement)).all()]
 
 
 @router.post("/{training_id}/join", response_model=TrainingReadSingle)
-def join_the_training(user: CurrentUser, training_id: UUID, session: DBSession) -> TrainingReadSingle:
-    training = session.exec(
-        select(Training).where((Training.id == training_id) & (Training.creator_id != user.id))
+async def join_the_training(
+    user: CurrentUser,
+    training_id: UUID,
+    session: DBSession,
+    response: Response,
+    on_conflict: Literal["warn", "reject"] = Query(
+        "warn", description="Whether overlapping sessions with joined trainings refuse the join"
+    ),
+) -> TrainingReadSingle:
+    training = (
+        await session.exec(
+            select(Training)
+            .where((Training.id == training_id) & (Training.creator_id != user.id))
+            .options(joinedload(Training.scheduler))
+        )
     ).one_or_none()
     if training is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Training not found")
 
+    conflicts = [
+        conflict
+        for conflict in find_conflicts(await student_slots(user.id, session, including=training_id))
+        if training_id in (conflict.training_id, conflict.other_training_id)
+    ]
+    if conflicts and on_conflict == "reject":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": "The training overlaps trainings you joined",
+                "conflicts": [conflict.model_dump(mode="json") for conflict in conflicts],
+            },
+        )
+    if conflicts:
+        others = {
+            conflict.training_id if conflict.training_id != training_id else conflict.other_training_id
+            for conflict in conflicts
+        }
+        response.headers[SCHEDULE_CONFLICTS_HEADER] = ",".join(sorted(map(str, others)))
+
     t_participation = TrainingParticipation(training_id=training_id, student_id=user.id)
     session.add(t_participation)
-    session.commit()
+    set_committed_value(training, "student_count", await add_students(Training, training_id, 1, session))
+    await session.commit()
+    await response_cache.invalidate(training_key(training_id))
     return training
 
 
 @router.post("/{training_id}/schedule", response_model=TrainingReadSingle, status_code=status.HTTP_201_CREATED)
-def scheduler_the_training(
+async def scheduler_the_training(
     user: CurrentUser, training_id: UUID, scheduler: SchedulerCreate, session: DBSession
 ) -> TrainingReadSingle:
-    training = session.exec(
-        select(Training).where((Training.id == training_id) & (Training.creator_id == user.id))
+    training = (
+        await session.exec(
+            select(Training)
+            .where((Training.id == training_id) & (Training.creator_id == user.id))
+            .options(joinedload(Training.scheduler))
+        )
     ).one_or_none()
     if training is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Training not found")
 
     if training.scheduler is not None:
-        session.delete(training.scheduler)
-        session.commit()
+        await session.delete(training.scheduler)
+        await session.commit()
     db_scheduler = Scheduler.model_validate(scheduler.model_dump(), update={"training_id": training_id})
     session.add(db_scheduler)
-    session.commit()
+    await ScheduleSlot.replace(training_id, scheduler, session)
+    # The schedule is part of the training representation, refresh its validator
+    training.updated_at = datetime.now(UTC).replace(tzinfo=None)
+    await session.commit()
+    await response_cache.invalidate(training_key(training_id))
 
+    set_committed_value(training, "scheduler", db_scheduler)
     return training
 
 
 @router.post("/{training_id}/leave", response_model=dict)
-def leave_the_training(user: CurrentUser, training_id: UUID, session: DBSession) -> dict:
-    t_participation = session.exec(
-        select(TrainingParticipation).where(
-            (TrainingParticipation.training_id == training_id) & (TrainingParticipation.student_id == user.id)
+async def leave_the_training(user: CurrentUser, training_id: UUID, session: DBSession) -> dict:
+    t_participation = (
+        await session.exec(
+            select(TrainingParticipation).where(
+                (TrainingParticipation.training_id == training_id) & (TrainingParticipation.student_id == user.id)
+            )
         )
     ).one_or_none()
     if t_participation is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Training not found")
 
-    session.delete(t_participation)
-    session.commit()
+    await session.delete(t_participation)
+    await add_students(Training, training_id, -1, session)
+    await session.commit()
+    await response_cache.invalidate(training_key(training_id))
     return {"messagge": "Successfully left the training"}
 
 
 @router.patch("/{training_id}", response_model=TrainingReadSingle)
-def update_training(
+async def update_training(
     user: CurrentUser, training_id: UUID, training_update: TrainingUpdate, session: DBSession
 ) -> TrainingReadSingle:
-    training = session.exec(
-        select(Training).where((Training.id == training_id) & (Training.creator_id == user.id))
+    training = (
+        await session.exec(
+            select(Training)
+            .where((Training.id == training_id) & (Training.creator_id == user.id))
+            .options(joinedload(Training.scheduler))
+        )
     ).one_or_none()
     if training is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Training not found")
@@ -135,20 +321,30 @@ def update_training(
 
     training.updated_at = datetime.now(UTC).replace(tzinfo=None)
     session.add(training)
-    session.commit()
-    session.refresh(training)
+    await session.commit()
+    await response_cache.invalidate(training_key(training_id))
+    # Reloads the scheduler in the same statement, as it was joined originally
+    await session.refresh(training)
     return training
 
 
 @router.delete("/{training_id}", response_model=dict)
-def delete_training(user: CurrentUser, training_id: UUID, session: DBSession) -> dict:
-    training = session.exec(
-        select(Training).where((Training.id == training_id) & (Training.creator_id == user.id))
+async def delete_training(user: CurrentUser, training_id: UUID, session: DBSession) -> dict:
+    training = (
+        await session.exec(
+            select(Training)
+            .where((Training.id == training_id) & (Training.creator_id == user.id))
+            .options(joinedload(Training.scheduler))
+        )
     ).one_or_none()
     if training is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Training not found")
 
-    # Delete the training
-    session.delete(training)
-    session.commit()
+    # Delete the training, its schedule goes with it
+    await ScheduleSlot.replace(training_id, None, session)
+    if training.scheduler is not None:
+        await session.delete(training.scheduler)
+    await session.delete(training)
+    await session.commit()
+    await response_cache.invalidate(training_key(training_id))
     return {"message": "training has been deleted"}
@@ -0,0 +1,71 @@
+"""Production entry point, configured from `Settings`.
+
+python -m app.serve             # one worker per CPU (SERVER_WORKERS), uvloop + httptools
+python -m app.serve --reload    # single process restarting on code changes, for development
+"""
+
+import os
+import random
+import argparse
+import tempfile
+
+import uvicorn
+from uvicorn.supervisors import ChangeReload, Multiprocess
+
+from app.core.config import settings
+
+APP = "app.main:app"
+
+
+class WorkerConfig(uvicorn.Config):
+    def load(self):
+        # Runs in each worker: spread the recycling so workers do not all restart at the same moment
+        if self.limit_max_requests and settings.server_max_requests_jitter:
+            self.limit_max_requests += random.randint(0, settings.server_max_requests_jitter)
+        super().load()
+
+
+def build_config(reload: bool = False, workers: int | None = None) -> WorkerConfig:
+    if reload:
+        workers = 1
+    workers = workers or settings.server_workers or os.cpu_count() or 1
+    # Read back by the workers' Settings, which size their connection pool with it (app/db/database.py)
+    os.environ["SERVER_WORKERS"] = str(workers)
+    if workers > 1 and "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        # Workers share their metrics through files, so any of them can answer a scrape (app/utils/metrics.py)
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="artadas-metrics-")
+    return WorkerConfig(
+        APP,
+        host=settings.server_host,
+        port=settings.server_port,
+        workers=workers,
+        reload=reload,
+        loop="uvloop",
+        http="httptools",
+        # No WebSocket routes, skip loading a WebSocket protocol in every worker
+        ws="none",
+        backlog=settings.server_backlog,
+        timeout_keep_alive=settings.server_keepalive_timeout,
+        timeout_graceful_shutdown=settings.server_graceful_timeout,
+        limit_max_requests=None if reload else settings.server_max_requests or None,
+        log_level="debug" if settings.debug else "info",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reload", action="store_true", help="Restart on code changes (development)")
+    parser.add_argument("--workers", type=int, help="Override SERVER_WORKERS")
+    args = parser.parse_args()
+
+    config = build_config(args.reload, args.workers)
+    server = uvicorn.Server(config)
+    if config.should_reload:
+        ChangeReload(config, target=server.run, sockets=[config.bind_socket()]).run()
+    else:
+        # Supervised even with one worker: it restarts workers that exit, including recycled ones
+        Multiprocess(config, target=server.run, sockets=[config.bind_socket()]).run()
+
+
+if __name__ == "__main__":
+    main()
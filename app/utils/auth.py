@@ -1,25 +1,95 @@
-import requests
-from typing import Annotated
+import time
+import httpx
+import hashlib
+from typing import Annotated, Any, Hashable
 from json import JSONDecodeError
 from fastapi import Request, HTTPException, status, Depends
 
 from app.models.users import User
 from app.core.config import settings
+from app.utils.ttl_cache import MISSING, TTLCache
+from app.utils.metrics import AUTH_CACHE_EVICTIONS, AUTH_CACHE_LOOKUPS, AUTH_CACHE_SAVED
+from app.utils.metrics import AUTH_VERIFY_DURATION, AUTH_VERIFY_ERRORS
+from app.utils import auth_client, jwks
 
 
 AUTH_BASE_URL = settings.auth_base_url
 TOKEN_VERIFY_URL = f"{AUTH_BASE_URL}/auth/verify/"
 
+# Rejections from the auth service that are safe to remember for a while
+NEGATIVE_CACHE_STATUSES = {status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN}
 
-def authenticate(request: Request) -> User:
-    auth_header = request.headers.get("Authorization")
-    if not auth_header:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authorization header missing")
-    if not auth_header.startswith("Bearer "):
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid scheme")
+verify_stats = {"calls": 0, "seconds": 0.0}
+
+
+def average_verify_seconds() -> float:
+    return verify_stats["seconds"] / verify_stats["calls"] if verify_stats["calls"] else 0.0
+
+
+class TokenCache(TTLCache):
+    """Token cache reporting its hits, misses and evictions, and an estimate of the verify latency the hits saved."""
+
+    _hits = AUTH_CACHE_LOOKUPS.labels("hit")
+    _misses = AUTH_CACHE_LOOKUPS.labels("miss")
+
+    def get(self, key: Hashable) -> Any:
+        value = super().get(key)
+        if value is MISSING:
+            self._misses.inc()
+        else:
+            self._hits.inc()
+            AUTH_CACHE_SAVED.inc(average_verify_seconds())
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        evictions = self.evictions
+        super().set(key, value, ttl)
+        if self.evictions > evictions:
+            AUTH_CACHE_EVICTIONS.inc(self.evictions - evictions)
+
+
+token_cache = TokenCache(maxsize=settings.auth_cache_size, ttl=settings.auth_cache_ttl)
+
+
+class RejectedToken:
+    """Negative cache entry for a token the auth service refused."""
+
+    __slots__ = ("status_code", "detail")
+
+    def __init__(self, status_code: int, detail: str):
+        self.status_code = status_code
+        self.detail = detail
+
+
+def auth_unavailable() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Authentication service unavailable")
+
+
+async def verify_token(token: str) -> User:
+    breaker = auth_client.auth_breaker
+    if not breaker.allow():
+        AUTH_VERIFY_ERRORS.labels("circuit_open").inc()
+        raise auth_unavailable()
+
+    started = time.perf_counter()
+    try:
+        response = await auth_client.get_auth_client().post(TOKEN_VERIFY_URL, json={"token": token})
+    except httpx.HTTPError:
+        breaker.record_failure()
+        AUTH_VERIFY_ERRORS.labels("unreachable").inc()
+        raise auth_unavailable()
+    finally:
+        elapsed = time.perf_counter() - started
+        verify_stats["calls"] += 1
+        verify_stats["seconds"] += elapsed
+        AUTH_VERIFY_DURATION.observe(elapsed)
+
+    if response.status_code >= status.HTTP_500_INTERNAL_SERVER_ERROR:
+        breaker.record_failure()
+        AUTH_VERIFY_ERRORS.labels("server_error").inc()
+        raise auth_unavailable()
+    breaker.record_success()
 
-    token = auth_header.split(" ", 1)[1]
-    response = requests.post(TOKEN_VERIFY_URL, json={"token": token})
     if response.status_code == status.HTTP_200_OK:
         try:
             user_data = response.json()
@@ -29,4 +99,39 @@ def authenticate(request: Request) -> User:
     raise HTTPException(status_code=response.status_code, detail="Authentication error")
 
 
+async def load_user(token_key: str, token: str) -> User:
+    ttl = None
+    try:
+        verified = jwks.key_set.verify(token) if jwks.key_set is not None else None
+        if verified is not None:
+            user, expires_at = verified
+            # Never serve a locally verified token from cache past its expiry
+            ttl = min(settings.auth_cache_ttl, expires_at - time.time())
+        else:
+            user = await verify_token(token)
+    except HTTPException as exc:
+        # A TTL of 0 disables the cache for rejections too, which have their own (shorter) TTL
+        if exc.status_code in NEGATIVE_CACHE_STATUSES and token_cache.ttl > 0:
+            token_cache.set(token_key, RejectedToken(exc.status_code, exc.detail), ttl=settings.auth_cache_negative_ttl)
+        raise
+    token_cache.set(token_key, user, ttl=ttl)
+    return user
+
+
+async def authenticate(request: Request) -> User:
+    auth_header = request.headers.get("Authorization")
+    if not auth_header:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authorization header missing")
+    if not auth_header.startswith("Bearer "):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid scheme")
+
+    token = auth_header.split(" ", 1)[1]
+    # Never keep raw tokens in memory longer than the request
+    token_key = hashlib.sha256(token.encode()).hexdigest()
+    result = await token_cache.get_or_load(token_key, lambda: load_user(token_key, token))
+    if isinstance(result, RejectedToken):
+        raise HTTPException(status_code=result.status_code, detail=result.detail)
+    return result
+
+
 CurrentUser = Annotated[User, Depends(authenticate)]
@@ -0,0 +1,96 @@
+import time
+import httpx
+import logging
+from importlib.util import find_spec
+from typing import Callable
+
+from app.core.config import settings
+
+logger = logging.getLogger("uvicorn")
+
+# HTTP/2 needs the optional `h2` package, fall back to HTTP/1.1 keep-alive without it
+HTTP2_AVAILABLE = find_spec("h2") is not None
+
+
+class CircuitBreaker:
+    """Stops calling a failing dependency for `reset_timeout` seconds after `failure_threshold` failures.
+
+    Once the timeout passes a single trial call is let through (half-open state);
+    its outcome closes the breaker again or re-opens it for another period.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self._clock() - self.opened_at >= self.reset_timeout:
+            # Let one trial call through, a trial that never reports back frees the slot after another period
+            self.state = self.HALF_OPEN
+            self.opened_at = self._clock()
+            return True
+        return False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"Auth service circuit opened after {self.failures} failure(s)")
+            self.state = self.OPEN
+            self.opened_at = self._clock()
+
+
+def create_auth_client(transport: httpx.AsyncBaseTransport | None = None) -> httpx.AsyncClient:
+    timeout = httpx.Timeout(
+        connect=settings.auth_connect_timeout,
+        read=settings.auth_read_timeout,
+        write=settings.auth_read_timeout,
+        # Waiting for a free pooled connection counts as a failure too, so requests don't pile up
+        pool=settings.auth_connect_timeout,
+    )
+    limits = httpx.Limits(
+        max_connections=settings.auth_max_connections,
+        max_keepalive_connections=settings.auth_max_keepalive_connections,
+    )
+    return httpx.AsyncClient(
+        base_url=settings.auth_base_url,
+        timeout=timeout,
+        limits=limits,
+        http2=HTTP2_AVAILABLE,
+        transport=transport,
+    )
+
+
+auth_client: httpx.AsyncClient | None = None
+auth_breaker = CircuitBreaker(settings.auth_breaker_threshold, settings.auth_breaker_reset_timeout)
+
+
+def get_auth_client() -> httpx.AsyncClient:
+    """Shared client, created on first use when the app lifespan did not start it."""
+    global auth_client
+    if auth_client is None or auth_client.is_closed:
+        auth_client = create_auth_client()
+    return auth_client
+
+
+async def start_auth_client():
+    get_auth_client()
+
+
+async def close_auth_client():
+    global auth_client
+    if auth_client is not None:
+        await auth_client.aclose()
+        auth_client = None
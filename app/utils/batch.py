@@ -0,0 +1,68 @@
+from typing import Any, Generic, TypeVar
+from uuid import UUID
+
+from fastapi import Body, Response, status
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+BATCH_MAX_SIZE = 1000
+
+ReadModel = TypeVar("ReadModel")
+
+# Items are validated one by one, so a bad item is reported instead of failing the whole request
+BatchPayload = Body(min_length=1, max_length=BATCH_MAX_SIZE)
+
+
+class BatchItem(BaseModel, Generic[ReadModel]):
+    """Outcome of one item of a batch request, `index` is its position in the request."""
+
+    index: int
+    status: int
+    item: ReadModel | None = None
+    errors: list[dict[str, Any]] | None = None
+
+
+async def create_batch(
+    session: AsyncSession,
+    response: Response,
+    items: list[Any],
+    create_model: type[SQLModel],
+    table_model: type[SQLModel],
+    creator_id: UUID,
+    empty_relationships: tuple[str, ...] = (),
+) -> list[dict]:
+    """Validate `items` as `create_model` and insert the valid ones with one multi-row INSERT ... RETURNING.
+
+    Results keep the input order. The response is 201 when every item was created, 207 otherwise.
+    `empty_relationships` are marked loaded (and empty) on the new rows, so serializing them does not query.
+    """
+    results: list[dict] = []
+    rows: list[dict] = []
+    for index, item in enumerate(items):
+        try:
+            data = create_model.model_validate(item)
+        except ValidationError as exc:
+            errors = jsonable_encoder(exc.errors(include_url=False))
+            results.append({"index": index, "status": status.HTTP_422_UNPROCESSABLE_ENTITY, "errors": errors})
+            continue
+        row = table_model.model_validate(data, update={"creator_id": creator_id})
+        results.append({"index": index, "status": status.HTTP_201_CREATED})
+        rows.append(row.model_dump())
+
+    if rows:
+        # Rows come back in parameter order even when the driver splits them into several statements
+        statement = insert(table_model).returning(table_model, sort_by_parameter_order=True)
+        created = iter((await session.exec(statement, params=rows)).scalars().all())
+        await session.commit()
+        for result in results:
+            if result["status"] == status.HTTP_201_CREATED:
+                result["item"] = next(created)
+                for relationship in empty_relationships:
+                    set_committed_value(result["item"], relationship, None)
+
+    response.status_code = status.HTTP_201_CREATED if len(rows) == len(items) else status.HTTP_207_MULTI_STATUS
+    return results
@@ -0,0 +1,107 @@
+"""Denormalized `student_count` columns of courses and trainings.
+
+Joins and leaves adjust the counter in the same transaction as the participation row. A periodic
+reconciliation recounts participations and fixes any drift (manual edits, lost updates). Every worker
+schedules it, an advisory lock lets one of them run it at a time.
+Run it once by hand with `python -m app.utils.counters`.
+"""
+
+import asyncio
+import logging
+from uuid import UUID
+
+from sqlmodel import SQLModel, func, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.db.database import engine
+from app.models.courses import Course, CourseParticipation
+from app.models.trainings import Training, TrainingParticipation
+
+logger = logging.getLogger("uvicorn")
+
+# Counted model and the participation column pointing at it
+COUNTED = [(Course, CourseParticipation.course_id), (Training, TrainingParticipation.training_id)]
+
+# Application-wide key of the advisory lock held by the running reconciliation
+RECONCILE_LOCK_KEY = 0x41525442
+
+_reconciler: asyncio.Task | None = None
+
+
+async def add_students(model: type[SQLModel], model_id: UUID, delta: int, session: AsyncSession) -> int:
+    """Atomically shift the counter by `delta` and return the new value. The caller commits."""
+    statement = (
+        update(model)
+        .where(model.id == model_id)
+        .values(student_count=model.student_count + delta)
+        .returning(model.student_count)
+    )
+    return (await session.exec(statement)).scalar_one()
+
+
+async def reconcile_student_counts(session: AsyncSession) -> dict[str, int]:
+    """Recount participations and fix the counters that drifted, returns the number of fixed rows per table.
+
+    Returns an empty dict when another reconciliation holds the lock.
+    """
+    if session.bind.dialect.name == "postgresql":
+        # Released with the transaction, the other workers skip this round
+        if not (await session.exec(select(func.pg_try_advisory_xact_lock(RECONCILE_LOCK_KEY)))).one():
+            return {}
+    fixed = {}
+    for model, counted_id in COUNTED:
+        actual = select(func.count()).where(counted_id == model.id).scalar_subquery()
+        # Lock the drifted rows first: joins and leaves that updated them have committed once the lock is held,
+        # and the recount below runs on a newer snapshot than the lock, so it sees their participations
+        statement = select(model.id).where(model.student_count != actual).order_by(model.id).with_for_update()
+        drifted = (await session.exec(statement)).all()
+        if not drifted:
+            fixed[model.__tablename__] = 0
+            continue
+        result = await session.exec(
+            update(model).where(model.id.in_(drifted), model.student_count != actual).values(student_count=actual)
+        )
+        fixed[model.__tablename__] = result.rowcount
+    await session.commit()
+    return fixed
+
+
+async def reconcile_forever(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with AsyncSession(engine) as session:
+                fixed = await reconcile_student_counts(session)
+        except Exception:
+            logger.exception("Student count reconciliation failed")
+            continue
+        if any(fixed.values()):
+            logger.warning(f"Fixed drifted student counts: {fixed}")
+
+
+async def start_reconciler():
+    global _reconciler
+    if settings.student_count_reconcile_interval > 0 and _reconciler is None:
+        _reconciler = asyncio.create_task(reconcile_forever(settings.student_count_reconcile_interval))
+
+
+async def stop_reconciler():
+    global _reconciler
+    if _reconciler is not None:
+        _reconciler.cancel()
+        try:
+            await _reconciler
+        except asyncio.CancelledError:
+            pass
+        _reconciler = None
+
+
+async def main():
+    async with AsyncSession(engine) as session:
+        print(await reconcile_student_counts(session))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,46 @@
+import io
+import csv
+import json
+from typing import AsyncIterator, Literal
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+ExportFormat = Literal["ndjson", "csv"]
+
+MEDIA_TYPES: dict[str, str] = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+# Rows fetched from the server-side cursor per round trip, and written per chunk
+EXPORT_BATCH_SIZE = 5_000
+
+
+def encode_rows(columns: list[str], rows, format: ExportFormat) -> str:
+    if format == "ndjson":
+        return "".join(json.dumps(dict(zip(columns, row)), default=str) + "\n" for row in rows)
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+    return buffer.getvalue()
+
+
+async def stream_rows(bind: AsyncEngine, statement: Select, format: ExportFormat) -> AsyncIterator[str]:
+    """Yield `statement`'s rows encoded as `format`, one chunk per batch.
+
+    Runs in its own session: the request's session is closed by the time the response body is sent.
+    Rows come from a server-side cursor, so memory use does not grow with the number of rows.
+    """
+    async with AsyncSession(bind) as session:
+        result = await session.stream(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        columns = list(result.keys())
+        if format == "csv":
+            yield encode_rows(columns, [columns], format)
+        async for rows in result.partitions():
+            yield encode_rows(columns, rows, format)
+
+
+def export_response(bind: AsyncEngine, statement: Select, format: ExportFormat, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        stream_rows(bind, statement, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{format}"'},
+    )
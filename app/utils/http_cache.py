@@ -0,0 +1,40 @@
+import hashlib
+from fastapi import Request, Response, status
+
+# Cache-Control per cacheable route. Everything revalidates with the ETag, which is cheap (304 + one light query);
+# topic bodies are large and change rarely, so clients may reuse them for a minute without asking.
+COURSE_CACHE_CONTROL = "public, no-cache"
+COURSE_TOPICS_CACHE_CONTROL = "public, no-cache"
+TOPIC_CACHE_CONTROL = "public, max-age=60, must-revalidate"
+TRAINING_CACHE_CONTROL = "public, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """Strong validator derived from the values that determine a representation."""
+    digest = hashlib.sha256(":".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, W/ prefixes are ignored
+    candidates = {candidate.strip().removeprefix("W/") for candidate in header.split(",")}
+    return etag in candidates
+
+
+def set_validators(response: Response, etag: str, cache_control: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+
+
+def not_modified(request: Request, etag: str, cache_control: str) -> Response | None:
+    """A ready 304 response when the client already holds the current representation."""
+    if not etag_matches(request, etag):
+        return None
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    set_validators(response, etag, cache_control)
+    return response
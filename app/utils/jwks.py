@@ -0,0 +1,150 @@
+import time
+import httpx
+import asyncio
+import logging
+from jose import jwk, jwt, JWTError
+from jose.backends.base import Key
+from fastapi import HTTPException, status
+
+from app.models.users import User
+from app.core.config import settings
+from app.utils import auth_client
+
+logger = logging.getLogger("uvicorn")
+
+
+class KeySet:
+    """Public keys used to check bearer tokens locally, by `kid`.
+
+    Keys come either from a static PEM (`auth_jwt_public_key`) or from a JWKS document that is
+    fetched once on startup and then refreshed periodically in the background.
+    """
+
+    def __init__(
+        self,
+        jwks_url: str | None = None,
+        public_key: str | None = None,
+        algorithms: list[str] | None = None,
+        audience: str | None = None,
+        issuer: str | None = None,
+    ):
+        self.jwks_url = jwks_url
+        self.algorithms = algorithms or ["RS256"]
+        self.audience = audience
+        self.issuer = issuer
+        self.keys: dict[str | None, Key] = {}
+        self.fetched_at = 0.0
+        self._refresh_lock = asyncio.Lock()
+        self._background: set[asyncio.Task] = set()
+        if public_key:
+            self.keys[None] = jwk.construct(public_key, self.algorithms[0])
+
+    @classmethod
+    def from_settings(cls) -> "KeySet":
+        return cls(
+            jwks_url=settings.auth_jwks_url,
+            public_key=settings.auth_jwt_public_key,
+            algorithms=settings.auth_jwt_algorithms,
+            audience=settings.auth_jwt_audience,
+            issuer=settings.auth_jwt_issuer,
+        )
+
+    async def refresh(self):
+        if self.jwks_url is None:
+            return
+        async with self._refresh_lock:
+            response = await auth_client.get_auth_client().get(self.jwks_url)
+            response.raise_for_status()
+            keys = {}
+            for key_data in response.json().get("keys", []):
+                if key_data.get("use", "sig") != "sig":
+                    continue
+                try:
+                    keys[key_data.get("kid")] = jwk.construct(key_data, key_data.get("alg", self.algorithms[0]))
+                except JWTError as exc:
+                    logger.warning(f"Skipping unusable JWKS key {key_data.get('kid')}: {exc}")
+            self.keys = keys
+            self.fetched_at = time.monotonic()
+
+    async def refresh_quietly(self):
+        try:
+            await self.refresh()
+        except (httpx.HTTPError, ValueError) as exc:
+            logger.warning(f"Failed to refresh JWKS from {self.jwks_url}: {exc}")
+
+    def refresh_soon(self, min_interval: float = 30.0):
+        """Refetch keys in the background (e.g. on an unknown `kid` after rotation), at most every `min_interval`."""
+        if self.jwks_url is None or self._refresh_lock.locked() or time.monotonic() - self.fetched_at < min_interval:
+            return
+        task = asyncio.create_task(self.refresh_quietly())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def refresh_forever(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            await self.refresh_quietly()
+
+    def find_key(self, token: str) -> Key | None:
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+        except JWTError:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+        key = self.keys.get(kid)
+        if key is None and len(self.keys) == 1 and (kid is None or None in self.keys):
+            # A single configured key is used for tokens that don't name one
+            key = next(iter(self.keys.values()))
+        return key
+
+    def verify(self, token: str) -> tuple[User, float] | None:
+        """User built from the token claims and the token expiry (epoch seconds).
+
+        Returns None when the token can't be checked locally (unknown `kid`, claims not describing a user),
+        so the caller falls back to the remote verify call. Raises 401 for forged or expired tokens.
+        """
+        key = self.find_key(token)
+        if key is None:
+            self.refresh_soon()
+            return None
+        try:
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=self.algorithms,
+                audience=self.audience,
+                issuer=self.issuer,
+                options={"verify_aud": self.audience is not None},
+            )
+        except JWTError:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+        try:
+            user = User(
+                id=claims.get("user_id", claims.get("sub")),
+                username=claims["username"],
+                email=claims["email"],
+                full_name=claims.get("full_name"),
+            )
+        except (KeyError, ValueError):
+            return None
+        return user, claims.get("exp", float("inf"))
+
+
+key_set: KeySet | None = KeySet.from_settings() if settings.auth_mode == "jwt" else None
+_refresher: asyncio.Task | None = None
+
+
+async def start_key_set():
+    global _refresher
+    if key_set is None:
+        return
+    await key_set.refresh_quietly()
+    if key_set.jwks_url is not None:
+        _refresher = asyncio.create_task(key_set.refresh_forever(settings.auth_jwks_refresh_interval))
+
+
+async def stop_key_set():
+    global _refresher
+    if _refresher is not None:
+        _refresher.cancel()
+        _refresher = None
@@ -0,0 +1,147 @@
+"""Prometheus metrics, exposed on `GET /metrics`.
+
+With several workers (`python -m app.serve`) each process writes its samples to `PROMETHEUS_MULTIPROC_DIR`
+and the endpoint aggregates them, whichever worker answers the scrape.
+"""
+
+import os
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram
+from prometheus_client import generate_latest, multiprocess
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+# Anything else is reported as "other", label values must stay a small fixed set
+METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Request latency by route template", ["method", "route", "status"]
+)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being served", ["method"], multiprocess_mode="livesum")
+
+# Recorded by QueryCountMiddleware (app/db/profiling.py)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements per request", ["route"], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds",
+    "Time spent in SQL statements per request",
+    ["route"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+POOL_SIZE = Gauge("db_pool_size", "Connections the pool keeps open", multiprocess_mode="livesum")
+POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections in use", multiprocess_mode="livesum")
+POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections opened beyond the pool size", multiprocess_mode="livesum")
+POOL_ACQUIRE = Histogram(
+    "db_pool_acquire_seconds",
+    "Time to get a connection, waiting for a free one or opening a new one",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+POOL_TIMEOUTS = Counter("db_pool_timeouts_total", "Checkouts that gave up waiting for a connection")
+# Recorded by SessionRouter (app/db/replicas.py) when read replicas are configured
+DB_SESSIONS = Counter(
+    "db_sessions_total",
+    "Request sessions by where they were routed (primary, primary_sticky, primary_fallback, replica)",
+    ["target"],
+)
+
+AUTH_VERIFY_DURATION = Histogram("auth_verify_duration_seconds", "Latency of token verify calls to the auth service")
+# Recorded by TokenCache (app/utils/auth.py)
+AUTH_CACHE_LOOKUPS = Counter("auth_token_cache_lookups_total", "Token cache lookups by result (hit, miss)", ["result"])
+AUTH_CACHE_EVICTIONS = Counter("auth_token_cache_evictions_total", "Tokens evicted from the full token cache")
+AUTH_CACHE_SAVED = Counter(
+    "auth_token_cache_saved_seconds_total", "Verify latency avoided by token cache hits, at the average verify latency"
+)
+AUTH_VERIFY_ERRORS = Counter(
+    "auth_verify_errors_total",
+    "Verify calls that failed, by reason (circuit_open, unreachable, server_error)",
+    ["reason"],
+)
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """Engine pool reporting its usage and how long checkouts take."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        POOL_SIZE.set(self.size())
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            POOL_ACQUIRE.observe(time.perf_counter() - started)
+            self._report()
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        self._report()
+
+    def _report(self):
+        POOL_CHECKED_OUT.set(self.checkedout())
+        POOL_OVERFLOW.set(max(0, self.overflow()))
+
+
+class MetricsMiddleware:
+    """Times every request under its route template, `/courses/{course_id}` rather than the actual path."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        # Label lookups take a lock, resolved children are kept here
+        self._durations: dict[tuple[str, str, int], Histogram] = {}
+        self._in_flight: dict[str, Gauge] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"] if scope["method"] in METHODS else "other"
+        in_flight = self._in_flight.get(method)
+        if in_flight is None:
+            in_flight = self._in_flight[method] = REQUESTS_IN_FLIGHT.labels(method)
+        status = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_flight.dec()
+            key = (method, getattr(scope.get("route"), "path", UNMATCHED_ROUTE), status)
+            duration = self._durations.get(key)
+            if duration is None:
+                duration = self._durations[key] = REQUEST_DURATION.labels(*key)
+            duration.observe(elapsed)
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    registry = REGISTRY
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def stop_metrics():
+    # Drops the live gauges of this worker, its counters and histograms keep counting in the totals
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
@@ -1,34 +1,81 @@
 import json
+import time
+import random
 import logging
 
-from fastapi import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
 from app.core.config import settings
-from starlette.middleware.base import BaseHTTPMiddleware
 
 # Configure logging
 logger = logging.getLogger("uvicorn")
 logger.setLevel(logging.DEBUG if settings.debug else logging.INFO)
 
+REDACTED_HEADERS = frozenset({b"authorization", b"proxy-authorization", b"cookie"})
+
+
+class LoggingMiddleware:
+    """Logs one JSON line per request: method, route template, status, latency and body sizes.
+
+    Pure ASGI, the request and response are only observed as they pass through. Successful requests are
+    sampled at `sample_rate`, failed ones (5xx) are always logged. Sampled requests also carry the first
+    `body_limit` bytes of their body and, with `log_headers`, their headers with credentials redacted.
+    """
+
+    def __init__(self, app: ASGIApp, sample_rate: float = 1.0, body_limit: int = 0, log_headers: bool = False):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.body_limit = body_limit
+        self.log_headers = log_headers
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        sampled = random.random() < self.sample_rate
+        capture = self.body_limit if sampled else 0
+        body = bytearray()
+        sizes = {"request": 0, "response": 0}
+        status = 500
+
+        async def receive_wrapper() -> Message:
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                sizes["request"] += len(chunk)
+                if len(body) < capture:
+                    body.extend(chunk[: capture - len(body)])
+            return message
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        # Log request details
-        logger.debug(f"--> Request URL: {request.url}")
-        logger.debug(f"--> Request method: {request.method}")
-        logger.debug(f"--> Request headers: \n{json.dumps(dict(request.headers), indent=4)}")
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sizes["response"] += len(message.get("body", b""))
+            await send(message)
 
-        # Read and log request body
+        started = time.perf_counter()
         try:
-            data = await request.json()
-            if data:
-                logger.debug(f"--> Request body: \n{json.dumps(data, indent=4)}")
-        except Exception as e:
-            logger.debug("--> Request body: Empty or invalid")
-            logger.warning(f"Failed to read request body: {e}")
-
-        # Call the next middleware or actual endpoint
-        response = await call_next(request)
-
-        # Log response details
-        logger.debug(f"Response status code: {response.status_code}")
-        return response
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            if sampled or status >= 500:
+                record = {
+                    "method": scope["method"],
+                    # Template of the matched route (`/courses/{course_id}`), null when nothing matched
+                    "route": getattr(scope.get("route"), "path", None),
+                    "path": scope["path"],
+                    "status": status,
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                    "request_bytes": sizes["request"],
+                    "response_bytes": sizes["response"],
+                }
+                if body:
+                    record["body"] = body.decode(errors="replace")
+                    record["body_truncated"] = sizes["request"] > len(body)
+                if sampled and self.log_headers:
+                    record["headers"] = {
+                        name.decode("latin-1"): "[redacted]" if name in REDACTED_HEADERS else value.decode("latin-1")
+                        for name, value in scope["headers"]
+                    }
+                logger.info(json.dumps(record, separators=(",", ":")))
@@ -1,9 +1,72 @@
+import time
+from typing import Literal
+
 from alembic import command
 from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import Connection, func, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+MigrationMode = Literal["auto", "check", "skip"]
+
+# Application-wide key of the advisory lock serializing upgrades between workers
+MIGRATION_LOCK_KEY = 0x41525441
+
 
+class PendingMigrationsError(RuntimeError):
+    pass
 
-def apply_migrations():
+
+def alembic_config() -> Config:
     # Path to your Alembic config file
-    alembic_cfg = Config("alembic.ini")
-    # Run the migrations
-    command.upgrade(alembic_cfg, "head")
+    return Config("alembic.ini")
+
+
+def database_heads(connection: Connection) -> set[str]:
+    return set(MigrationContext.configure(connection).get_current_heads())
+
+
+def upgrade_on(connection: Connection, config: Config):
+    # env.py runs the migrations on this connection (and transaction) instead of opening its own
+    config.attributes["connection"] = connection
+    command.upgrade(config, "head")
+
+
+async def ensure_migrations(engine: AsyncEngine, mode: MigrationMode) -> dict[str, float]:
+    """Bring the database to the migration head in-process, returns the seconds spent per phase.
+
+    `skip` trusts the deployment, `check` refuses to start on an outdated schema, `auto` upgrades it.
+    Only reading `alembic_version` is needed when the schema is current. Upgrades hold a Postgres advisory
+    lock, so with several workers one migrates and the others find nothing left to do.
+    """
+    timings: dict[str, float] = {}
+    if mode == "skip":
+        return timings
+    started = time.perf_counter()
+
+    def lap(phase: str):
+        nonlocal started
+        now = time.perf_counter()
+        timings[phase] = now - started
+        started = now
+
+    config = alembic_config()
+    heads = set(ScriptDirectory.from_config(config).get_heads())
+    lap("scripts")
+    async with engine.begin() as conn:
+        current = await conn.run_sync(database_heads)
+        lap("version")
+        if current == heads:
+            return timings
+        if mode == "check":
+            raise PendingMigrationsError(f"Database is at {sorted(current)}, migrations are at {sorted(heads)}")
+        if conn.dialect.name == "postgresql":
+            # Released with the transaction, after the upgrade is committed
+            await conn.execute(select(func.pg_advisory_xact_lock(MIGRATION_LOCK_KEY)))
+            current = await conn.run_sync(database_heads)
+            lap("lock")
+        if current != heads:
+            await conn.run_sync(upgrade_on, config)
+            lap("upgrade")
+    return timings
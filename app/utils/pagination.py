@@ -0,0 +1,114 @@
+import json
+import base64
+import binascii
+from uuid import UUID
+from datetime import datetime
+from typing import Any, Literal, Sequence
+from fastapi import HTTPException, Response, status
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import InstrumentedAttribute
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+PREV_CURSOR_HEADER = "X-Prev-Cursor"
+
+# Sort key: (column, descending)
+SortKey = tuple[InstrumentedAttribute, bool]
+# Orders offered by the course and training lists
+ListOrder = Literal["created_at", "student_count"]
+# Largest cursor page, the deprecated offset pagination keeps its unbounded page size for older clients
+MAX_PAGE_SIZE = 100
+
+
+def _dump_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def _load_value(value: Any, column: InstrumentedAttribute) -> Any:
+    python_type = column.type.python_type
+    if value is None or isinstance(value, python_type):
+        return value
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    return python_type(value)
+
+
+def encode_cursor(row: Any, keys: Sequence[SortKey], backward: bool = False) -> str:
+    payload = {"v": [_dump_value(getattr(row, column.key)) for column, _ in keys]}
+    if backward:
+        payload["b"] = 1
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: Sequence[SortKey]) -> tuple[list, bool]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        values = payload["v"]
+        if len(values) != len(keys):
+            raise ValueError("Cursor does not match the sort keys")
+        return [_load_value(value, column) for value, (column, _) in zip(values, keys)], bool(payload.get("b"))
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def after(keys: Sequence[SortKey], values: list):
+    """Rows strictly after `values` in `keys` order, expanded so mixed directions work everywhere."""
+    clauses = []
+    for i, (column, descending) in enumerate(keys):
+        equal = [keys[j][0] == values[j] for j in range(i)]
+        beyond = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal, beyond))
+    return or_(*clauses)
+
+
+def order_by_keys(statement, keys: Sequence[SortKey]):
+    return statement.order_by(*(column.desc() if descending else column.asc() for column, descending in keys))
+
+
+async def paginate(
+    session: AsyncSession, statement, keys: Sequence[SortKey], cursor: str | None, limit: int, response: Response
+) -> list:
+    """Keyset pagination over `statement`.
+
+    Returns one page of rows and puts opaque cursors for the neighbouring pages into the
+    `X-Next-Cursor` / `X-Prev-Cursor` response headers. `keys` must end with a unique column.
+    """
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Page size must be between 1 and {MAX_PAGE_SIZE} with cursor pagination",
+        )
+    values, backward = decode_cursor(cursor, keys) if cursor else (None, False)
+    # Walking backwards is walking forwards in the reversed order
+    walk = [(column, descending != backward) for column, descending in keys]
+    if values is not None:
+        statement = statement.where(after(walk, values))
+    statement = order_by_keys(statement, walk)
+
+    rows = list((await session.exec(statement.limit(limit + 1))).all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+
+    if rows:
+        # A backward page always has something after it, a forward page has something before unless it is the first
+        if has_more or backward:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1], keys)
+        if (has_more and backward) or (values is not None and not backward):
+            response.headers[PREV_CURSOR_HEADER] = encode_cursor(rows[0], keys, backward=True)
+    return rows
+
+
+def creation_order(model) -> list[SortKey]:
+    """Default listing order, backed by the `(created_at, id)` index of each catalog table."""
+    return [(model.created_at, False), (model.id, False)]
+
+
+def popularity_order(model) -> list[SortKey]:
+    """Most joined first, newest first among equals, backed by the `(student_count, created_at, id)` index."""
+    return [(model.student_count, True), (model.created_at, True), (model.id, True)]
@@ -0,0 +1,336 @@
+import json
+import time
+import asyncio
+import logging
+from uuid import UUID
+from typing import AsyncIterator, Awaitable, Callable
+
+from fastapi import Request, Response
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.utils.http_cache import not_modified
+from app.utils.ttl_cache import MISSING, TTLCache
+
+logger = logging.getLogger("uvicorn")
+
+# (ETag, serialized JSON body) of one cached representation
+CacheEntry = tuple[str, bytes]
+
+# Stores KEYS[1] only while the counter KEYS[2] still has the value ARGV[3]
+SET_IF = """
+if (redis.call('GET', KEYS[2]) or '0') == ARGV[3] then
+    redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+    return 1
+end
+return 0
+"""
+
+
+class MemoryBackend:
+    """In-process stand-in for Redis, used when no `redis_url` is configured (single worker, tests)."""
+
+    errors: tuple[type[Exception], ...] = ()
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._data: dict[str, tuple[float, bytes]] = {}
+        self._subscribers: dict[str, set[asyncio.Queue]] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._data[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        self._data[key] = (self._clock() + ttl, value)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._data.pop(key, None)
+
+    async def incr(self, key: str, ttl: float):
+        await self.set(key, str(int(await self.get(key) or 0) + 1).encode(), ttl)
+
+    async def set_if(self, key: str, value: bytes, ttl: float, guard: str, expected: bytes) -> bool:
+        # Nothing awaited in between really suspends, the check and the write are atomic for this process
+        if (await self.get(guard) or b"0") != expected:
+            return False
+        await self.set(key, value, ttl)
+        return True
+
+    async def publish(self, channel: str, message: str):
+        for queue in self._subscribers.get(channel, ()):
+            queue.put_nowait(message)
+
+    async def subscribe(self, channel: str) -> AsyncIterator[str]:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(channel, set()).add(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers[channel].discard(queue)
+
+    async def close(self):
+        pass
+
+
+class RedisBackend:
+    """Entries shared by all workers (and hosts) through Redis, invalidations go over pub/sub."""
+
+    def __init__(self, url: str):
+        # Imported lazily, Redis is only needed when it is configured
+        import redis.asyncio
+        from redis.exceptions import RedisError
+
+        self.errors = (RedisError, OSError)
+        self.redis = redis.asyncio.from_url(url)
+        self._set_if = self.redis.register_script(SET_IF)
+
+    async def get(self, key: str) -> bytes | None:
+        return await self.redis.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        await self.redis.set(key, value, px=int(ttl * 1000))
+
+    async def delete(self, *keys: str):
+        await self.redis.delete(*keys)
+
+    async def incr(self, key: str, ttl: float):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            await pipe.incr(key).pexpire(key, int(ttl * 1000)).execute()
+
+    async def set_if(self, key: str, value: bytes, ttl: float, guard: str, expected: bytes) -> bool:
+        return bool(await self._set_if(keys=[key, guard], args=[value, int(ttl * 1000), expected]))
+
+    async def publish(self, channel: str, message: str):
+        await self.redis.publish(channel, message)
+
+    async def subscribe(self, channel: str) -> AsyncIterator[str]:
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(channel)
+        try:
+            async for message in pubsub.listen():
+                yield message["data"].decode()
+        finally:
+            await pubsub.aclose()
+
+    async def close(self):
+        await self.redis.aclose()
+
+
+class ResponseCache:
+    """Read-through cache of serialized responses: a small per-worker L1 in front of a shared L2.
+
+    Writers call `invalidate` after committing. It bumps the generation of the keys, drops them from the
+    local L1 and from L2, then publishes them so every other worker drops its L1 copy as well. Reads fill
+    the cache with `fill`, which gives up when the generation changed since the read began, so a load that
+    raced a write cannot store the pre-write representation. The short L1 TTL bounds
+    staleness if an invalidation message is lost, e.g. while the subscriber reconnects.
+
+    Without Redis the L2 is a dict per process and invalidations never leave the worker that made them,
+    so with several workers `from_settings` caps the TTL at the L1 TTL.
+    """
+
+    def __init__(
+        self,
+        backend: MemoryBackend | RedisBackend,
+        ttl: float,
+        l1_size: int,
+        l1_ttl: float,
+        prefix: str = "artadas:response:",
+        channel: str = "artadas:invalidate",
+        mode: str = "in-process",
+    ):
+        self.backend = backend
+        self.ttl = ttl
+        # How entries are shared, logged at startup
+        self.mode = mode
+        self.l1 = TTLCache(l1_size, l1_ttl)
+        self.prefix = prefix
+        self.channel = channel
+        self._listener: asyncio.Task | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    @classmethod
+    def from_settings(cls) -> "ResponseCache":
+        ttl = settings.response_cache_ttl
+        if settings.redis_url:
+            backend, mode = RedisBackend(settings.redis_url), "shared through Redis"
+        else:
+            backend, mode = MemoryBackend(), "in-process"
+            # `python -m app.serve` exports the worker count
+            if settings.server_workers > 1 and ttl > settings.response_cache_l1_ttl:
+                ttl = settings.response_cache_l1_ttl
+                mode = f"in-process in each of {settings.server_workers} workers, no REDIS_URL: TTL capped at {ttl:g}s"
+        return cls(
+            backend,
+            ttl=ttl,
+            l1_size=settings.response_cache_l1_size,
+            l1_ttl=settings.response_cache_l1_ttl,
+            mode=mode,
+        )
+
+    async def get(self, key: str) -> CacheEntry | None:
+        if self.ttl <= 0:
+            return None
+        entry = self.l1.get(key)
+        if entry is not MISSING:
+            return entry
+        try:
+            raw = await self.backend.get(self.prefix + key)
+        except self.backend.errors as exc:
+            logger.warning(f"Response cache read failed: {exc}")
+            return None
+        if raw is None:
+            return None
+        etag, _, body = raw.partition(b"\n")
+        entry = (etag.decode(), body)
+        self.l1.set(key, entry)
+        return entry
+
+    async def set(self, key: str, entry: CacheEntry):
+        if self.ttl <= 0:
+            return
+        self.l1.set(key, entry)
+        etag, body = entry
+        try:
+            await self.backend.set(self.prefix + key, etag.encode() + b"\n" + body, self.ttl)
+        except self.backend.errors as exc:
+            logger.warning(f"Response cache write failed: {exc}")
+
+    def _generation_key(self, key: str) -> str:
+        return f"{self.prefix}generation:{key}"
+
+    async def generation(self, key: str) -> bytes | None:
+        """Invalidation counter of `key`, read before loading what `fill` stores. None when it is unknown."""
+        if self.ttl <= 0:
+            return None
+        try:
+            return await self.backend.get(self._generation_key(key)) or b"0"
+        except self.backend.errors as exc:
+            logger.warning(f"Response cache read failed: {exc}")
+            return None
+
+    async def fill(self, key: str, entry: CacheEntry, generation: bytes | None):
+        """Store a freshly loaded entry, unless `key` was invalidated since `generation` was read."""
+        if self.ttl <= 0 or generation is None:
+            return
+        etag, body = entry
+        try:
+            stored = await self.backend.set_if(
+                self.prefix + key, etag.encode() + b"\n" + body, self.ttl, self._generation_key(key), generation
+            )
+        except self.backend.errors as exc:
+            logger.warning(f"Response cache write failed: {exc}")
+            return
+        if stored:
+            self.l1.set(key, entry)
+
+    async def invalidate(self, *keys: str):
+        if self.ttl <= 0 or not keys:
+            return
+        for key in keys:
+            self.l1.delete(key)
+        try:
+            for key in keys:
+                # Outlives any load that read the previous generation
+                await self.backend.incr(self._generation_key(key), self.ttl)
+            await self.backend.delete(*(self.prefix + key for key in keys))
+            await self.backend.publish(self.channel, json.dumps(keys))
+        except self.backend.errors as exc:
+            logger.warning(f"Response cache invalidation failed: {exc}")
+
+    async def listen(self):
+        """Drop invalidated keys from the L1 of this worker, reconnecting on errors."""
+        while True:
+            try:
+                async for message in self.backend.subscribe(self.channel):
+                    for key in json.loads(message):
+                        self.l1.delete(key)
+            except self.backend.errors as exc:
+                logger.warning(f"Response cache subscription lost: {exc}")
+            # Anything published while disconnected was missed
+            self.l1.clear()
+            await asyncio.sleep(1.0)
+
+    async def start(self):
+        if self.ttl <= 0:
+            logger.info("Response cache disabled")
+            return
+        logger.info(f"Response cache: {self.mode}, TTL {self.ttl:g}s")
+        if self._listener is None:
+            self._listener = asyncio.create_task(self.listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        await self.backend.close()
+
+
+response_cache = ResponseCache.from_settings()
+
+
+def course_key(course_id: UUID) -> str:
+    return f"course:{course_id}"
+
+
+def course_topics_key(course_id: UUID) -> str:
+    return f"course:{course_id}:topics"
+
+
+def topic_key(topic_id: UUID) -> str:
+    return f"topic:{topic_id}"
+
+
+def training_key(training_id: UUID) -> str:
+    return f"training:{training_id}"
+
+
+async def serve_cached(
+    request: Request,
+    key: str,
+    cache_control: str,
+    session: AsyncSession,
+    primary: AsyncSession,
+    load: Callable[[AsyncSession], Awaitable[CacheEntry]],
+    revalidate: Callable[[], Awaitable[str | None]] | None = None,
+) -> Response:
+    """Answer a read from the response cache, falling back to `load` (which may raise a 404) on a miss.
+
+    `revalidate` returns the current ETag cheaply, so conditional requests that miss the cache can
+    still be answered with a 304 without loading the full representation. It and `load` run on the
+    request's `session`, a replica when configured, except for loads that fill the shared cache:
+    those run on `primary`, so a lagging replica cannot store a stale representation for everybody.
+    """
+    entry = await response_cache.get(key)
+    if entry is None:
+        if revalidate is not None and request.headers.get("if-none-match"):
+            etag = await revalidate()
+            if etag is not None and (response := not_modified(request, etag, cache_control)):
+                return response
+        if response_cache.enabled:
+            generation = await response_cache.generation(key)
+            entry = await load(primary)
+            await response_cache.fill(key, entry, generation)
+        else:
+            entry = await load(session)
+
+    etag, body = entry
+    if response := not_modified(request, etag, cache_control):
+        return response
+    return Response(body, media_type="application/json", headers={"ETag": etag, "Cache-Control": cache_control})
@@ -0,0 +1,96 @@
+"""JSON encoding of ORM objects without a second validation.
+
+Handlers load rows themselves, so validating them into `CourseReadList`/`TopicReadList`/... again before
+encoding (what `response_model=` does) only costs time. Here a read model is compiled once into a converter
+that copies its fields from the ORM objects into plain dicts, which orjson encodes directly. Nested read
+models work on related objects and on JSON columns (dicts) alike.
+
+Only read models that are plain subsets of their table's fields qualify: no aliases, serializers or computed
+fields. Anything else raises `TypeError` on first use, such routes keep going through `response_model=`.
+"""
+
+from functools import cache
+from operator import attrgetter
+from collections.abc import Mapping
+from types import NoneType, UnionType
+from typing import Any, Callable, Union, get_args, get_origin
+
+import orjson
+from fastapi import Response
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import BaseModel
+
+from app.core.config import settings
+
+# Encoder of the routes that still return objects for FastAPI to validate
+DefaultJSONResponse = ORJSONResponse if settings.json_encoder == "orjson" else JSONResponse
+
+Converter = Callable[[Any], Any]
+
+
+def _contains_model(annotation: Any) -> bool:
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return True
+    return any(_contains_model(arg) for arg in get_args(annotation))
+
+
+def _model_converter(model: type[BaseModel]) -> Converter:
+    decorators = model.__pydantic_decorators__
+    aliased = [name for name, field in model.model_fields.items() if field.serialization_alias or field.alias]
+    if model.model_computed_fields or decorators.field_serializers or decorators.model_serializers or aliased:
+        raise TypeError(f"{model.__name__} customizes its serialization, it has to be validated")
+
+    names = tuple(model.model_fields)
+    nested = {name: _converter(field.annotation) for name, field in model.model_fields.items()}
+    nested = {name: convert for name, convert in nested.items() if convert is not None}
+    read_attributes = attrgetter(*names) if len(names) > 1 else lambda obj: (getattr(obj, names[0]),)
+
+    def convert(obj: Any) -> dict:
+        if isinstance(obj, Mapping):
+            # JSON columns hold nested models as dicts
+            data = {name: obj.get(name) for name in names}
+        else:
+            data = dict(zip(names, read_attributes(obj)))
+        for name, convert_field in nested.items():
+            data[name] = convert_field(data[name])
+        return data
+
+    return convert
+
+
+@cache
+def _converter(annotation: Any) -> Converter | None:
+    """Converter from ORM objects to the builtins of `annotation`, None where values are used as they are."""
+    if not _contains_model(annotation):
+        return None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _model_converter(annotation)
+
+    origin, args = get_origin(annotation), get_args(annotation)
+    if origin in (Union, UnionType):
+        members = [arg for arg in args if arg is not NoneType]
+        if len(members) == 1:
+            convert_member = _converter(members[0])
+            return lambda value: None if value is None else convert_member(value)
+    elif origin is list:
+        convert_item = _converter(args[0])
+        return lambda values: [convert_item(value) for value in values]
+    raise TypeError(f"Unsupported response annotation {annotation}")
+
+
+def dump_json(model: Any, value: Any) -> bytes:
+    """Serialize ORM objects the way `response_model=model` would, without validating them."""
+    convert = _converter(model)
+    return orjson.dumps(value if convert is None else convert(value))
+
+
+def json_response(model: Any, value: Any, response: Response | None = None, status_code: int = 200) -> Response:
+    """Response of ORM objects encoded with `dump_json`, for handlers that keep `response_model=` for the docs.
+
+    FastAPI leaves returned responses alone, headers set on the injected `response` (pagination cursors)
+    are carried over here.
+    """
+    result = Response(dump_json(model, value), status_code=status_code, media_type="application/json")
+    if response is not None:
+        result.headers.raw.extend(response.headers.raw)
+    return result
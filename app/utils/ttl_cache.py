@@ -0,0 +1,84 @@
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+MISSING = object()
+
+
+class TTLCache:
+    """In-process LRU cache whose entries expire after a time-to-live.
+
+    `get_or_load` adds single-flight: concurrent misses for the same key share one loader call.
+    The loader is responsible for storing its result with `set`, so it can pick a TTL per value.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._pending: dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Any:
+        entry = self._data.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > self._clock():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+        self.misses += 1
+        return MISSING
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        self._data[key] = (self._clock() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+
+        future = self._pending.get(key)
+        if future is None:
+            future = asyncio.ensure_future(loader())
+            self._pending[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+        # Shielded, so one cancelled waiter does not cancel the load for the others
+        return await asyncio.shield(future)
+
+    def _forget(self, key: Hashable, future: asyncio.Future):
+        self._pending.pop(key, None)
+        if not future.cancelled():
+            # Mark the exception as retrieved even when every waiter has gone away
+            future.exception()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
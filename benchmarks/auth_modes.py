@@ -0,0 +1,68 @@
+"""Per-request cost of `authenticate` with remote token verification vs local JWT verification.
+
+The auth service is the in-process stand-in from `tests.fake_auth` with configurable latency.
+The token cache is disabled so every call pays the full verification cost.
+
+    python -m benchmarks.auth_modes --latency-ms 5 --calls 500
+"""
+
+import time
+import asyncio
+import argparse
+
+import httpx
+from fastapi import Request
+
+from app.utils import auth, auth_client, jwks
+from app.utils.ttl_cache import TTLCache
+from tests.fake_auth import FakeAuth
+
+
+def bearer_request(token: str) -> Request:
+    return Request({"type": "http", "headers": [(b"authorization", f"Bearer {token}".encode())]})
+
+
+async def measure(tokens: list[str], concurrency: int) -> tuple[float, float]:
+    """Mean latency per call (ms) and calls per second."""
+    latencies = []
+    queue = iter(tokens)
+
+    async def worker():
+        for token in queue:
+            started = time.perf_counter()
+            await auth.authenticate(bearer_request(token))
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return sum(latencies) / len(latencies) * 1000, len(tokens) / elapsed
+
+
+async def main(args):
+    fake = FakeAuth(latency=args.latency_ms / 1000)
+    auth_client.auth_client = auth_client.create_auth_client(httpx.ASGITransport(app=fake.app))
+    auth.token_cache = TTLCache(maxsize=0, ttl=0)
+    key_set = jwks.KeySet(jwks_url="/.well-known/jwks.json")
+    await key_set.refresh()
+
+    # Distinct tokens, so nothing could be shared between calls
+    tokens = [fake.issue_token(username=f"user{i}") for i in range(args.calls)]
+
+    print(f"{'mode':>8} {'concurrency':>12} {'mean ms':>10} {'calls/s':>10} {'verify calls':>13}")
+    for mode, mode_key_set in (("remote", None), ("jwt", key_set)):
+        jwks.key_set = mode_key_set
+        for concurrency in args.concurrency:
+            fake.verify_calls = 0
+            mean_ms, rate = await measure(tokens, concurrency)
+            print(f"{mode:>8} {concurrency:>12} {mean_ms:>10.3f} {rate:>10.1f} {fake.verify_calls:>13}")
+
+    await auth_client.close_auth_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Auth service response latency")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 50])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,89 @@
+"""Per-request cost of `MetricsMiddleware` and of a `/metrics` scrape.
+
+Serves a trivial route in-process with and without the middleware, so the difference is the collection
+overhead alone, then times the middleware's bookkeeping without any app around it.
+
+    python -m benchmarks.metrics_overhead --requests 20000
+"""
+
+import time
+import asyncio
+import argparse
+
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from app.utils.metrics import MetricsMiddleware, metrics_endpoint
+
+
+def make_app(metrics: bool) -> FastAPI:
+    api = FastAPI()
+
+    @api.get("/courses/{course_id}")
+    async def read_course(course_id: int) -> dict:
+        return {"id": course_id}
+
+    if metrics:
+        api.add_middleware(MetricsMiddleware)
+        api.add_route("/metrics", metrics_endpoint)
+    return api
+
+
+async def per_request(api: FastAPI, count: int) -> float:
+    async with AsyncClient(transport=ASGITransport(app=api), base_url="http://bench") as client:
+        for i in range(count // 10):
+            await client.get(f"/courses/{i}")
+        started = time.perf_counter()
+        for i in range(count):
+            await client.get(f"/courses/{i}")
+        return (time.perf_counter() - started) / count
+
+
+async def bare_middleware(count: int) -> float:
+    """The middleware around an app that answers immediately, the floor of the overhead."""
+
+    async def respond(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    durations = []
+    for app in (respond, MetricsMiddleware(respond)):
+        scope = {"type": "http", "method": "GET", "path": "/"}
+        started = time.perf_counter()
+        for _ in range(count):
+            await app(scope, receive, send)
+        durations.append((time.perf_counter() - started) / count)
+    return durations[1] - durations[0]
+
+
+async def main(args):
+    plain_app, metered_app = make_app(False), make_app(True)
+    # Alternate the variants and keep the best round of each, in-process timings are noisy
+    rounds = [
+        (await per_request(plain_app, args.requests), await per_request(metered_app, args.requests))
+        for _ in range(args.rounds)
+    ]
+    baseline, metered = min(r[0] for r in rounds), min(r[1] for r in rounds)
+    print(f"{'without metrics':>18} {baseline * 1e6:>9.1f} us/request")
+    print(f"{'with metrics':>18} {metered * 1e6:>9.1f} us/request")
+    print(f"{'overhead':>18} {(metered - baseline) * 1e6:>9.1f} us/request ({metered / baseline - 1:+.1%})")
+    print(f"{'middleware alone':>18} {await bare_middleware(args.requests) * 1e6:>9.1f} us/request")
+
+    async with AsyncClient(transport=ASGITransport(app=metered_app), base_url="http://bench") as client:
+        started = time.perf_counter()
+        response = await client.get("/metrics")
+        scrape = time.perf_counter() - started
+    print(f"{'scrape':>18} {scrape * 1000:>9.1f} ms ({len(response.content)} bytes)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20_000, help="Requests per variant and round")
+    parser.add_argument("--rounds", type=int, default=3)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,97 @@
+"""Cost of encoding ORM objects per response model: FastAPI's `response_model=` path vs `dump_json`.
+
+FastAPI validates the returned objects into the response model, serializes that to Python builtins and
+encodes them with the response class (`json` or orjson). `app.utils.serialization.dump_json` copies the
+fields from the ORM objects and encodes them with orjson, without the validation.
+
+    python -m benchmarks.serialization --items 100 --content-size 5000
+"""
+
+import time
+import timeit
+import asyncio
+import argparse
+from uuid import uuid4
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlalchemy.orm.attributes import set_committed_value
+
+import app.main  # noqa: F401, configures the mappers of every model
+from app.models.courses import Course, CourseReadList, CourseReadSingle
+from app.models.schedulers import Scheduler
+from app.models.topics import Topic, TopicReadList, TopicReadSingle
+from app.models.trainings import Training, TrainingReadList, TrainingReadSingle
+from app.utils.serialization import dump_json
+
+
+def make_rows(items: int, content_size: int) -> dict[type, list]:
+    text = ("lorem ipsum dolor sit amet " * (content_size // 27 + 1))[:content_size]
+    topics = [Topic(title=f"Topic {i}", content=text, creator_id=uuid4()) for i in range(items)]
+    courses = [Course(name=f"Course {i}", price=i, description=text[:500], creator_id=uuid4()) for i in range(items)]
+    trainings = []
+    for i in range(items):
+        training = Training(name=f"Training {i}", price=i, description=text[:500], creator_id=uuid4())
+        slot = {"start_time": "18:00", "end_time": "19:30"}
+        set_committed_value(training, "scheduler", Scheduler(training_id=training.id, monday=slot, friday=slot))
+        trainings.append(training)
+    return {Topic: topics, Course: courses, Training: trainings}
+
+
+async def fastapi_encode(field, response_class, value) -> bytes:
+    """What a handler returning `value` with `response_model=` costs after the handler itself."""
+    content = await serialize_response(field=field, response_content=value, is_coroutine=True)
+    return response_class(content).body
+
+
+def measure(function, number: int) -> float:
+    return min(timeit.repeat(function, number=number, repeat=5)) / number
+
+
+async def measure_fastapi(field, response_class, value, number: int) -> float:
+    # Timed inside one coroutine, so event loop overhead does not count against FastAPI
+    rounds = []
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(number):
+            await fastapi_encode(field, response_class, value)
+        rounds.append(time.perf_counter() - started)
+    return min(rounds) / number
+
+
+async def main(args):
+    rows = make_rows(args.items, args.content_size)
+    print(f"{'response model':<26} {'bytes':>9} {'json us':>10} {'orjson us':>10} {'dump_json us':>13} {'speedup':>8}")
+    for model, table in [
+        (CourseReadList, Course),
+        (CourseReadSingle, Course),
+        (TopicReadList, Topic),
+        (TopicReadSingle, Topic),
+        (TrainingReadList, Training),
+        (TrainingReadSingle, Training),
+    ]:
+        for annotation, value, label in [
+            (list[model], rows[table], f"list[{model.__name__}]"),
+            (model, rows[table][0], model.__name__),
+        ]:
+            field = create_model_field("Response", annotation, mode="serialization")
+            number = max(10, args.number // len(value) if isinstance(value, list) else args.number)
+            timings = [
+                await measure_fastapi(field, response_class, value, number)
+                for response_class in (JSONResponse, ORJSONResponse)
+            ]
+            fast = measure(lambda: dump_json(annotation, value), number)
+            body = dump_json(annotation, value)
+            print(
+                f"{label:<26} {len(body):>9} {timings[0] * 1e6:>10.1f} {timings[1] * 1e6:>10.1f} "
+                f"{fast * 1e6:>13.1f} {timings[0] / fast:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100, help="Objects per list response")
+    parser.add_argument("--content-size", type=int, default=5000, help="Characters of each topic's content")
+    parser.add_argument("--number", type=int, default=2000, help="Single-object encodings per timing")
+    asyncio.run(main(parser.parse_args()))
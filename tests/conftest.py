@@ -0,0 +1,81 @@
+import os
+from contextlib import contextmanager
+from uuid import uuid4
+
+# Settings are read at import time, provide sane defaults for the test run
+os.environ.setdefault("DEBUG", "False")
+os.environ.setdefault("POSTGRES_USER", "test")
+os.environ.setdefault("POSTGRES_PASSWORD", "test")
+os.environ.setdefault("POSTGRES_HOST", "localhost")
+os.environ.setdefault("POSTGRES_PORT", "5432")
+os.environ.setdefault("POSTGRES_DB", "test")
+os.environ.setdefault("AUTH_BASE_URL", "http://auth.test")
+
+import pytest  # noqa: E402
+from httpx import ASGITransport, AsyncClient  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from sqlmodel import SQLModel  # noqa: E402
+from sqlmodel.ext.asyncio.session import AsyncSession  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.db.database import get_primary_session, get_session  # noqa: E402
+from app.db.profiling import count_queries, instrument_engine  # noqa: E402
+from app.models.users import User  # noqa: E402
+from app.utils.auth import authenticate  # noqa: E402
+from app.utils.response_cache import MemoryBackend, response_cache  # noqa: E402
+
+
+def make_user(name: str = "author") -> User:
+    return User(id=uuid4(), username=name, email=f"{name}@artadas.test", full_name=None)
+
+
+@contextmanager
+def assert_max_queries(limit: int):
+    """Fail when the block runs more than `limit` SQL statements, listing those it ran."""
+    with count_queries() as stats:
+        yield stats
+    assert stats.count <= limit, f"{stats.count} statements, at most {limit} expected:\n" + "\n".join(stats.statements)
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    instrument_engine(engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+async def session(engine):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+
+
+@pytest.fixture
+def user() -> User:
+    return make_user()
+
+
+@pytest.fixture
+async def client(engine, user):
+    """HTTP client bound to the test database, authenticated as `user`.
+
+    Assign `client.user` to act as somebody else.
+    """
+
+    async def get_test_session():
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            yield session
+
+    # Every test starts with an empty response cache
+    response_cache.backend = MemoryBackend()
+    response_cache.l1.clear()
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        client.user = user
+        app.dependency_overrides[get_session] = app.dependency_overrides[get_primary_session] = get_test_session
+        app.dependency_overrides[authenticate] = lambda: client.user
+        yield client
+    app.dependency_overrides.clear()
@@ -0,0 +1,99 @@
+"""Local stand-in for the artadas auth service.
+
+Serves `POST /auth/verify/` and a JWKS document at `GET /.well-known/jwks.json`, signs tokens
+with its own RSA keys and can add artificial latency to every response. Use it in-process via
+`httpx.ASGITransport(app=FakeAuth().app)` or run it with uvicorn.
+"""
+
+import time
+import asyncio
+from uuid import UUID, uuid4
+
+import rsa
+from fastapi import FastAPI, HTTPException
+from jose import jwt, JWTError
+from jose.utils import long_to_base64
+from pydantic import BaseModel
+
+
+class TokenPayload(BaseModel):
+    token: str
+
+
+class FakeAuth:
+    def __init__(self, latency: float = 0.0, key_bits: int = 2048):
+        self.latency = latency
+        self.key_bits = key_bits
+        self.keys: dict[str, rsa.PrivateKey] = {}
+        self.public: dict[str, rsa.PublicKey] = {}
+        self.verify_calls = 0
+        self.jwks_calls = 0
+        self.current_kid = self.rotate_key()
+        self.app = self.build_app()
+
+    def rotate_key(self) -> str:
+        """Add a new signing key, earlier keys keep verifying."""
+        public, private = rsa.newkeys(self.key_bits)
+        kid = uuid4().hex[:8]
+        self.keys[kid], self.public[kid] = private, public
+        self.current_kid = kid
+        return kid
+
+    def jwks(self, kids: list[str] | None = None) -> dict:
+        return {
+            "keys": [
+                {
+                    "kty": "RSA",
+                    "use": "sig",
+                    "alg": "RS256",
+                    "kid": kid,
+                    "n": long_to_base64(self.public[kid].n).decode(),
+                    "e": long_to_base64(self.public[kid].e).decode(),
+                }
+                for kid in kids or self.public
+            ]
+        }
+
+    def issue_token(self, user_id: UUID | None = None, username: str = "student", ttl: int = 3600, kid=None) -> str:
+        kid = kid or self.current_kid
+        claims = {
+            "sub": str(user_id or uuid4()),
+            "username": username,
+            "email": f"{username}@artadas.test",
+            "full_name": None,
+            "exp": int(time.time()) + ttl,
+        }
+        private_pem = self.keys[kid].save_pkcs1().decode()
+        return jwt.encode(claims, private_pem, algorithm="RS256", headers={"kid": kid})
+
+    def decode(self, token: str) -> dict:
+        kid = jwt.get_unverified_header(token).get("kid")
+        if kid not in self.public:
+            raise HTTPException(status_code=401, detail="Unknown key")
+        return jwt.decode(token, self.jwks([kid])["keys"][0], algorithms=["RS256"])
+
+    def build_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.get("/.well-known/jwks.json")
+        async def jwks():
+            self.jwks_calls += 1
+            await asyncio.sleep(self.latency)
+            return self.jwks()
+
+        @app.post("/auth/verify/")
+        async def verify(payload: TokenPayload):
+            self.verify_calls += 1
+            await asyncio.sleep(self.latency)
+            try:
+                claims = self.decode(payload.token)
+            except JWTError:
+                raise HTTPException(status_code=401, detail="Invalid token")
+            return {
+                "id": claims["sub"],
+                "username": claims["username"],
+                "email": claims["email"],
+                "full_name": claims["full_name"],
+            }
+
+        return app
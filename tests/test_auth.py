@@ -0,0 +1,180 @@
+import asyncio
+from uuid import uuid4
+
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+from fastapi import HTTPException, Request
+
+from app.utils import auth, auth_client
+from app.utils.ttl_cache import MISSING, TTLCache
+from tests.conftest import make_user
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def bearer_request(token: str) -> Request:
+    return Request({"type": "http", "headers": [(b"authorization", f"Bearer {token}".encode())]})
+
+
+@pytest.fixture
+def verify_calls(monkeypatch):
+    """Replace the remote verify call, tokens starting with `bad` are rejected."""
+    calls = []
+    users = {}
+
+    async def verify_token(token: str):
+        calls.append(token)
+        await asyncio.sleep(0.01)
+        if token.startswith("bad"):
+            raise HTTPException(status_code=401, detail="Authentication error")
+        return users.setdefault(token, make_user(token))
+
+    monkeypatch.setattr(auth, "verify_token", verify_token)
+    monkeypatch.setattr(auth, "token_cache", TTLCache(maxsize=100, ttl=60))
+    return calls
+
+
+def test_ttl_cache_expiry_and_lru_eviction():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=2, ttl=10, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # evicts "b", "a" was used more recently
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+
+    clock.now = 11
+    assert cache.get("a") is MISSING
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (2, 2, 1)
+
+
+async def test_authenticate_caches_verified_tokens(verify_calls):
+    first = await auth.authenticate(bearer_request("good"))
+    second = await auth.authenticate(bearer_request("good"))
+    assert first is second
+    assert verify_calls == ["good"]
+    assert auth.token_cache.hits == 1
+
+
+async def test_token_cache_metrics(verify_calls, monkeypatch):
+    monkeypatch.setattr(auth, "token_cache", auth.TokenCache(maxsize=1, ttl=60))
+    monkeypatch.setitem(auth.verify_stats, "calls", 2)
+    monkeypatch.setitem(auth.verify_stats, "seconds", 0.5)
+
+    def sample(name: str, **labels) -> float:
+        return REGISTRY.get_sample_value(name, labels) or 0.0
+
+    before = {
+        "hits": sample("auth_token_cache_lookups_total", result="hit"),
+        "misses": sample("auth_token_cache_lookups_total", result="miss"),
+        "evictions": sample("auth_token_cache_evictions_total"),
+        "saved": sample("auth_token_cache_saved_seconds_total"),
+    }
+    for token in ("one", "one", "two"):
+        await auth.authenticate(bearer_request(token))
+
+    assert sample("auth_token_cache_lookups_total", result="hit") == before["hits"] + 1
+    assert sample("auth_token_cache_lookups_total", result="miss") == before["misses"] + 2
+    assert sample("auth_token_cache_evictions_total") == before["evictions"] + 1
+    assert sample("auth_token_cache_saved_seconds_total") == pytest.approx(before["saved"] + 0.25)
+
+
+async def test_authenticate_negative_cache(verify_calls):
+    for _ in range(3):
+        with pytest.raises(HTTPException) as exc_info:
+            await auth.authenticate(bearer_request("bad-token"))
+        assert exc_info.value.status_code == 401
+    assert verify_calls == ["bad-token"]
+
+
+async def test_disabled_cache_does_not_remember_rejections(verify_calls, monkeypatch):
+    monkeypatch.setattr(auth, "token_cache", TTLCache(maxsize=100, ttl=0))
+    for _ in range(2):
+        with pytest.raises(HTTPException):
+            await auth.authenticate(bearer_request("bad-token"))
+    assert verify_calls == ["bad-token", "bad-token"]
+
+
+async def test_authenticate_single_flight(verify_calls):
+    users = await asyncio.gather(*(auth.authenticate(bearer_request("shared")) for _ in range(20)))
+    assert len({user.id for user in users}) == 1
+    assert verify_calls == ["shared"]
+
+
+async def test_authenticate_does_not_keep_raw_token(verify_calls):
+    await auth.authenticate(bearer_request("secret-token"))
+    assert "secret-token" not in auth.token_cache._data
+
+
+def verified(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, json={"id": str(uuid4()), "username": "u", "email": "u@a.test", "full_name": None})
+
+
+class FakeAuthService:
+    """In-process stand-in for the auth service, `handler` decides the response."""
+
+    def __init__(self):
+        self.calls = 0
+        self.handler = verified
+        self.clock = FakeClock()
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        return self.handler(request)
+
+
+@pytest.fixture
+def auth_service(monkeypatch):
+    service = FakeAuthService()
+    monkeypatch.setattr(auth_client, "auth_client", auth_client.create_auth_client(httpx.MockTransport(service)))
+    monkeypatch.setattr(auth_client, "auth_breaker", auth_client.CircuitBreaker(2, 10, clock=service.clock))
+    return service
+
+
+async def test_verify_token_uses_shared_client(auth_service):
+    user = await auth.verify_token("token")
+    assert user.username == "u"
+    assert auth_service.calls == 1
+
+
+async def test_verify_token_rejections_do_not_trip_the_breaker(auth_service):
+    auth_service.handler = lambda request: httpx.Response(401, json={"detail": "expired"})
+    for _ in range(5):
+        with pytest.raises(HTTPException) as exc_info:
+            await auth.verify_token("token")
+        assert exc_info.value.status_code == 401
+    assert auth_client.auth_breaker.state == auth_client.CircuitBreaker.CLOSED
+
+
+def verify_errors(reason: str) -> float:
+    return REGISTRY.get_sample_value("auth_verify_errors_total", {"reason": reason}) or 0.0
+
+
+async def test_circuit_breaker_fails_fast_and_recovers(auth_service):
+    def unreachable(request):
+        raise httpx.ConnectTimeout("timed out", request=request)
+
+    auth_service.handler = unreachable
+    errors = {reason: verify_errors(reason) for reason in ("unreachable", "circuit_open")}
+    for _ in range(4):
+        with pytest.raises(HTTPException) as exc_info:
+            await auth.verify_token("token")
+        assert exc_info.value.status_code == 503
+    # Two failures opened the circuit, the rest never reached the service
+    assert auth_service.calls == 2
+    assert verify_errors("unreachable") == errors["unreachable"] + 2
+    assert verify_errors("circuit_open") == errors["circuit_open"] + 2
+
+    auth_service.clock.now = 11
+    auth_service.handler = verified
+    assert (await auth.verify_token("token")).username == "u"
+    assert auth_client.auth_breaker.state == auth_client.CircuitBreaker.CLOSED
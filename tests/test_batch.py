@@ -0,0 +1,53 @@
+from app.db.profiling import count_queries
+
+
+async def test_topic_batch_keeps_order_and_reports_bad_items(client):
+    payload = [
+        {"title": "First", "content": "-"},
+        {"title": "No content"},
+        {"title": "Third", "content": "-"},
+        "not an object",
+        {"title": "Fifth", "content": "-", "extra": 1},
+        {"title": "Sixth", "content": "-"},
+    ]
+    with count_queries() as stats:
+        response = await client.post("/topics/batch", json=payload)
+    assert response.status_code == 207
+    # A single INSERT ... RETURNING, no refresh per row
+    assert stats.count == 1
+
+    results = response.json()
+    assert [result["index"] for result in results] == list(range(6))
+    assert [result["status"] for result in results] == [201, 422, 201, 422, 422, 201]
+    assert [result["item"]["title"] for result in results if result["status"] == 201] == ["First", "Third", "Sixth"]
+    assert results[1]["errors"][0]["loc"] == ["content"]
+    assert results[1]["item"] is None
+
+    created = results[0]["item"]
+    assert created["creator_id"] == str(client.user.id)
+    assert (await client.get(f"/topics/{created['id']}")).json() == created
+
+
+async def test_course_and_training_batches(client):
+    courses = [{"name": f"Course {i}", "price": i, "description": "-"} for i in range(50)]
+    response = await client.post("/courses/batch", json=courses)
+    assert response.status_code == 201
+    assert [result["item"]["name"] for result in response.json()] == [course["name"] for course in courses]
+
+    trainings = [{"name": "T", "price": 1, "description": "-"}, {"name": "T", "price": -1, "description": "-"}]
+    response = await client.post("/trainings/batch", json=trainings)
+    assert response.status_code == 207
+    first, second = response.json()
+    assert first["item"]["scheduler"] is None
+    assert second["status"] == 422
+
+
+async def test_batch_limits(client):
+    assert (await client.post("/topics/batch", json=[])).status_code == 422
+    assert (await client.post("/topics/batch", json={"title": "T", "content": "-"})).status_code == 422
+    too_many = [{"title": "T", "content": "-"}] * 1001
+    assert (await client.post("/topics/batch", json=too_many)).status_code == 422
+
+    response = await client.post("/topics/batch", json=["nope"])
+    assert response.status_code == 207
+    assert (await client.get("/topics/by/me")).json() == []
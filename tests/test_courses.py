@@ -0,0 +1,238 @@
+import random
+from uuid import UUID
+
+from sqlmodel import select, update
+
+from app.db.profiling import count_queries
+from app.models.courses import Course
+from app.models.topics import SEQUENCE_GAP, Syllabus
+from app.utils.counters import reconcile_student_counts
+from tests.conftest import make_user
+
+
+async def create_course(client, **fields) -> dict:
+    payload = {"name": "Course", "price": 10, "description": "About"} | fields
+    response = await client.post("/courses/", json=payload)
+    assert response.status_code == 201
+    return response.json()
+
+
+async def create_topic(client, title: str) -> dict:
+    response = await client.post("/topics/", json={"title": title, "content": f"{title} content"})
+    assert response.status_code == 201
+    return response.json()
+
+
+async def test_course_crud(client):
+    course = await create_course(client, name="Python")
+    assert course["creator_id"] == str(client.user.id)
+
+    response = await client.get(f"/courses/{course['id']}")
+    assert response.status_code == 200
+    assert response.json()["name"] == "Python"
+
+    response = await client.patch(f"/courses/{course['id']}", json={"price": 20})
+    assert response.status_code == 200
+    assert response.json()["price"] == 20
+
+    response = await client.get("/courses/by/me")
+    assert [c["id"] for c in response.json()] == [course["id"]]
+
+    response = await client.delete(f"/courses/{course['id']}")
+    assert response.status_code == 200
+    assert (await client.get(f"/courses/{course['id']}")).status_code == 404
+
+
+async def test_course_syllabus_ordering(client):
+    course = await create_course(client)
+    topics = [await create_topic(client, f"Topic {i}") for i in range(4)]
+    for topic in topics:
+        response = await client.post(f"/courses/{course['id']}/topics/{topic['id']}")
+        assert response.status_code == 200
+
+    titles = [t["title"] for t in (await client.get(f"/courses/{course['id']}/topics")).json()]
+    assert titles == ["Topic 0", "Topic 1", "Topic 2", "Topic 3"]
+
+    response = await client.post(f"/courses/{course['id']}/topics/{topics[3]['id']}/1")
+    assert [t["title"] for t in response.json()] == ["Topic 3", "Topic 0", "Topic 1", "Topic 2"]
+
+    response = await client.delete(f"/courses/{course['id']}/topics/{topics[0]['id']}")
+    assert [t["title"] for t in response.json()] == ["Topic 3", "Topic 1", "Topic 2"]
+
+    response = await client.post(f"/courses/{course['id']}/topics/{topics[3]['id']}")
+    assert response.status_code == 400
+
+
+async def test_syllabus_moves_touch_one_row_and_rebalance(client, session):
+    course = await create_course(client)
+    topics = [await create_topic(client, f"Topic {i}") for i in range(20)]
+    for topic in topics:
+        await client.post(f"/courses/{course['id']}/topics/{topic['id']}")
+    url = f"/courses/{course['id']}/topics"
+    expected = [topic["id"] for topic in topics]
+
+    rng = random.Random(7)
+    # Always moving to the second slot keeps halving the same gap until a rebalance kicks in
+    moves = [(rng.choice(expected), 2) for _ in range(40)] + [
+        (rng.choice(expected), rng.randint(1, 25)) for _ in range(40)
+    ]
+    rebalances = 0
+    for topic_id, position in moves:
+        with count_queries() as stats:
+            response = await client.post(f"{url}/{topic_id}/{position}")
+        expected.remove(topic_id)
+        expected.insert(min(position, len(topics)) - 1, topic_id)
+        assert [t["id"] for t in response.json()] == expected
+        # One UPDATE for the moved row, plus one (executemany) when the background rebalance follows
+        syllabus_writes = [s for s in stats.statements if s.startswith("UPDATE syllabus")]
+        assert len(syllabus_writes) <= 2
+        # Only the new neighbours' keys are read
+        syllabus_reads = [s for s in stats.statements if s.startswith("SELECT syllabus.sequence")]
+        assert all("LIMIT" in s for s in syllabus_reads)
+        rebalances += len(syllabus_writes) == 2
+        assert [t["id"] for t in (await client.get(url)).json()] == expected
+
+    # 40 splits of one gap would exhaust it twice over
+    assert 1 <= rebalances <= 5
+    course_id = UUID(course["id"])
+    keys = (await session.exec(select(Syllabus.sequence).where(Syllabus.course_id == course_id))).all()
+    assert len(set(keys)) == len(topics)
+
+    await Syllabus.rebalance(course_id, session)
+    keys = (await session.exec(select(Syllabus.sequence).order_by(Syllabus.sequence))).all()
+    assert keys == [position * SEQUENCE_GAP for position in range(1, 21)]
+    assert [t["id"] for t in (await client.get(url)).json()] == expected
+
+
+async def test_bulk_syllabus_replace_and_patch(client):
+    course = await create_course(client)
+    topics = [await create_topic(client, f"Topic {i}") for i in range(12)]
+    ids = [topic["id"] for topic in topics]
+    url = f"/courses/{course['id']}/topics"
+
+    with count_queries() as stats:
+        response = await client.put(url, json={"topic_ids": ids[:10]})
+    assert response.status_code == 200
+    assert [t["id"] for t in response.json()] == ids[:10]
+    # Course, current syllabus, new topics, one INSERT and the course timestamp
+    assert stats.count == 5
+
+    # Reorder, drop and add in one go
+    wanted = [ids[9], ids[10], *ids[2:9]]
+    with count_queries() as stats:
+        response = await client.put(url, json={"topic_ids": wanted})
+    assert [t["id"] for t in response.json()] == wanted
+    assert stats.count == 7
+    assert [t["id"] for t in (await client.get(url)).json()] == wanted
+
+    operations = [
+        {"op": "remove", "topic_id": ids[10]},
+        {"op": "add", "topic_id": ids[11], "position": 1},
+        {"op": "move", "topic_id": ids[9], "position": 100},
+        {"op": "add", "topic_id": ids[0]},
+    ]
+    response = await client.patch(url, json={"operations": operations})
+    assert response.status_code == 200
+    expected = [ids[11], *ids[2:9], ids[9], ids[0]]
+    assert [t["id"] for t in response.json()] == expected
+    assert [t["id"] for t in (await client.get(url)).json()] == expected
+
+    response = await client.put(url, json={"topic_ids": []})
+    assert response.json() == []
+
+
+async def test_bulk_syllabus_errors_change_nothing(client):
+    course = await create_course(client)
+    topics = [await create_topic(client, f"Topic {i}") for i in range(3)]
+    ids = [topic["id"] for topic in topics]
+    url = f"/courses/{course['id']}/topics"
+    await client.put(url, json={"topic_ids": ids[:2]})
+
+    assert (await client.put(url, json={"topic_ids": [ids[0], ids[0]]})).status_code == 400
+    operations = [{"op": "remove", "topic_id": ids[0]}, {"op": "add", "topic_id": ids[1]}]
+    assert (await client.patch(url, json={"operations": operations})).status_code == 400
+    operations = [
+        {"op": "add", "topic_id": ids[2]},
+        {"op": "remove", "topic_id": ids[2]},
+        {"op": "move", "topic_id": ids[2], "position": 1},
+    ]
+    assert (await client.patch(url, json={"operations": operations})).status_code == 404
+    response = await client.patch(url, json={"operations": [{"op": "move", "topic_id": ids[0]}]})
+    assert response.status_code == 422
+
+    client.user = make_user("other")
+    foreign = await create_topic(client, "Foreign")
+    assert (await client.put(url, json={"topic_ids": ids})).status_code == 404
+    course_of_other = await create_course(client)
+    response = await client.put(f"/courses/{course_of_other['id']}/topics", json={"topic_ids": [ids[0]]})
+    assert response.status_code == 404
+    response = await client.put(f"/courses/{course_of_other['id']}/topics", json={"topic_ids": [foreign["id"]]})
+    assert response.status_code == 200
+
+    assert [t["id"] for t in (await client.get(url)).json()] == ids[:2]
+
+
+async def test_join_and_leave_course(client):
+    course = await create_course(client)
+    author = client.user
+
+    student = client.user = make_user("student")
+    response = await client.post(f"/courses/{course['id']}/join")
+    assert response.status_code == 200
+    assert [c["id"] for c in (await client.get("/courses/joined")).json()] == [course["id"]]
+
+    client.user = author
+    response = await client.get(f"/courses/{course['id']}/students")
+    assert response.json() == [str(student.id)]
+
+    client.user = make_user("other")
+    assert (await client.post(f"/courses/{course['id']}/leave")).status_code == 404
+
+
+async def test_student_count_follows_joins_and_leaves(client):
+    course = await create_course(client)
+    assert course["student_count"] == 0
+    etag = (await client.get(f"/courses/{course['id']}")).headers["ETag"]
+
+    for name in ("first", "second"):
+        client.user = make_user(name)
+        assert (await client.post(f"/courses/{course['id']}/join")).status_code == 200
+    response = await client.get(f"/courses/{course['id']}")
+    assert response.json()["student_count"] == 2
+    assert response.headers["ETag"] != etag
+
+    assert (await client.post(f"/courses/{course['id']}/leave")).status_code == 200
+    assert (await client.get(f"/courses/{course['id']}")).json()["student_count"] == 1
+
+
+async def test_reconciliation_fixes_drifted_counts(client, session):
+    course = await create_course(client)
+    client.user = make_user("student")
+    await client.post(f"/courses/{course['id']}/join")
+    await session.exec(update(Course).values(student_count=42))
+    await session.commit()
+
+    assert await reconcile_student_counts(session) == {"course": 1, "training": 0}
+    assert (await session.get(Course, UUID(course["id"]), populate_existing=True)).student_count == 1
+    assert await reconcile_student_counts(session) == {"course": 0, "training": 0}
+
+
+async def test_list_courses_by_student_count(client):
+    courses = [await create_course(client, name=f"Course {i}") for i in range(5)]
+    for students, course in zip([1, 3, 0, 3, 2], courses):
+        for i in range(students):
+            client.user = make_user(f"student{i}")
+            await client.post(f"/courses/{course['id']}/join")
+
+    seen, cursor = [], None
+    while True:
+        params = {"sort": "student_count", "page_size": 2} | ({"cursor": cursor} if cursor else {})
+        response = await client.get("/courses/", params=params)
+        seen += response.json()
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    # Ties keep the newest first
+    assert [course["name"] for course in seen] == ["Course 3", "Course 1", "Course 4", "Course 0", "Course 2"]
+    assert [course["student_count"] for course in seen] == [3, 3, 2, 1, 0]
+    assert (await client.get("/courses/", params={"sort": "name"})).status_code == 422
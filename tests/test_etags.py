@@ -0,0 +1,81 @@
+from app.db.profiling import count_queries
+from app.utils.response_cache import course_key, response_cache
+
+
+async def conditional_get(client, url: str, etag: str):
+    with count_queries() as stats:
+        response = await client.get(url, headers={"If-None-Match": etag})
+    return response, stats.count
+
+
+async def test_course_revalidation(client):
+    course = (await client.post("/courses/", json={"name": "C", "price": 1, "description": "-"})).json()
+    url = f"/courses/{course['id']}"
+
+    response = await client.get(url)
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "public, no-cache"
+
+    response, queries = await conditional_get(client, url, etag)
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+    assert queries == 0
+
+    # Without a cached copy a single light query is enough
+    await response_cache.invalidate(course_key(course["id"]))
+    response, queries = await conditional_get(client, url, etag)
+    assert response.status_code == 304
+    assert queries == 1
+
+    response, _ = await conditional_get(client, url, f'"other", W/{etag}')
+    assert response.status_code == 304
+
+    await client.patch(url, json={"price": 2})
+    response, _ = await conditional_get(client, url, etag)
+    assert response.status_code == 200
+    assert response.json()["price"] == 2
+    assert response.headers["ETag"] != etag
+
+
+async def test_course_topics_validator_follows_syllabus_and_topic_edits(client):
+    course = (await client.post("/courses/", json={"name": "C", "price": 1, "description": "-"})).json()
+    topic = (await client.post("/topics/", json={"title": "T", "content": "-"})).json()
+    url = f"/courses/{course['id']}/topics"
+
+    etags = [(await client.get(url)).headers["ETag"]]
+    await client.post(f"{url}/{topic['id']}")
+    etags.append((await client.get(url)).headers["ETag"])
+    assert (await conditional_get(client, url, etags[-1]))[0].status_code == 304
+
+    await client.patch(f"/topics/{topic['id']}", json={"title": "Renamed"})
+    etags.append((await client.get(url)).headers["ETag"])
+    await client.delete(f"{url}/{topic['id']}")
+    etags.append((await client.get(url)).headers["ETag"])
+
+    assert len(set(etags)) == len(etags)
+    for stale in etags[:-1]:
+        assert (await conditional_get(client, url, stale))[0].status_code == 200
+
+
+async def test_topic_and_training_revalidation(client):
+    topic = (await client.post("/topics/", json={"title": "T", "content": "-"})).json()
+    response = await client.get(f"/topics/{topic['id']}")
+    assert response.headers["Cache-Control"] == "public, max-age=60, must-revalidate"
+    assert (await conditional_get(client, f"/topics/{topic['id']}", response.headers["ETag"]))[0].status_code == 304
+
+    training = (await client.post("/trainings/", json={"name": "T", "price": 1, "description": "-"})).json()
+    url = f"/trainings/{training['id']}"
+    etag = (await client.get(url)).headers["ETag"]
+    assert (await conditional_get(client, url, etag))[0].status_code == 304
+
+    schedule = {"monday": {"start_time": "18:00", "end_time": "19:00"}}
+    await client.post(f"{url}/schedule", json=schedule)
+    response, _ = await conditional_get(client, url, etag)
+    assert response.status_code == 200
+    assert response.json()["scheduler"]["monday"]["start_time"] == "18:00"
+
+
+async def test_unknown_resource_with_validator_is_404(client):
+    response = await client.get("/courses/00000000-0000-0000-0000-000000000000", headers={"If-None-Match": "*"})
+    assert response.status_code == 404
@@ -0,0 +1,70 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException, Request
+
+from app.utils import auth, auth_client, jwks
+from app.utils.ttl_cache import TTLCache
+from tests.fake_auth import FakeAuth
+
+JWKS_URL = "http://auth.test/.well-known/jwks.json"
+
+
+def bearer_request(token: str) -> Request:
+    return Request({"type": "http", "headers": [(b"authorization", f"Bearer {token}".encode())]})
+
+
+@pytest.fixture(scope="module")
+def fake_auth() -> FakeAuth:
+    return FakeAuth(key_bits=1024)
+
+
+@pytest.fixture
+async def key_set(fake_auth, monkeypatch) -> jwks.KeySet:
+    client = auth_client.create_auth_client(httpx.ASGITransport(app=fake_auth.app))
+    monkeypatch.setattr(auth_client, "auth_client", client)
+    monkeypatch.setattr(auth_client, "auth_breaker", auth_client.CircuitBreaker(5, 10))
+    monkeypatch.setattr(auth, "token_cache", TTLCache(maxsize=100, ttl=0))
+    key_set = jwks.KeySet(jwks_url=JWKS_URL)
+    await key_set.refresh()
+    monkeypatch.setattr(jwks, "key_set", key_set)
+    fake_auth.verify_calls = 0
+    yield key_set
+    await client.aclose()
+
+
+async def test_tokens_are_verified_locally(fake_auth, key_set):
+    token = fake_auth.issue_token(username="alice")
+    user = await auth.authenticate(bearer_request(token))
+    assert user.username == "alice"
+    assert fake_auth.verify_calls == 0
+
+
+async def test_unknown_kid_falls_back_to_remote_verify_and_refreshes_keys(fake_auth, key_set):
+    key_set.fetched_at = 0  # allow an immediate refresh
+    new_kid = fake_auth.rotate_key()
+    token = fake_auth.issue_token(username="bob")
+
+    user = await auth.authenticate(bearer_request(token))
+    assert user.username == "bob"
+    assert fake_auth.verify_calls == 1
+
+    await asyncio.gather(*key_set._background)
+    assert new_kid in key_set.keys
+    await auth.authenticate(bearer_request(token))
+    assert fake_auth.verify_calls == 1
+
+
+@pytest.mark.parametrize("tamper", ["expired", "forged"])
+async def test_invalid_tokens_are_rejected_locally(fake_auth, key_set, tamper):
+    if tamper == "expired":
+        token = fake_auth.issue_token(ttl=-10)
+    else:
+        header, payload, signature = fake_auth.issue_token().split(".")
+        token = ".".join([header, fake_auth.issue_token(username="admin").split(".")[1], signature])
+
+    with pytest.raises(HTTPException) as exc_info:
+        await auth.authenticate(bearer_request(token))
+    assert exc_info.value.status_code == 401
+    assert fake_auth.verify_calls == 0
@@ -0,0 +1,30 @@
+from benchmarks.load import Result, compare, percentile, uncovered_routes
+
+
+def test_every_route_has_a_load_scenario():
+    assert uncovered_routes() == []
+
+
+def test_percentile_uses_nearest_rank():
+    ordered = [float(value) for value in range(1, 101)]
+    assert [percentile(ordered, p) for p in (50, 95, 99)] == [50.0, 95.0, 99.0]
+    assert percentile([7.0], 99) == 7.0
+
+
+def test_compare_flags_slower_routes_beyond_the_tolerance():
+    baseline = {
+        "GET /courses/ @1": {"rps": 100.0, "p95_ms": 10.0},
+        "GET /topics/ @1": {"rps": 100.0, "p95_ms": 10.0},
+    }
+    results = {
+        "GET /courses/ @1": Result(100, 0, rps=95.0, p50_ms=5.0, p95_ms=10.5, p99_ms=12.0),
+        "GET /topics/ @1": Result(100, 0, rps=80.0, p50_ms=5.0, p95_ms=12.0, p99_ms=15.0),
+        "GET /trainings/ @1": Result(100, 0, rps=1.0, p50_ms=500.0, p95_ms=900.0, p99_ms=990.0),
+    }
+
+    regressions = compare(results, baseline, tolerance=0.1)
+
+    assert regressions == [
+        "GET /topics/ @1: p95 10.00ms -> 12.00ms",
+        "GET /topics/ @1: 100.0 -> 80.0 requests/s",
+    ]
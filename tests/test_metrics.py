@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.utils.metrics import MeteredQueuePool
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+async def test_requests_are_timed_by_route_template(client):
+    course = (await client.post("/courses/", json={"name": "C", "price": 1, "description": "-"})).json()
+    labels = {"method": "GET", "route": "/courses/{course_id}", "status": "200"}
+    before = sample("http_request_duration_seconds_count", **labels)
+    unmatched = sample("http_request_duration_seconds_count", method="GET", route="<unmatched>", status="404")
+
+    for _ in range(3):
+        await client.get(f"/courses/{course['id']}")
+    await client.get("/nowhere")
+
+    assert sample("http_request_duration_seconds_count", **labels) == before + 3
+    assert sample("http_request_duration_seconds_count", method="GET", route="<unmatched>", status="404") == (
+        unmatched + 1
+    )
+    assert sample("http_requests_in_flight", method="GET") == 0
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_bucket{le="0.005",method="GET",route="/courses/{course_id}"' in response.text
+    assert "auth_verify_duration_seconds_count" in response.text
+
+
+async def test_pool_usage_and_timeouts(tmp_path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+        poolclass=MeteredQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    acquired = sample("db_pool_acquire_seconds_count")
+    timeouts = sample("db_pool_timeouts_total")
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+        assert sample("db_pool_checked_out") == 1
+        with pytest.raises(PoolTimeoutError):
+            await asyncio.wait_for(engine.connect().start(), 1)
+    assert sample("db_pool_checked_out") == 0
+    assert sample("db_pool_size") == 1
+    assert sample("db_pool_acquire_seconds_count") == acquired + 2
+    assert sample("db_pool_timeouts_total") == timeouts + 1
+    await engine.dispose()
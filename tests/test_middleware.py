@@ -0,0 +1,59 @@
+import json
+import logging
+
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from app.utils.middleware import LoggingMiddleware
+
+api = FastAPI()
+
+
+@api.post("/items/{item_id}")
+async def create_item(item_id: int, payload: dict) -> dict:
+    return payload
+
+
+@api.get("/fail")
+async def fail():
+    raise RuntimeError("boom")
+
+
+def client_for(**options) -> AsyncClient:
+    transport = ASGITransport(app=LoggingMiddleware(api, **options), raise_app_exceptions=False)
+    return AsyncClient(transport=transport, base_url="http://test")
+
+
+def records(caplog) -> list[dict]:
+    return [json.loads(record.getMessage()) for record in caplog.records if record.name == "uvicorn"]
+
+
+async def test_logs_one_structured_line_per_request(caplog):
+    caplog.set_level(logging.INFO, logger="uvicorn")
+    async with client_for(body_limit=8, log_headers=True) as client:
+        response = await client.post("/items/7", json={"name": "x" * 20}, headers={"Authorization": "Bearer secret"})
+
+    [record] = records(caplog)
+    assert record["method"] == "POST"
+    assert record["route"] == "/items/{item_id}"
+    assert record["path"] == "/items/7"
+    assert record["status"] == 200
+    assert record["duration_ms"] >= 0
+    assert record["request_bytes"] == len(response.request.content)
+    assert record["response_bytes"] == len(response.content)
+    assert record["body"] == '{"name":'
+    assert record["body_truncated"] is True
+    assert record["headers"]["authorization"] == "[redacted]"
+    assert "secret" not in caplog.text
+
+
+async def test_sampling_keeps_errors(caplog):
+    caplog.set_level(logging.INFO, logger="uvicorn")
+    async with client_for(sample_rate=0) as client:
+        await client.post("/items/1", json={})
+        await client.get("/missing")
+        assert (await client.get("/fail")).status_code == 500
+
+    [record] = records(caplog)
+    assert (record["route"], record["status"]) == ("/fail", 500)
+    assert "body" not in record and "headers" not in record
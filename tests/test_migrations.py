@@ -0,0 +1,37 @@
+import pytest
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+
+from app.db.profiling import count_queries
+from app.utils.migrations import PendingMigrationsError, alembic_config, ensure_migrations
+
+
+async def stamp(engine, revision: str):
+    script = ScriptDirectory.from_config(alembic_config())
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda sync_conn: MigrationContext.configure(sync_conn).stamp(script, revision))
+
+
+async def test_skip_does_not_touch_the_database(engine):
+    with count_queries() as stats:
+        assert await ensure_migrations(engine, "skip") == {}
+    assert stats.count == 0
+
+
+async def test_check_refuses_an_outdated_database(engine):
+    with pytest.raises(PendingMigrationsError):
+        await ensure_migrations(engine, "check")
+    await stamp(engine, "head")
+    await stamp(engine, "b7e21f0c9d53")
+    with pytest.raises(PendingMigrationsError, match="b7e21f0c9d53"):
+        await ensure_migrations(engine, "check")
+
+
+async def test_current_database_only_reads_its_version(engine):
+    await stamp(engine, "head")
+    for mode in ("check", "auto"):
+        with count_queries() as stats:
+            timings = await ensure_migrations(engine, mode)
+        assert list(timings) == ["scripts", "version"]
+        # Whether alembic_version exists, then its content
+        assert stats.count == 2
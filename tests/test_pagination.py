@@ -0,0 +1,88 @@
+from uuid import uuid4
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.courses import Course
+from app.models.topics import Topic
+from app.models.trainings import Training
+
+START = datetime(2025, 1, 1)
+
+
+@pytest.fixture
+async def topics(session) -> list[str]:
+    """25 topics, created a minute apart, the last two sharing a timestamp."""
+    creator_id = uuid4()
+    rows = [
+        Topic(
+            title=f"Topic {i}", content="...", creator_id=creator_id, created_at=START + timedelta(minutes=min(i, 23))
+        )
+        for i in range(25)
+    ]
+    session.add_all(rows)
+    await session.commit()
+    rows.sort(key=lambda topic: (topic.created_at, topic.id))
+    return [str(topic.id) for topic in rows]
+
+
+async def walk(client, url: str, header: str, **params) -> list[list[str]]:
+    pages = []
+    while True:
+        response = await client.get(url, params=params)
+        assert response.status_code == 200
+        pages.append([item["id"] for item in response.json()])
+        if header not in response.headers:
+            return pages
+        params["cursor"] = response.headers[header]
+
+
+async def test_cursor_pages_forward_and_backward(client, topics):
+    forward = await walk(client, "/topics/", "X-Next-Cursor", limit=10)
+    assert [len(page) for page in forward] == [10, 10, 5]
+    assert sum(forward, []) == topics
+
+    response = await client.get("/topics/", params={"limit": 10})
+    last = await client.get("/topics/", params={"limit": 10, "cursor": response.headers["X-Next-Cursor"]})
+    last = await client.get("/topics/", params={"limit": 10, "cursor": last.headers["X-Next-Cursor"]})
+    backward = await walk(client, "/topics/", "X-Prev-Cursor", limit=10, cursor=last.headers["X-Prev-Cursor"])
+    assert backward == [topics[10:20], topics[:10]]
+
+
+async def test_cursor_is_stable_under_inserts(client, session, topics):
+    response = await client.get("/topics/", params={"limit": 10})
+    session.add(Topic(title="Early", content="...", creator_id=uuid4(), created_at=START - timedelta(days=1)))
+    await session.commit()
+
+    response = await client.get("/topics/", params={"limit": 10, "cursor": response.headers["X-Next-Cursor"]})
+    assert [item["id"] for item in response.json()] == topics[10:20]
+
+
+async def test_legacy_offset_parameters(client, session, topics):
+    response = await client.get("/topics/", params={"offset": 20, "limit": 10})
+    assert [item["id"] for item in response.json()] == topics[20:]
+    assert "X-Next-Cursor" not in response.headers
+
+    creator_id = uuid4()
+    session.add_all(Course(name=f"C{i}", price=i, description="", creator_id=creator_id) for i in range(3))
+    session.add_all(Training(name=f"T{i}", price=i, description="", creator_id=creator_id) for i in range(3))
+    await session.commit()
+    for url in ("/courses/", "/trainings/"):
+        response = await client.get(url, params={"page": 2, "page_size": 2})
+        assert len(response.json()) == 1
+        assert len(sum(await walk(client, url, "X-Next-Cursor", page_size=2), [])) == 3
+
+
+async def test_page_size_bounds(client, topics):
+    # Older clients asking for large offset pages keep working, cursor pages are capped
+    response = await client.get("/topics/", params={"offset": 0, "limit": 500})
+    assert len(response.json()) == len(topics)
+    for params in ({"limit": 500}, {"limit": 0}):
+        assert (await client.get("/topics/", params=params)).status_code == 422
+    assert (await client.get("/courses/", params={"page": 1, "page_size": 500})).status_code == 200
+    assert (await client.get("/courses/", params={"page_size": 500})).status_code == 422
+
+
+async def test_invalid_cursor(client):
+    response = await client.get("/courses/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
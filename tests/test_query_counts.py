@@ -0,0 +1,161 @@
+import logging
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.core.config import settings
+from app.db.profiling import DB_QUERIES_HEADER, DB_TIME_HEADER, QueryCountMiddleware, count_queries, parameter_shape
+from app.main import app
+from app.utils.response_cache import MemoryBackend, course_key, course_topics_key, response_cache
+from tests.conftest import assert_max_queries, make_user
+
+
+@pytest.fixture
+async def course(client) -> dict:
+    course = (await client.post("/courses/", json={"name": "C", "price": 1, "description": "-"})).json()
+    for i in range(5):
+        topic = (await client.post("/topics/", json={"title": f"T{i}", "content": "-"})).json()
+        await client.post(f"/courses/{course['id']}/topics/{topic['id']}")
+    course["topics"] = (await client.get(f"/courses/{course['id']}/topics")).json()
+    return course
+
+
+@pytest.fixture
+async def training(client) -> dict:
+    training = (await client.post("/trainings/", json={"name": "T", "price": 1, "description": "-"})).json()
+    schedule = {"monday": {"start_time": "10:00", "end_time": "11:00"}}
+    await client.post(f"/trainings/{training['id']}/schedule", json=schedule)
+    return training
+
+
+async def request_queries(client, method: str, url: str, **kwargs) -> int:
+    with count_queries() as stats:
+        response = await client.request(method, url, **kwargs)
+    assert response.status_code < 400, response.text
+    return stats.count
+
+
+async def test_course_topic_endpoints(client, course):
+    topics_url = f"/courses/{course['id']}/topics"
+    topic_id = course["topics"][2]["id"]
+    new_topic = (await client.post("/topics/", json={"title": "New", "content": "-"})).json()
+
+    # The fixture's last read filled the response cache
+    assert await request_queries(client, "GET", topics_url) == 0
+    await response_cache.invalidate(course_topics_key(course["id"]))
+    assert await request_queries(client, "GET", topics_url) == 2
+    await response_cache.invalidate(course_topics_key(course["id"]))
+    assert await request_queries(client, "GET", topics_url, headers={"If-None-Match": '"stale"'}) == 3
+    # Syllabus edits also bump the course's updated_at
+    assert await request_queries(client, "POST", f"{topics_url}/{new_topic['id']}") == 5
+    # Moves and deletes write a single syllabus row, whatever the length of the course
+    assert await request_queries(client, "POST", f"{topics_url}/{topic_id}/1") == 5
+    assert await request_queries(client, "DELETE", f"{topics_url}/{topic_id}") == 4
+
+
+async def test_training_endpoints(client, training):
+    url = f"/trainings/{training['id']}"
+    schedule = {"friday": {"start_time": "10:00", "end_time": "11:00"}}
+
+    assert await request_queries(client, "GET", url) == 1
+    assert await request_queries(client, "POST", "/trainings/", json={"name": "X", "price": 1, "description": "-"}) == 2
+    # Includes replacing the schedule slots, one DELETE and one INSERT
+    assert await request_queries(client, "POST", f"{url}/schedule", json=schedule) == 6
+    assert await request_queries(client, "PATCH", url, json={"price": 5}) == 3
+
+    client.user = make_user("student")
+    # The conflict check reads the slots of the new and the joined trainings at once,
+    # the student count is bumped with one UPDATE ... RETURNING
+    assert await request_queries(client, "POST", f"{url}/join") == 4
+
+
+async def within_budget(client, method: str, url: str, budget: int, json=None):
+    # Budgets are for reads that miss the response cache
+    response_cache.backend = MemoryBackend()
+    response_cache.l1.clear()
+    with assert_max_queries(budget):
+        response = await client.request(method, url, json=json)
+    assert response.status_code < 400, f"{method} {url}: {response.text}"
+
+
+async def test_endpoint_budgets(client, course, training):
+    course_id, training_id, topic_id = course["id"], training["id"], course["topics"][0]["id"]
+    syllabus = {"topic_ids": [topic["id"] for topic in reversed(course["topics"])]}
+    new_course = {"name": "B", "price": 1, "description": "-"}
+
+    await within_budget(client, "GET", "/topics/", 1)
+    await within_budget(client, "POST", "/topics/", 2, {"title": "B", "content": "-"})
+    await within_budget(client, "POST", "/topics/batch", 1, [{"title": "B", "content": "-"}] * 3)
+    await within_budget(client, "GET", "/topics/by/me", 1)
+    await within_budget(client, "GET", f"/topics/{topic_id}", 1)
+    # Also finds the courses whose cached syllabus shows the topic
+    await within_budget(client, "PATCH", f"/topics/{topic_id}", 4, {"title": "T0 edited"})
+
+    await within_budget(client, "GET", "/courses/", 1)
+    await within_budget(client, "GET", "/courses/?sort=student_count", 1)
+    await within_budget(client, "POST", "/courses/", 2, new_course)
+    await within_budget(client, "POST", "/courses/batch", 1, [new_course] * 3)
+    await within_budget(client, "GET", "/courses/by/me", 1)
+    await within_budget(client, "GET", f"/courses/{course_id}", 1)
+    await within_budget(client, "GET", f"/courses/{course_id}/topics", 2)
+    await within_budget(client, "PUT", f"/courses/{course_id}/topics", 4, syllabus)
+    await within_budget(client, "GET", f"/courses/{course_id}/students", 2)
+    await within_budget(client, "PATCH", f"/courses/{course_id}", 3, {"price": 2})
+
+    await within_budget(client, "GET", "/trainings/", 1)
+    await within_budget(client, "POST", "/trainings/", 2, new_course)
+    await within_budget(client, "GET", "/trainings/available?weekday=monday", 1)
+    await within_budget(client, "GET", f"/trainings/{training_id}", 1)
+    await within_budget(client, "GET", f"/trainings/{training_id}/students", 2)
+    await within_budget(client, "PATCH", f"/trainings/{training_id}", 3, {"price": 2})
+
+    author, client.user = client.user, make_user("student")
+    await within_budget(client, "POST", f"/courses/{course_id}/join", 3)
+    await within_budget(client, "GET", "/courses/joined", 1)
+    await within_budget(client, "POST", f"/courses/{course_id}/leave", 3)
+    await within_budget(client, "POST", f"/trainings/{training_id}/join", 4)
+    await within_budget(client, "GET", "/trainings/joined", 1)
+    await within_budget(client, "GET", "/trainings/joined/conflicts", 1)
+    await within_budget(client, "POST", f"/trainings/{training_id}/leave", 3)
+
+    client.user = author
+    await within_budget(client, "DELETE", f"/trainings/{training_id}", 4)
+    await within_budget(client, "DELETE", f"/courses/{course_id}", 4)
+    await within_budget(client, "DELETE", f"/topics/{topic_id}", 3)
+
+
+async def test_debug_headers_report_the_request_queries(client, course):
+    await response_cache.invalidate(course_topics_key(course["id"]))
+    transport = ASGITransport(app=QueryCountMiddleware(app, add_headers=True))
+    async with AsyncClient(transport=transport, base_url="http://test") as debug_client:
+        response = await debug_client.get(f"/courses/{course['id']}/topics")
+    assert response.status_code == 200
+    assert response.headers[DB_QUERIES_HEADER] == "2"
+    assert float(response.headers[DB_TIME_HEADER]) > 0
+
+
+async def test_request_stats_keep_no_sql_text(client, course):
+    # The middleware's per-request stats only count, the enclosing test block still records
+    with count_queries() as outer:
+        with count_queries(record=False) as inner:
+            await client.get(f"/courses/{course['id']}/students")
+    assert inner.statements is None
+    assert inner.count == len(outer.statements) > 0
+
+
+async def test_slow_queries_are_logged_with_route_and_parameter_types(client, course, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "slow_query_ms", 1e-6)
+    await response_cache.invalidate(course_key(course["id"]))
+    with caplog.at_level(logging.WARNING, logger="uvicorn"):
+        await client.get(f"/courses/{course['id']}")
+    [slow] = [record.getMessage() for record in caplog.records if record.getMessage().startswith("Slow query")]
+    assert "in GET /courses/{course_id}: SELECT" in slow
+    # SQLite binds the UUID as a hex string
+    assert slow.endswith("params=(str)")
+    assert course["id"].replace("-", "") not in slow
+
+
+def test_parameter_shape_never_shows_values():
+    assert parameter_shape({"id_1": 7, "name": "secret"}, False) == "{id_1: int, name: str}"
+    assert parameter_shape([("a", 1), ("b", 2)], True) == "2 x (str, int)"
+    assert parameter_shape(tuple(range(25)), False).endswith("int, ... 5 more)")
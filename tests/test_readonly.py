@@ -0,0 +1,27 @@
+import pytest
+from sqlmodel import select
+
+from app.db.readonly import read_columns, select_rows
+from app.models.courses import Course, CourseReadList, CourseReadSingle
+from app.models.trainings import Training, TrainingReadSingle
+from app.utils.pagination import creation_order
+from app.utils.serialization import dump_json
+
+
+async def test_rows_encode_like_entities_and_stay_untracked(client, session):
+    for i in range(3):
+        await client.post("/courses/", json={"name": f"C{i}", "price": i, "description": "D"})
+
+    statement = select_rows(Course, CourseReadList, creation_order(Course))
+    rows = (await session.exec(statement.order_by(Course.created_at, Course.id))).all()
+    assert len(session.identity_map) == 0
+    assert rows[0].created_at is not None  # sort keys are selected for the cursors
+
+    entities = (await session.exec(select(Course).order_by(Course.created_at, Course.id))).all()
+    assert dump_json(list[CourseReadList], rows) == dump_json(list[CourseReadList], entities)
+
+
+def test_read_columns_only_accept_columns():
+    assert [column.key for column in read_columns(Course, CourseReadSingle)] == list(CourseReadSingle.model_fields)
+    with pytest.raises(TypeError, match="scheduler"):
+        read_columns(Training, TrainingReadSingle)
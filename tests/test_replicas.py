@@ -0,0 +1,130 @@
+import pytest
+from prometheus_client import REGISTRY
+from fastapi import Request, Response
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.main import app
+from app.db.database import get_primary_session, get_session
+from app.db.replicas import PRIMARY_COOKIE, ReplicaSet, SessionRouter
+from app.models.courses import Course
+from app.utils.response_cache import response_cache
+from tests.conftest import make_user
+
+
+@pytest.fixture
+async def replica(tmp_path):
+    replica = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+    async with replica.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with AsyncSession(replica) as session:
+        session.add(Course(name="Replicated", price=1, description="D", creator_id=make_user().id))
+        await session.commit()
+    yield replica
+    await replica.dispose()
+
+
+def route_sessions(router: SessionRouter):
+    async def get_routed_session(request: Request, response: Response):
+        async with router.session(request, response) as session:
+            yield session
+
+    async def get_routed_primary_session(request: Request, response: Response):
+        async with router.session(request, response, primary=True) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = get_routed_session
+    app.dependency_overrides[get_primary_session] = get_routed_primary_session
+
+
+def sessions_routed(target: str) -> float:
+    return REGISTRY.get_sample_value("db_sessions_total", {"target": target}) or 0.0
+
+
+async def course_names(client) -> list[str]:
+    return [course["name"] for course in (await client.get("/courses/")).json()]
+
+
+async def test_reads_go_to_the_replica_and_writes_to_the_primary(client, engine, replica):
+    route_sessions(SessionRouter(engine, ReplicaSet([replica])))
+    client.headers["Authorization"] = "Bearer author"
+
+    response = await client.post("/courses/", json={"name": "Written", "price": 1, "description": "D"})
+    assert response.status_code == 201
+    assert PRIMARY_COOKIE in response.cookies
+
+    # The writer reads its own write, through the cookie or, without cookies, through its credentials
+    assert await course_names(client) == ["Written"]
+    client.cookies.clear()
+    assert await course_names(client) == ["Written"]
+
+    # Everybody else reads the replica
+    client.headers["Authorization"] = "Bearer somebody else"
+    client.cookies.clear()
+    assert await course_names(client) == ["Replicated"]
+
+    # except for reads that fill the shared response cache
+    course_id = response.json()["id"]
+    assert (await client.get(f"/courses/{course_id}")).json()["name"] == "Written"
+
+
+async def test_only_cache_fills_read_the_primary(client, engine, replica, monkeypatch):
+    route_sessions(SessionRouter(engine, ReplicaSet([replica])))
+    async with AsyncSession(replica) as session:
+        course = (await session.exec(select(Course))).one()
+    url = f"/courses/{course.id}"
+
+    # The course only exists on the replica: without the cache it is read there
+    monkeypatch.setattr(response_cache, "ttl", 0)
+    response = await client.get(url)
+    assert response.status_code == 200
+    monkeypatch.undo()
+
+    # So are revalidations, while a load that would fill the cache goes to the primary
+    assert (await client.get(url, headers={"If-None-Match": response.headers["ETag"]})).status_code == 304
+    assert (await client.get(url)).status_code == 404
+
+
+async def test_reads_fall_back_to_the_primary_without_a_healthy_replica(client, engine, tmp_path):
+    unreachable = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    replicas = ReplicaSet([unreachable], retry_interval=60)
+    route_sessions(SessionRouter(engine, replicas))
+    await client.post("/courses/", json={"name": "Written", "price": 1, "description": "D"})
+    client.cookies.clear()
+
+    # Replicas are not probed, the request that finds one down fails and takes it out of rotation
+    with pytest.raises(OperationalError):
+        await client.get("/courses/")
+    assert replicas.candidates() == []
+
+    fallbacks = sessions_routed("primary_fallback")
+    assert await course_names(client) == ["Written"]
+    assert sessions_routed("primary_fallback") == fallbacks + 1
+    await unreachable.dispose()
+
+
+async def test_replica_balancing(tmp_path):
+    # Pooled like the asyncpg engines of real replicas
+    engines = [
+        create_async_engine(f"sqlite+aiosqlite:///{tmp_path / f'replica{i}.db'}", poolclass=AsyncAdaptedQueuePool)
+        for i in range(2)
+    ]
+    now = [0.0]
+
+    round_robin = ReplicaSet(engines, "round_robin", retry_interval=30, clock=lambda: now[0])
+    firsts = [round_robin.candidates()[0].engine for _ in range(4)]
+    assert firsts == [engines[0], engines[1], engines[0], engines[1]]
+
+    round_robin.mark_down(round_robin.replicas[0], OSError("refused"))
+    assert [replica.engine for replica in round_robin.candidates()] == [engines[1]]
+    now[0] = 31
+    assert len(round_robin.candidates()) == 2
+
+    least_connections = ReplicaSet(engines, "least_connections")
+    async with engines[0].connect():
+        assert least_connections.pick() is engines[1]
+    for engine in engines:
+        await engine.dispose()
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from app.db.profiling import count_queries
+from app.core.config import settings
+from app.utils.response_cache import MemoryBackend, ResponseCache, response_cache
+
+
+def make_cache(backend: MemoryBackend) -> ResponseCache:
+    return ResponseCache(backend, ttl=60, l1_size=100, l1_ttl=60)
+
+
+async def test_invalidation_reaches_every_worker():
+    shared = MemoryBackend()
+    workers = [make_cache(shared), make_cache(shared)]
+    for worker in workers:
+        await worker.start()
+    await asyncio.sleep(0)
+
+    await workers[0].set("course:1", ('"v1"', b"{}"))
+    assert await workers[1].get("course:1") == ('"v1"', b"{}")
+    assert len(workers[1].l1) == 1
+
+    await workers[0].invalidate("course:1")
+    await asyncio.sleep(0)
+    assert len(workers[1].l1) == 0
+    assert await workers[1].get("course:1") is None
+
+    for worker in workers:
+        await worker.stop()
+
+
+@pytest.mark.parametrize("workers, ttl", [(0, 300), (1, 300), (4, 5)])
+def test_in_process_cache_ttl_is_capped_with_several_workers(monkeypatch, workers, ttl):
+    monkeypatch.setattr(settings, "redis_url", None)
+    monkeypatch.setattr(settings, "server_workers", workers)
+    monkeypatch.setattr(settings, "response_cache_ttl", 300.0)
+    monkeypatch.setattr(settings, "response_cache_l1_ttl", 5.0)
+    cache = ResponseCache.from_settings()
+    assert isinstance(cache.backend, MemoryBackend)
+    assert cache.ttl == ttl
+
+
+async def test_fill_gives_up_after_an_invalidation():
+    cache = make_cache(MemoryBackend())
+    generation = await cache.generation("course:1")
+    await cache.invalidate("course:1")
+    await cache.fill("course:1", ('"stale"', b"{}"), generation)
+    assert await cache.get("course:1") is None
+
+    generation = await cache.generation("course:1")
+    await cache.fill("course:1", ('"fresh"', b"{}"), generation)
+    assert await cache.get("course:1") == ('"fresh"', b"{}")
+
+
+async def test_slow_load_racing_a_write_does_not_fill_the_cache(client, monkeypatch):
+    topic = (await client.post("/topics/", json={"title": "Old", "content": "-"})).json()
+    url = f"/topics/{topic['id']}"
+    loaded, written = asyncio.Event(), asyncio.Event()
+    fill = response_cache.fill
+
+    async def slow_fill(key, entry, generation):
+        # The read has loaded the old row, the write commits and invalidates before it is stored
+        loaded.set()
+        await written.wait()
+        await fill(key, entry, generation)
+
+    async def write():
+        await loaded.wait()
+        await client.patch(url, json={"title": "New"})
+        written.set()
+
+    monkeypatch.setattr(response_cache, "fill", slow_fill)
+    read, _ = await asyncio.gather(client.get(url), write())
+    assert read.json()["title"] == "Old"
+    monkeypatch.undo()
+
+    assert (await client.get(url)).json()["title"] == "New"
+
+
+class UnreachableBackend(MemoryBackend):
+    errors = (ConnectionError,)
+
+    async def get(self, key):
+        raise ConnectionError("redis is down")
+
+    async def set(self, key, value, ttl):
+        raise ConnectionError("redis is down")
+
+
+async def test_unreachable_backend_only_costs_the_cache():
+    cache = make_cache(UnreachableBackend())
+    assert await cache.get("topic:1") is None
+    await cache.set("topic:1", ('"v1"', b"{}"))
+    # Still served from this worker's L1
+    assert await cache.get("topic:1") == ('"v1"', b"{}")
+
+
+async def test_reads_are_served_from_cache_until_a_write(client):
+    topic = (await client.post("/topics/", json={"title": "T", "content": "-"})).json()
+    course = (await client.post("/courses/", json={"name": "C", "price": 1, "description": "-"})).json()
+    await client.post(f"/courses/{course['id']}/topics/{topic['id']}")
+    urls = [f"/topics/{topic['id']}", f"/courses/{course['id']}", f"/courses/{course['id']}/topics"]
+
+    first = [await client.get(url) for url in urls]
+    with count_queries() as stats:
+        second = [await client.get(url) for url in urls]
+    assert stats.count == 0
+    assert [response.json() for response in second] == [response.json() for response in first]
+    assert [response.headers["ETag"] for response in second] == [response.headers["ETag"] for response in first]
+
+    # Renaming the topic invalidates the topic and every syllabus it appears in
+    await client.patch(f"/topics/{topic['id']}", json={"title": "Renamed"})
+    assert (await client.get(urls[0])).json()["title"] == "Renamed"
+    assert (await client.get(urls[2])).json()[0]["title"] == "Renamed"
+
+    await client.delete(f"/topics/{topic['id']}")
+    assert (await client.get(urls[0])).status_code == 404
+    assert (await client.get(urls[2])).json() == []
+
+
+async def test_training_schedule_invalidates(client):
+    training = (await client.post("/trainings/", json={"name": "T", "price": 1, "description": "-"})).json()
+    url = f"/trainings/{training['id']}"
+    assert (await client.get(url)).json()["scheduler"] is None
+
+    await client.post(f"{url}/schedule", json={"monday": {"start_time": "18:00", "end_time": "19:00"}})
+    assert (await client.get(url)).json()["scheduler"]["monday"]["start_time"] == "18:00"
+
+    other = (await client.post("/trainings/", json={"name": "O", "price": 1, "description": "-"})).json()
+    await client.get(f"/trainings/{other['id']}")
+    await client.delete(f"/trainings/{other['id']}")
+    assert (await client.get(f"/trainings/{other['id']}")).status_code == 404
+    assert len(response_cache.l1) == 1
@@ -0,0 +1,64 @@
+from sqlalchemy.dialects import postgresql
+
+from app.routers.search import full_text_search
+
+
+async def seed(client):
+    topics = [
+        {"title": "Async Python", "content": "Event loops and coroutines in Python."},
+        {"title": "Databases", "content": "Indexes make Python services fast, 100% of the time."},
+        {"title": "Cooking", "content": "Nothing to see here."},
+    ]
+    for topic in topics:
+        await client.post("/topics/", json=topic)
+    await client.post("/courses/", json={"name": "Python for everyone", "price": 1, "description": "From zero"})
+
+
+async def test_search_ranks_title_matches_first(client):
+    await seed(client)
+
+    response = await client.get("/search/", params={"q": "python"})
+    assert response.status_code == 200
+    hits = response.json()
+    assert {hit["title"] for hit in hits} == {"Async Python", "Databases", "Python for everyone"}
+    assert hits[-1]["title"] == "Databases"
+    assert hits[0]["rank"] > hits[-1]["rank"]
+    assert "<b>Python</b>" in hits[-1]["headline"]
+    assert "content" not in hits[0]
+
+    response = await client.get("/search/", params={"q": "python loops", "kind": "topic"})
+    assert [hit["title"] for hit in response.json()] == ["Async Python"]
+    response = await client.get("/search/", params={"q": "python", "kind": "course"})
+    assert [hit["kind"] for hit in response.json()] == ["course"]
+
+    # LIKE wildcards in the query are matched literally
+    response = await client.get("/search/", params={"q": "100%"})
+    assert [hit["title"] for hit in response.json()] == ["Databases"]
+    assert (await client.get("/search/", params={"q": "%"})).json() == []
+    assert (await client.get("/search/", params={"q": ""})).status_code == 422
+
+
+async def test_search_cursor_pagination(client):
+    for i in range(7):
+        await client.post("/topics/", json={"title": f"Lesson {i}", "content": "lesson body" if i % 2 else "other"})
+
+    seen, cursor = [], None
+    while True:
+        response = await client.get("/search/", params={"q": "lesson", "limit": 3, "cursor": cursor})
+        seen += response.json()
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert len(seen) == 7
+    assert len({hit["id"] for hit in seen}) == 7
+    ranks = [hit["rank"] for hit in seen]
+    assert ranks == sorted(ranks, reverse=True)
+
+
+def test_full_text_query_uses_the_search_vector():
+    _, statement = full_text_search("async & python", ["topic", "course"])
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert "topic.search_vector @@ websearch_to_tsquery" in sql
+    assert "course.search_vector @@ websearch_to_tsquery" in sql
+    assert "UNION ALL" in sql
+    assert sql.count("ts_headline(") == 1
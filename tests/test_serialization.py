@@ -0,0 +1,61 @@
+import pytest
+from pydantic import Field, TypeAdapter
+from sqlmodel import SQLModel, select
+from sqlalchemy.orm import selectinload
+
+from app.models.courses import Course, CourseReadList, CourseReadSingle
+from app.models.topics import Topic, TopicReadList, TopicReadSingle
+from app.models.trainings import Training, TrainingReadList, TrainingReadSingle
+from app.utils.serialization import dump_json
+
+
+def validated_json(model, value) -> bytes:
+    """What `response_model=model` produces, validation included."""
+    adapter = TypeAdapter(model)
+    return adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+
+
+async def test_dump_json_matches_validated_output(client, session):
+    course = (await client.post("/courses/", json={"name": "Ünïcode", "price": 5, "description": "D"})).json()
+    topic = (await client.post("/topics/", json={"title": "T", "content": 'Line\n\t"quoted" ✓'})).json()
+    await client.post(f"/courses/{course['id']}/topics/{topic['id']}")
+    scheduled = (await client.post("/trainings/", json={"name": "A", "price": 1, "description": "D"})).json()
+    await client.post(
+        f"/trainings/{scheduled['id']}/schedule", json={"monday": {"start_time": "18:00", "end_time": "19:30"}}
+    )
+    await client.post("/trainings/", json={"name": "B", "price": 2, "description": "D"})
+
+    courses = (await session.exec(select(Course).options(selectinload(Course.topics)))).all()
+    topics = (await session.exec(select(Topic))).all()
+    trainings = (await session.exec(select(Training).options(selectinload(Training.scheduler)))).all()
+    assert {training.scheduler is None for training in trainings} == {True, False}
+
+    for model, value in [
+        (list[CourseReadList], courses),
+        (CourseReadSingle, courses[0]),
+        (list[TopicReadList], courses[0].topics),
+        (TopicReadSingle, topics[0]),
+        (list[TrainingReadList], trainings),
+        (list[TrainingReadSingle], trainings),
+    ]:
+        assert dump_json(model, value) == validated_json(model, value), model
+
+
+async def test_list_responses_keep_pagination_headers(client):
+    for i in range(3):
+        await client.post("/topics/", json={"title": f"T{i}", "content": "C"})
+
+    response = await client.get("/topics/", params={"limit": 2})
+    assert response.headers["content-type"] == "application/json"
+    assert [topic["title"] for topic in response.json()] == ["T0", "T1"]
+
+    response = await client.get("/topics/", params={"cursor": response.headers["X-Next-Cursor"]})
+    assert [topic["title"] for topic in response.json()] == ["T2"]
+
+
+def test_models_with_custom_serialization_are_rejected():
+    class Aliased(SQLModel):
+        name: str = Field(serialization_alias="title")
+
+    with pytest.raises(TypeError, match="Aliased"):
+        dump_json(list[Aliased], [])
@@ -0,0 +1,33 @@
+from app.core.config import Settings, settings
+from app.db.database import pool_options
+from app.serve import build_config
+
+
+def test_production_config(monkeypatch):
+    monkeypatch.delenv("SERVER_WORKERS", raising=False)
+    config = build_config(workers=4)
+    assert (config.workers, config.loop, config.http) == (4, "uvloop", "httptools")
+    assert config.limit_max_requests == settings.server_max_requests
+    assert config.backlog == settings.server_backlog
+    # Exported for the workers' connection pools
+    assert Settings().server_workers == 4
+
+    config.load()
+    jitter = settings.server_max_requests_jitter
+    assert settings.server_max_requests <= config.limit_max_requests <= settings.server_max_requests + jitter
+
+
+def test_reload_runs_a_single_process(monkeypatch):
+    monkeypatch.delenv("SERVER_WORKERS", raising=False)
+    config = build_config(reload=True, workers=4)
+    assert config.workers == 1
+    assert config.should_reload
+    assert config.limit_max_requests is None
+
+
+def test_pool_is_split_between_workers():
+    budget = settings.database_max_connections
+    assert pool_options(1) == {"pool_size": budget, "max_overflow": 0}
+    assert pool_options(4)["pool_size"] == budget // 4
+    assert pool_options(0)["pool_size"] == budget
+    assert pool_options(budget * 2)["pool_size"] == 1
@@ -0,0 +1,15 @@
+async def test_topic_crud(client):
+    response = await client.post("/topics/", json={"title": "Loops", "content": "for and while"})
+    assert response.status_code == 201
+    topic = response.json()
+
+    response = await client.get("/topics/", params={"limit": 10})
+    assert [t["id"] for t in response.json()] == [topic["id"]]
+
+    response = await client.patch(f"/topics/{topic['id']}", json={"title": "Iteration"})
+    assert response.json()["title"] == "Iteration"
+    assert response.json()["content"] == "for and while"
+
+    response = await client.delete(f"/topics/{topic['id']}")
+    assert response.status_code == 200
+    assert (await client.get(f"/topics/{topic['id']}")).status_code == 404
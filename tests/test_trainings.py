@@ -0,0 +1,205 @@
+import random
+from uuid import UUID, uuid4
+
+from app.db.profiling import count_queries
+from app.models.schedulers import MINUTES_PER_DAY, WEEKDAYS, ScheduleSlot, find_conflicts, minute_of_day
+from app.models.trainings import Training, TrainingParticipation
+from tests.conftest import make_user
+
+
+async def create_training(client, **fields) -> dict:
+    payload = {"name": "Training", "price": 10, "description": "About"} | fields
+    response = await client.post("/trainings/", json=payload)
+    assert response.status_code == 201
+    return response.json()
+
+
+async def test_training_schedule(client):
+    training = await create_training(client)
+    assert training["scheduler"] is None
+
+    schedule = {"monday": {"start_time": "18:00", "end_time": "19:30"}}
+    response = await client.post(f"/trainings/{training['id']}/schedule", json=schedule)
+    assert response.status_code == 201
+    assert response.json()["scheduler"]["monday"] == {"start_time": "18:00", "end_time": "19:30"}
+
+    schedule = {"friday": {"start_time": "10:00", "end_time": "11:00"}}
+    response = await client.post(f"/trainings/{training['id']}/schedule", json=schedule)
+    assert response.json()["scheduler"]["monday"] is None
+
+    response = await client.get(f"/trainings/{training['id']}")
+    assert response.json()["scheduler"]["friday"] == {"start_time": "10:00", "end_time": "11:00"}
+
+
+async def test_join_and_leave_training(client):
+    training = await create_training(client)
+
+    client.user = make_user("student")
+    response = await client.post(f"/trainings/{training['id']}/join")
+    assert response.status_code == 200
+    assert [t["id"] for t in (await client.get("/trainings/joined")).json()] == [training["id"]]
+    assert (await client.get(f"/trainings/{training['id']}")).json()["student_count"] == 1
+
+    response = await client.post(f"/trainings/{training['id']}/leave")
+    assert response.status_code == 200
+    assert (await client.get("/trainings/joined")).json() == []
+    assert (await client.get(f"/trainings/{training['id']}")).json()["student_count"] == 0
+
+
+async def available(client, **params) -> list[str]:
+    response = await client.get("/trainings/available", params=params)
+    assert response.status_code == 200
+    return [training["name"] for training in response.json()]
+
+
+async def test_available_trainings_by_weekday_and_time(client):
+    schedules = {
+        "Evening": {"tuesday": {"start_time": "18:30", "end_time": "19:30"}},
+        "Late": {"tuesday": {"start_time": "19:30", "end_time": "21:00"}},
+        "Morning": {
+            "tuesday": {"start_time": "08:00", "end_time": "09:00"},
+            "friday": {"start_time": "18:00", "end_time": "19:00"},
+        },
+        "Weekend": {"sunday": {"start_time": "18:00", "end_time": "20:00"}},
+    }
+    for name, schedule in schedules.items():
+        training = await create_training(client, name=name)
+        await client.post(f"/trainings/{training['id']}/schedule", json=schedule)
+    await create_training(client, name="Unscheduled")
+
+    assert await available(client, weekday="tuesday", start="18:00", end="20:00") == ["Evening"]
+    assert await available(client, weekday="tuesday", start="18:00", end="20:00", overlap=True) == ["Evening", "Late"]
+    assert await available(client, weekday="tuesday") == ["Evening", "Late", "Morning"]
+    assert await available(client, start="18:00", end="20:00") == ["Evening", "Morning", "Weekend"]
+    assert await available(client, weekday="monday") == []
+
+    response = await client.get("/trainings/available", params={"start": "20:00", "end": "18:00"})
+    assert response.status_code == 400
+    response = await client.get("/trainings/available", params={"weekday": "someday"})
+    assert response.status_code == 422
+
+
+async def test_rescheduling_and_deleting_replaces_slots(client):
+    training = await create_training(client, name="Moving")
+    url = f"/trainings/{training['id']}"
+    await client.post(f"{url}/schedule", json={"monday": {"start_time": "10:00", "end_time": "11:00"}})
+    assert await available(client, weekday="monday") == ["Moving"]
+
+    await client.post(f"{url}/schedule", json={"wednesday": {"start_time": "10:00", "end_time": "11:00"}})
+    assert await available(client, weekday="monday") == []
+    assert await available(client, weekday="wednesday") == ["Moving"]
+
+    assert (await client.delete(url)).status_code == 200
+    assert await available(client) == []
+
+
+async def test_join_reports_or_rejects_schedule_conflicts(client):
+    evening = await create_training(client, name="Evening")
+    late = await create_training(client, name="Late")
+    morning = await create_training(client, name="Morning")
+    for training, start, end in [(evening, "18:00", "19:30"), (late, "19:00", "20:00"), (morning, "08:00", "09:00")]:
+        await client.post(
+            f"/trainings/{training['id']}/schedule", json={"monday": {"start_time": start, "end_time": end}}
+        )
+
+    client.user = make_user("student")
+    response = await client.post(f"/trainings/{evening['id']}/join")
+    assert "X-Schedule-Conflicts" not in response.headers
+
+    response = await client.post(f"/trainings/{late['id']}/join", params={"on_conflict": "reject"})
+    assert response.status_code == 409
+    conflict = response.json()["detail"]["conflicts"][0]
+    assert conflict | {"training_id": None, "other_training_id": None} == {
+        "training_id": None,
+        "other_training_id": None,
+        "weekday": "monday",
+        "start_time": "19:00",
+        "end_time": "19:30",
+    }
+    assert {conflict["training_id"], conflict["other_training_id"]} == {evening["id"], late["id"]}
+    assert [t["id"] for t in (await client.get("/trainings/joined")).json()] == [evening["id"]]
+
+    response = await client.post(f"/trainings/{late['id']}/join")
+    assert response.status_code == 200
+    assert response.headers["X-Schedule-Conflicts"] == evening["id"]
+    assert (await client.post(f"/trainings/{morning['id']}/join", params={"on_conflict": "reject"})).status_code == 200
+
+    response = await client.get("/trainings/joined/conflicts")
+    assert [(c["start_time"], c["end_time"]) for c in response.json()] == [("19:00", "19:30")]
+
+
+def pairwise_conflicts(slots) -> set:
+    return {
+        (*sorted([str(a[2]), str(b[2])]), max(a[0], b[0]), min(a[1], b[1]))
+        for i, a in enumerate(slots)
+        for b in slots[i + 1 :]
+        if a[2] != b[2] and a[0] < b[1] and b[0] < a[1]
+    }
+
+
+def conflict_key(conflict: dict) -> tuple:
+    """(training ids in order, overlap start, overlap end) with minutes of the week, comparable to `pairwise_conflicts`."""
+    day_start = WEEKDAYS.index(conflict["weekday"]) * MINUTES_PER_DAY
+    start, end = (day_start + minute_of_day(conflict[key]) for key in ("start_time", "end_time"))
+    return (*sorted([str(conflict["training_id"]), str(conflict["other_training_id"])]), start, end)
+
+
+def random_slots(rng: random.Random, trainings: int) -> list[tuple[int, int, UUID]]:
+    slots = []
+    for _ in range(trainings):
+        training_id = uuid4()
+        for weekday in rng.sample(range(7), rng.randint(1, 3)):
+            start = rng.randrange(6 * 60, 22 * 60, 5)
+            end = min(start + rng.choice([30, 45, 60, 90]), 23 * 60 + 55)
+            slots.append((weekday * MINUTES_PER_DAY + start, weekday * MINUTES_PER_DAY + end, training_id))
+    return slots
+
+
+def test_sweep_matches_pairwise_comparison():
+    rng = random.Random(14)
+    for trainings in (0, 1, 10, 300):
+        slots = random_slots(rng, trainings)
+        found = [conflict_key(conflict.model_dump()) for conflict in find_conflicts(slots)]
+        assert len(found) == len(set(found))
+        assert set(found) == pairwise_conflicts(slots)
+    # Touching sessions do not conflict
+    assert find_conflicts([(600, 660, uuid4()), (660, 720, uuid4())]) == []
+
+
+async def test_conflicts_of_a_student_with_hundreds_of_trainings(client, session):
+    rng = random.Random(300)
+    student = make_user("busy")
+    slots = random_slots(rng, 400)
+    training_ids = {slot[2] for slot in slots}
+    session.add_all(Training(id=t, name="T", price=1, description="-", creator_id=uuid4()) for t in training_ids)
+    await session.flush()
+    session.add_all(
+        ScheduleSlot(training_id=t, weekday=start // MINUTES_PER_DAY, start_minute=start, end_minute=end)
+        for start, end, t in slots
+    )
+    session.add_all(TrainingParticipation(training_id=t, student_id=student.id) for t in training_ids)
+    await session.commit()
+
+    client.user = student
+    with count_queries() as stats:
+        response = await client.get("/trainings/joined/conflicts")
+    assert response.status_code == 200
+    assert stats.count == 1
+    expected = pairwise_conflicts(slots)
+    assert len(expected) > 100
+    assert {conflict_key(conflict) for conflict in response.json()} == expected
+
+    # Joining one more checks it against all of them within the same few queries
+    extra = Training(name="Extra", price=1, description="-", creator_id=uuid4())
+    session.add(extra)
+    await session.flush()
+    session.add(ScheduleSlot(training_id=extra.id, weekday=0, start_minute=0, end_minute=23 * 60))
+    await session.commit()
+    with count_queries() as stats:
+        response = await client.post(f"/trainings/{extra.id}/join", params={"on_conflict": "reject"})
+    assert response.status_code == 409
+    assert stats.count == 2
+    monday = {t for start, _, t in slots if start < MINUTES_PER_DAY}
+    conflicts = response.json()["detail"]["conflicts"]
+    assert {c["training_id"] for c in conflicts} == {str(extra.id)}
+    assert {c["other_training_id"] for c in conflicts} == set(map(str, monday))